@@ -0,0 +1,266 @@
+"""LoRA adapters over one resident base model, with A/B routing.
+
+``AdapterRegistry`` holds the base model's adapters in memory (only the
+small LoRA tensors; the base weights are loaded once by ``get_model``).
+Before each generation the requested adapter is activated in place:
+switching between adapters with the same LoRA layout just loads the
+new ``lora_a``/``lora_b`` tensors, and a different layout (or the base
+model) swaps the LoRA layers themselves. Activation happens while the
+generation holds the inference scheduler's slot, so a generation never
+sees a half-swapped model.
+
+``AdapterRouter`` assigns each session to an adapter by weight. The
+assignment is a hash of the session id, remembered per session, so a
+conversation keeps its adapter when the weights change mid-experiment.
+"""
+
+import hashlib
+import json
+import logging
+import threading
+from collections import OrderedDict
+from collections.abc import Iterable
+from dataclasses import dataclass
+from pathlib import Path
+
+import mlx.core as mx
+from mlx.utils import tree_flatten
+from mlx_lm.tuner.utils import linear_to_lora_layers, remove_lora_layers
+
+import app.fake_model as fake_model
+from app.config import settings
+from app.memory import register
+from app.reload import notify
+
+logger = logging.getLogger(__name__)
+
+# Route name for the base model without any adapter.
+BASE = "base"
+
+
+@dataclass(slots=True)
+class Adapter:
+    name: str
+    path: Path
+    num_layers: int
+    lora_parameters: dict
+    weights: list[tuple[str, mx.array]]
+
+    @property
+    def layout(self) -> tuple:
+        """Adapters with equal layouts share the same LoRA layers."""
+        return self.num_layers, json.dumps(self.lora_parameters, sort_keys=True)
+
+
+def read_adapter(name: str, path: Path) -> Adapter:
+    """Read an mlx_lm LoRA adapter directory into memory."""
+    path = Path(path)
+    config_path = path / "adapter_config.json"
+    if not config_path.exists():
+        raise FileNotFoundError(f"No adapter_config.json in {path}")
+    config = json.loads(config_path.read_text())
+    fine_tune_type = config.get("fine_tune_type", "lora")
+    if fine_tune_type != "lora":
+        raise ValueError(
+            f"Adapter {name} is a {fine_tune_type} fine-tune; only LoRA "
+            "adapters can be swapped at runtime"
+        )
+    weights = mx.load(str(path / "adapters.safetensors"))
+    return Adapter(
+        name=name,
+        path=path,
+        num_layers=config["num_layers"],
+        lora_parameters=config["lora_parameters"],
+        weights=list(weights.items()),
+    )
+
+
+class AdapterRegistry:
+    """Adapters loaded in memory and the one applied to the model."""
+
+    def __init__(self):
+        self.adapters: dict[str, Adapter] = {}
+        # None while the model holds layers of an adapter that was
+        # replaced or unloaded, until the next activation clears them.
+        self.active: str | None = BASE
+        self._lock = threading.Lock()
+
+    def load(self, name: str, path: Path) -> Adapter:
+        """Read an adapter and make it available (replacing ``name``)."""
+        if name == BASE:
+            raise ValueError(f"{BASE!r} is reserved for the base model")
+        adapter = read_adapter(name, path)
+        with self._lock:
+            self.adapters[name] = adapter
+            # Re-apply on next use if the active adapter was replaced.
+            if self.active == name:
+                self.active = None
+        notify({f"adapter:{name}"})
+        logger.info("Loaded adapter %s from %s", name, path)
+        return adapter
+
+    def unload(self, name: str) -> None:
+        """Forget an adapter; its layers are removed on the next swap."""
+        with self._lock:
+            if self.adapters.pop(name, None) is None:
+                raise KeyError(name)
+            if self.active == name:
+                self.active = None
+        notify({f"adapter:{name}"})
+        logger.info("Unloaded adapter %s", name)
+
+    def nbytes(self) -> int:
+        """Bytes of every loaded adapter's tensors."""
+        adapters = list(self.adapters.values())
+        return sum(w.nbytes for a in adapters for _, w in a.weights)
+
+    def activate(self, model, name: str) -> None:
+        """Apply adapter ``name`` (or ``BASE``) to the model in place.
+
+        Must be called while holding the inference scheduler's slot.
+        """
+        if name == self.active:
+            return
+        with self._lock:
+            target = self.adapters.get(name)
+            current = self.adapters.get(self.active)
+        if target is None and name != BASE:
+            logger.warning("Adapter %s is not loaded, using base", name)
+            name = BASE
+            if self.active == BASE:
+                return
+        if isinstance(model, fake_model.FakeModel):
+            self.active = name
+            return
+
+        try:
+            if target is None:
+                remove_lora_layers(model)
+            else:
+                if current is None or current.layout != target.layout:
+                    remove_lora_layers(model)
+                    linear_to_lora_layers(
+                        model, target.num_layers, target.lora_parameters
+                    )
+                    # New LoRA layers start in training mode (dropout).
+                    model.eval()
+                _check_weights(model, target)
+                model.load_weights(target.weights, strict=False)
+        except Exception:
+            remove_lora_layers(model)
+            self.active = BASE
+            raise
+        self.active = name
+
+
+def _check_weights(model, adapter: Adapter) -> None:
+    params = dict(tree_flatten(model.parameters()))
+    errors = [
+        name
+        for name, w in adapter.weights
+        if name not in params or params[name].shape != w.shape
+    ]
+    if errors:
+        raise ValueError(
+            f"Adapter {adapter.name} does not fit the model: "
+            + ", ".join(errors[:5])
+        )
+
+
+class AdapterRouter:
+    """Weighted, sticky assignment of sessions to adapter names."""
+
+    def __init__(
+        self, weights: dict[str, float] | None = None, max_sessions=10_000
+    ):
+        self.max_sessions = max_sessions
+        self._assignments: OrderedDict[str, str] = OrderedDict()
+        self._lock = threading.Lock()
+        self.set_weights(weights or {BASE: 1.0})
+
+    def set_weights(self, weights: dict[str, float]) -> None:
+        """Change traffic shares; sessions already routed stay put."""
+        if any(w < 0 for w in weights.values()):
+            raise ValueError("Adapter weights must be non-negative")
+        total = sum(weights.values())
+        if total <= 0:
+            raise ValueError("At least one adapter needs a positive weight")
+        cumulative = []
+        running = 0.0
+        for name, weight in sorted(weights.items()):
+            if weight > 0:
+                running += weight / total
+                cumulative.append((running, name))
+        with self._lock:
+            self.weights = dict(weights)
+            self._cumulative = cumulative
+            # Only sessions on a retired adapter are re-routed.
+            live = {name for _, name in cumulative}
+            for session_id, name in list(self._assignments.items()):
+                if name not in live:
+                    del self._assignments[session_id]
+
+    def route(self, session_id: str) -> str:
+        with self._lock:
+            name = self._assignments.get(session_id)
+            if name is not None:
+                self._assignments.move_to_end(session_id)
+                return name
+            digest = hashlib.blake2b(session_id.encode(), digest_size=8)
+            point = int.from_bytes(digest.digest()) / 2**64
+            name = next(
+                (n for bound, n in self._cumulative if point < bound),
+                self._cumulative[-1][1],
+            )
+            self._assignments[session_id] = name
+            # Evicted sessions hash to the same adapter unless the
+            # weights changed in between.
+            if len(self._assignments) > self.max_sessions:
+                self._assignments.popitem(last=False)
+            return name
+
+
+_registry = AdapterRegistry()
+_router = AdapterRouter()
+
+
+def get_registry() -> AdapterRegistry:
+    return _registry
+
+
+def get_router() -> AdapterRouter:
+    return _router
+
+
+register("adapters", _registry.nbytes)
+
+
+def load_configured() -> int:
+    """Load ``settings.adapters`` and apply ``settings.adapter_weights``.
+
+    Returns the number of adapters loaded.
+    """
+    for name, path in settings.adapters.items():
+        try:
+            _registry.load(name, path)
+        except (OSError, ValueError, KeyError):
+            logger.exception("Could not load adapter %s", name)
+    route_configured(_registry.adapters)
+    return len(_registry.adapters)
+
+
+def route_configured(loaded: Iterable[str]) -> None:
+    """Route sessions by ``settings.adapter_weights`` over ``loaded``.
+
+    Without explicit weights, traffic is split evenly across the loaded
+    adapters. API workers in split mode call this with the adapters the
+    model server loaded.
+    """
+    loaded = set(loaded)
+    weights = {
+        name: weight
+        for name, weight in settings.adapter_weights.items()
+        if name in {BASE, *loaded}
+    } or {name: 1.0 for name in loaded}
+    if weights:
+        _router.set_weights(weights)
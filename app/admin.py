@@ -0,0 +1,168 @@
+import secrets
+from pathlib import Path
+from typing import Literal
+
+from fastapi import APIRouter, Depends, Header, HTTPException
+from pydantic import BaseModel, Field
+from starlette.concurrency import run_in_threadpool
+
+from app.adapters import BASE, get_registry, get_router
+from app.config import settings
+from app.ipc import get_client
+from app.reload import reload
+from app.sessions import SessionClosed, get_store
+from app.tracing import arm_profiler, profiler_status
+
+
+def require_admin(x_admin_token: str | None = Header(default=None)):
+    """Reject the request unless it carries the configured admin token."""
+    if settings.admin_token is None:
+        raise HTTPException(status_code=403, detail="Admin API disabled")
+    if x_admin_token is None or not secrets.compare_digest(
+        x_admin_token, settings.admin_token
+    ):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+router = APIRouter(prefix="/admin", dependencies=[Depends(require_admin)])
+
+
+class ProfileRequest(BaseModel):
+    requests: int = Field(default=10, ge=1, le=1000)
+    interval_ms: float = Field(default=5.0, gt=0, le=1000)
+    # Write whatever was captured after this long, even if fewer than
+    # ``requests`` turns arrived.
+    timeout_s: float = Field(default=300.0, gt=0, le=86400)
+
+
+@router.post("/profile")
+async def start_profile(request: ProfileRequest):
+    """Capture a sampling CPU profile of the next N /chat turns."""
+    path = arm_profiler(
+        request.requests,
+        settings.profile_dir,
+        interval=request.interval_ms / 1000,
+        timeout=request.timeout_s,
+    )
+    return {"armed": True, "requests": request.requests, "path": str(path)}
+
+
+@router.get("/profile")
+async def get_profile_status():
+    return profiler_status()
+
+
+@router.post("/reload")
+async def reload_sources():
+    """Reload the system prompt and RAG corpus without a restart."""
+    reloaded = await run_in_threadpool(reload)
+    return {"reloaded": sorted(reloaded)}
+
+
+class AdapterLoadRequest(BaseModel):
+    name: str
+    path: Path
+    # Share of new sessions; omit to load without routing traffic.
+    weight: float | None = Field(default=None, ge=0)
+
+
+class AdapterWeightsRequest(BaseModel):
+    weights: dict[str, float]
+
+
+def _adapter_status() -> dict:
+    registry = get_registry()
+    return {
+        "active": registry.active,
+        "adapters": {
+            name: str(adapter.path)
+            for name, adapter in registry.adapters.items()
+        },
+        "weights": get_router().weights,
+    }
+
+
+@router.get("/adapters")
+async def list_adapters():
+    return _adapter_status()
+
+
+def require_local_model():
+    """Reject adapter changes on an API worker in split mode."""
+    if get_client() is not None:
+        raise HTTPException(
+            status_code=409,
+            detail="Adapters are served by the model server; configure "
+            "them with INTAKE_BOT_ADAPTERS and INTAKE_BOT_ADAPTER_WEIGHTS",
+        )
+
+
+@router.post("/adapters", dependencies=[Depends(require_local_model)])
+async def load_adapter(request: AdapterLoadRequest):
+    """Load (or replace) a LoRA adapter over the resident base model."""
+    try:
+        await run_in_threadpool(get_registry().load, request.name, request.path)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except (ValueError, KeyError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if request.weight is not None:
+        router_ = get_router()
+        router_.set_weights({**router_.weights, request.name: request.weight})
+    return _adapter_status()
+
+
+@router.delete("/adapters/{name}", dependencies=[Depends(require_local_model)])
+async def unload_adapter(name: str):
+    """Stop routing to an adapter and free it."""
+    router_ = get_router()
+    weights = {n: w for n, w in router_.weights.items() if n != name}
+    try:
+        router_.set_weights(weights or {BASE: 1.0})
+        get_registry().unload(name)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"No adapter {name!r}")
+    return _adapter_status()
+
+
+@router.put("/adapters/weights", dependencies=[Depends(require_local_model)])
+async def set_adapter_weights(request: AdapterWeightsRequest):
+    """Set each adapter's share of new sessions; running ones stay put."""
+    unknown = set(request.weights) - {BASE, *get_registry().adapters}
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown adapters: {', '.join(sorted(unknown))}",
+        )
+    try:
+        get_router().set_weights(request.weights)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return _adapter_status()
+
+
+class SessionMessage(BaseModel):
+    role: Literal["user", "assistant"]
+    content: str
+
+
+class SessionSeedRequest(BaseModel):
+    messages: list[SessionMessage]
+
+
+@router.put("/sessions/{session_id}")
+async def seed_session(session_id: str, request: SessionSeedRequest):
+    """Recreate a session failed over from another node.
+
+    Used by the cluster router; a session that already has turns here
+    is left as it is.
+    """
+    store = get_store()
+    try:
+        session = store.get_or_create(session_id)
+    except SessionClosed:
+        raise HTTPException(status_code=409, detail="Session is closed")
+    if not session.messages:
+        for message in request.messages:
+            store.append(session, message.role, message.content)
+    return {"session_id": session_id, "turns": session.turn_count}
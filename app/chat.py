@@ -1,13 +1,73 @@
+import asyncio
+import functools
+import json
 import logging
 import re
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+from datetime import datetime, timezone
 from pathlib import Path
 
-from fastapi import APIRouter, HTTPException
-from mlx_lm import generate, load
-from pydantic import BaseModel
+import mlx.core as mx
+import mlx.nn as nn
+from fastapi import (
+    APIRouter,
+    HTTPException,
+    Request,
+    Response,
+    WebSocket,
+    WebSocketDisconnect,
+)
+from fastapi.responses import StreamingResponse
+from mlx.utils import tree_flatten
+from mlx_lm import load, stream_generate
+from mlx_lm.utils import load_tokenizer
+from pydantic import BaseModel, ValidationError
+from starlette.concurrency import run_in_threadpool
 
+import app.fake_model as fake_model
+from app.adapters import BASE, get_registry, get_router
 from app.config import settings
+from app.dialogue import (
+    SLOT_INSTRUCTION,
+    DialogueState,
+    build_summary,
+    closing_message,
+    parse_free_text,
+)
+from app.guardrails import Screening, screen
+from app.inflight import (
+    CancelToken,
+    GenerationCancelled,
+    get_inflight,
+    record_cancelled,
+    record_generation,
+    turn_key,
+)
+from app.ipc import Generation, RemoteModel, get_client
+from app.memory import register
+from app.metrics import (
+    ADAPTER_OUTCOMES,
+    ADAPTER_TURN_SECONDS,
+    ADAPTER_TURNS_TO_CLOSE,
+    CACHE_HITS,
+    CACHE_MISSES,
+    CANCELLED_GENERATIONS,
+    ERRORS,
+    GENERATION_TPS,
+    GUARDRAIL_ROUTES,
+    REQUEST_SECONDS,
+    STAGE_SECONDS,
+    TOKENS,
+)
 from app.rag import retrieve_context
+from app.reload import watch_path
+from app.response_cache import cache_key, get_response_cache
+from app.scheduler import INTERACTIVE, check_deadline, get_scheduler
+from app.sessions import SessionClosed, get_store
+from app.summary import IntakeSummary
+from app.tracing import record_span, span, stage, trace_turn
 
 logger = logging.getLogger(__name__)
 
@@ -15,82 +75,704 @@ router = APIRouter()
 
 _model = None
 _tokenizer = None
+_model_bytes = 0
 _system_prompt_template: str | None = None
 
 SYSTEM_PROMPT_PATH = Path("docs/system-prompt.md")
+# How often /chat checks whether its client is still connected.
+DISCONNECT_POLL_SECONDS = 0.25
+CLOSED_DETAIL = "This intake is already closed"
 
 
 def _load_system_prompt() -> str:
     """Load and cache the system prompt template from docs/."""
+    with span("load_system_prompt"):
+        return _load_system_prompt_cached()
+
+
+def _load_system_prompt_cached() -> str:
     global _system_prompt_template
-    if _system_prompt_template is None:
-        if not SYSTEM_PROMPT_PATH.exists():
-            logger.warning(
-                "System prompt file %s not found, using fallback",
-                SYSTEM_PROMPT_PATH,
-            )
-            _system_prompt_template = (
-                "You are a helpful assistant.\n\n{{retrieved_context}}"
-            )
-        else:
-            raw = SYSTEM_PROMPT_PATH.read_text()
-            match = re.search(
-                r"^## Prompt\s*\n+```\n(.*?)```",
-                raw,
-                re.DOTALL | re.MULTILINE,
-            )
-            if match:
-                _system_prompt_template = match.group(1).rstrip("\n")
-            else:
-                _system_prompt_template = raw
+    if _system_prompt_template is not None:
+        CACHE_HITS.inc("system_prompt")
+    else:
+        CACHE_MISSES.inc("system_prompt")
+        _system_prompt_template = _compile_system_prompt()
     return _system_prompt_template
 
 
+def _compile_system_prompt() -> str:
+    """Read the prompt template from the ``## Prompt`` block in docs/."""
+    if not SYSTEM_PROMPT_PATH.exists():
+        logger.warning(
+            "System prompt file %s not found, using fallback",
+            SYSTEM_PROMPT_PATH,
+        )
+        return "You are a helpful assistant.\n\n{{retrieved_context}}"
+    raw = SYSTEM_PROMPT_PATH.read_text()
+    match = re.search(
+        r"^## Prompt\s*\n+```\n(.*?)```",
+        raw,
+        re.DOTALL | re.MULTILINE,
+    )
+    return match.group(1).rstrip("\n") if match else raw
+
+
+def reload_system_prompt() -> None:
+    """Swap in a freshly compiled template; in-flight turns keep theirs."""
+    global _system_prompt_template
+    _system_prompt_template = _compile_system_prompt()
+
+
+watch_path("system_prompt", SYSTEM_PROMPT_PATH, reload_system_prompt)
+
+
 def get_model():
-    global _model, _tokenizer
+    global _model, _tokenizer, _model_bytes
     if _model is None:
-        if not settings.model_path.exists():
-            raise RuntimeError(
-                f"Model not found at {settings.model_path}. "
-                "Run: uv run mlx_lm.convert --hf-path "
-                "Qwen/Qwen2.5-3B-Instruct "
-                f"--mlx-path {settings.model_path}"
-            )
-        _model, _tokenizer = load(str(settings.model_path))
+        _model, _tokenizer = _load_model()
+        _model_bytes = _weight_bytes(_model)
     return _model, _tokenizer
 
 
+def _weight_bytes(model) -> int:
+    """Bytes of an MLX model's parameters; 0 for stand-ins."""
+    if not isinstance(model, nn.Module):
+        return 0
+    return sum(w.nbytes for _, w in tree_flatten(model.parameters()))
+
+
+def _kv_cache_bytes() -> int:
+    """MLX memory in use beyond the weights and adapters.
+
+    That is the KV caches and activations of the generation holding
+    the model, if any.
+    """
+    if not _model_bytes:
+        return 0
+    return mx.get_active_memory() - _model_bytes - get_registry().nbytes()
+
+
+def _clear_mlx_cache(nbytes: int) -> int:
+    cached = mx.get_cache_memory()
+    mx.clear_cache()
+    return cached
+
+
+register("model_weights", lambda: _model_bytes)
+register("kv_caches", _kv_cache_bytes)
+# Buffers MLX keeps for reuse after a generation; dropping them costs
+# only fresh allocations, so they go first.
+register(
+    "mlx_buffer_cache",
+    mx.get_cache_memory,
+    evict=_clear_mlx_cache,
+    priority=0,
+)
+
+
+def _load_model():
+    """Load the model and tokenizer, or only the tokenizer in split mode."""
+    client = get_client()
+    if settings.inference_backend == "fake":
+        model, tokenizer = fake_model.load()
+        return (model if client is None else RemoteModel(client)), tokenizer
+    if not settings.model_path.exists():
+        raise RuntimeError(
+            f"Model not found at {settings.model_path}. "
+            "Run: uv run mlx_lm.convert --hf-path "
+            "Qwen/Qwen2.5-3B-Instruct "
+            f"--mlx-path {settings.model_path}"
+        )
+    if client is not None:
+        # The weights stay on the model server.
+        return RemoteModel(client), load_tokenizer(settings.model_path)
+    return load(str(settings.model_path))
+
+
 class ChatRequest(BaseModel):
     message: str
+    session_id: str | None = None
+    # Client-chosen id; resubmitting it returns the same reply instead
+    # of generating a new one.
+    message_id: str | None = None
+    # Booking details from the Cal.com link, copied into the summary.
+    visitor_name: str | None = None
+    booking_ref: str | None = None
+    appointment_datetime: datetime | None = None
 
 
 class ChatResponse(BaseModel):
     reply: str
+    session_id: str
+    # Set on the closing turn, once the bot has written the summary.
+    summary: IntakeSummary | None = None
 
 
-@router.post("/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest):
+def run_generation(
+    model,
+    tokenizer,
+    prompt_tokens: list[int],
+    on_text: Callable[[str], None] | None = None,
+    adapter: str = BASE,
+    cancel: CancelToken | None = None,
+    job_class: str = INTERACTIVE,
+    deadline: datetime | None = None,
+    on_start: Callable[[], None] | None = None,
+) -> Generation:
+    """Generate on the model loaded in this process.
+
+    Holds the scheduler slot for the whole generation and applies
+    ``adapter`` first if it is not already active. ``on_start`` is
+    called once decoding is about to begin and ``on_text`` with each
+    decoded text segment. ``cancel`` is checked before each decode
+    step; a cancelled generation returns early with ``cancelled`` set.
+    """
+    if isinstance(model, fake_model.FakeModel):
+        generate_stream = fake_model.stream_generate
+    else:
+        generate_stream = stream_generate
+
+    generation = Generation(queued=time.perf_counter())
+    with get_scheduler().slot(job_class, deadline=deadline):
+        generation.granted = time.perf_counter()
+        if cancel is not None and cancel.cancelled:
+            generation.start = generation.end = generation.granted
+            generation.cancelled = "queued"
+            return generation
+        registry = get_registry()
+        if registry.active != adapter:
+            with stage("adapter_swap"):
+                registry.activate(model, adapter)
+        generation.start = time.perf_counter()
+        if on_start is not None:
+            on_start()
+        parts = []
+        for response in generate_stream(
+            model, tokenizer, prompt=prompt_tokens, max_tokens=256
+        ):
+            if cancel is not None and cancel.cancelled:
+                generation.cancelled = "decode"
+                break
+            if generation.first_token is None:
+                generation.first_token = time.perf_counter()
+            parts.append(response.text)
+            generation.prompt_tokens = response.prompt_tokens
+            generation.generation_tokens = response.generation_tokens
+            generation.generation_tps = response.generation_tps
+            if on_text is not None and response.text:
+                on_text(response.text)
+        generation.end = time.perf_counter()
+        generation.text = "".join(parts)
+    return generation
+
+
+def _generate(
+    model,
+    tokenizer,
+    prompt_tokens: list[int],
+    on_text: Callable[[str], None] | None = None,
+    adapter: str = BASE,
+    cancel: CancelToken | None = None,
+    job_class: str = INTERACTIVE,
+    deadline: datetime | None = None,
+) -> str:
+    """Run one generation, recording queue, prefill and decode timings.
+
+    ``on_text`` is called with each decoded text segment as it arrives.
+    ``adapter`` is applied to the model first if it is not already.
+    ``cancel`` is checked before each decode step; once tripped the
+    generation stops and raises ``GenerationCancelled``. ``job_class``
+    and ``deadline`` place the generation in the scheduler's queue.
+    With a ``RemoteModel`` the generation runs on the model server and
+    its timings are recorded here all the same.
+    """
+    if isinstance(model, RemoteModel):
+        run = model.generate
+    else:
+        run = functools.partial(run_generation, model, tokenizer)
+
+    with span("generation"):
+        generation = run(
+            prompt_tokens, on_text, adapter, cancel, job_class, deadline
+        )
+        STAGE_SECONDS.observe(
+            generation.granted - generation.queued, "queue_wait"
+        )
+        record_span("queue_wait", generation.queued, generation.granted)
+        if generation.first_token is not None:
+            record_span(
+                "prefill",
+                generation.start,
+                generation.first_token,
+                tokens=generation.prompt_tokens,
+            )
+            record_span(
+                "decode",
+                generation.first_token,
+                generation.end,
+                tokens=generation.generation_tokens,
+            )
+
+    if generation.cancelled is not None:
+        CANCELLED_GENERATIONS.inc(generation.cancelled)
+        saved = record_cancelled(generation.end - generation.start)
+        if generation.cancelled == "decode":
+            logger.info("Generation cancelled, ~%.2f s saved", saved)
+        raise GenerationCancelled
+    record_generation(generation.end - generation.start)
+    if generation.first_token is not None:
+        STAGE_SECONDS.observe(
+            generation.first_token - generation.start, "prefill"
+        )
+        STAGE_SECONDS.observe(generation.end - generation.first_token, "decode")
+        GENERATION_TPS.observe(generation.generation_tps)
+        TOKENS.inc("prompt", amount=generation.prompt_tokens)
+        TOKENS.inc("generated", amount=generation.generation_tokens)
+    return generation.text
+
+
+def _open_session(session_id: str | None):
     try:
         model, tokenizer = get_model()
+        # In split mode this is the model server's session store.
+        session = get_store().get_or_create(session_id)
+    except SessionClosed:
+        raise HTTPException(status_code=409, detail=CLOSED_DETAIL)
     except RuntimeError as e:
+        ERRORS.inc("model_load")
         raise HTTPException(status_code=503, detail=str(e))
+    return session, model, tokenizer
+
+
+def _open_request_session(request: ChatRequest):
+    """Open the request's session, or the one its message id opened.
+
+    A first message sent again without a session id (its reply, and so
+    the new session id, was lost) rejoins the session the first attempt
+    opened, where its turn is deduplicated.
+    """
+    session_id = request.session_id
+    message_id = request.message_id
+    if session_id is None and message_id is not None:
+        session_id = get_inflight().session_for(message_id)
+    opened = _open_session(session_id)
+    if session_id is None and message_id is not None:
+        get_inflight().record_origin(message_id, opened[0].session_id)
+    return opened
+
+
+def _retrieve(request: ChatRequest, embedding: list[float] | None) -> str:
+    """Retrieve context, reusing the screening embedding if there is one."""
+    try:
+        return retrieve_context(request.message, embedding)
+    except Exception:
+        ERRORS.inc("retrieval")
+        raise
+
+
+def _appointment_text(request: ChatRequest) -> str:
+    when = request.appointment_datetime
+    return when.isoformat() if when else "unknown"
+
+
+def _render_system_prompt(
+    template: str, context: str, request: ChatRequest
+) -> str:
+    values = {
+        "{{retrieved_context}}": context,
+        "{{visitor_name}}": request.visitor_name or "the visitor",
+        "{{appointment_datetime}}": _appointment_text(request),
+        "{{booking_ref}}": request.booking_ref or "unknown",
+    }
+    for placeholder, value in values.items():
+        template = template.replace(placeholder, value)
+    return template
+
+
+def _build_prompt(
+    request: ChatRequest,
+    session,
+    tokenizer,
+    template: str,
+    context: str,
+    closing: bool = False,
+) -> list[int]:
+    """Render the chat prompt as token ids.
+
+    On the closing turn the model is asked for the summary's two
+    free-text fields only.
+    """
+    with stage("prompt_assembly"):
+        messages = [
+            {
+                "role": "system",
+                "content": _render_system_prompt(template, context, request),
+            },
+            *session.messages,
+            {"role": "user", "content": request.message},
+        ]
+        if closing:
+            messages.append({"role": "system", "content": SLOT_INSTRUCTION})
+        prompt = tokenizer.apply_chat_template(
+            messages, tokenize=False, add_generation_prompt=True
+        )
+    with stage("tokenization"):
+        return tokenizer.encode(prompt, add_special_tokens=False)
+
+
+def _response_cache_key(
+    request: ChatRequest,
+    state: DialogueState,
+    template: str,
+    context: str,
+    adapter: str,
+) -> str | None:
+    """Key for memoizing this turn's reply, or None to always generate.
+
+    The visitor's name and booking reference are templated in the
+    cached reply; the appointment time is part of the key.
+    """
+    if state.ready_to_close(settings.max_turns):
+        return None
+    return cache_key(
+        template,
+        state.answered,
+        request.message,
+        context,
+        adapter,
+        _appointment_text(request),
+    )
+
+
+def _screen(request: ChatRequest, session, state: DialogueState) -> Screening:
+    """Run the guardrails; a routed message gets a templated reply."""
+    with stage("guardrails"):
+        screening = screen(request.message, state, session.messages)
+    if screening.route is not None:
+        GUARDRAIL_ROUTES.inc(screening.route, screening.source)
+    return screening
+
+
+def _dialogue_state(request: ChatRequest, session) -> DialogueState:
+    state = DialogueState.from_messages(session.messages)
+    state.update("user", request.message)
+    return state
+
+
+def _close_intake(
+    request: ChatRequest, session, state: DialogueState, text: str
+) -> tuple[str, IntakeSummary]:
+    """Fill the summary from dialogue state plus the model's free text."""
+    with stage("summary_fill"):
+        description, prep_note = parse_free_text(text, state)
+        summary = build_summary(
+            state,
+            session_id=session.session_id,
+            booking_ref=request.booking_ref or "unknown",
+            # Without booking details, fall back to the intake time.
+            appointment_datetime=request.appointment_datetime
+            or datetime.now(tz=timezone.utc),
+            issue_description=description,
+            professor_prep_note=prep_note,
+        )
+        return closing_message(summary), summary
+
+
+def _record_turn(session, message: str, reply: str) -> None:
+    store = get_store()
+    store.append(session, "user", message)
+    store.append(session, "assistant", reply)
+
+
+def _close_session(session) -> None:
+    """End the intake once its summary is written; later turns are refused."""
+    get_store().close(session.session_id)
+    # A split-mode worker holds a snapshot the remote close cannot mark.
+    session.closed = True
+
+
+def _record_outcome(adapter: str, state: DialogueState, closing: bool) -> None:
+    ADAPTER_OUTCOMES.inc(adapter, "turn")
+    if closing:
+        ADAPTER_OUTCOMES.inc(adapter, "closed")
+        ADAPTER_TURNS_TO_CLOSE.observe(state.turn_count, adapter)
+
 
-    context = retrieve_context(request.message)
-    system_prompt = _load_system_prompt().replace(
-        "{{retrieved_context}}", context
+@dataclass(slots=True)
+class TurnResult:
+    reply: str
+    session_id: str
+    trace_id: str
+    summary: IntakeSummary | None = None
+
+
+async def _run_turn(
+    request: ChatRequest,
+    session,
+    model,
+    tokenizer,
+    adapter: str,
+    cancel: CancelToken,
+    on_text: Callable[[str], None] | None = None,
+) -> TurnResult:
+    """Answer one message: screen, retrieve, generate, then record it.
+
+    ``on_text`` streams the reply to the request that started the turn
+    (except on the closing turn, whose model output is the summary's
+    free text). A turn that produces the summary closes the session;
+    raises ``SessionClosed`` if it already was.
+    """
+    if session.closed:
+        raise SessionClosed(session.session_id)
+    with (
+        REQUEST_SECONDS.time(),
+        ADAPTER_TURN_SECONDS.time(adapter),
+        trace_turn(session.session_id, session.turn_count + 1) as trace,
+    ):
+
+        def result(reply: str, summary: IntakeSummary | None = None):
+            return TurnResult(
+                reply, session.session_id, trace.trace_id, summary
+            )
+
+        state = _dialogue_state(request, session)
+        screening = _screen(request, session, state)
+        if screening.reply is not None:
+            _record_turn(session, request.message, screening.reply)
+            return result(screening.reply)
+        closing = state.ready_to_close(settings.max_turns)
+        context = _retrieve(request, screening.embedding)
+        template = _load_system_prompt()
+        key = _response_cache_key(request, state, template, context, adapter)
+        cache = get_response_cache()
+        cached = (
+            cache.get(key, request.visitor_name, request.booking_ref)
+            if key is not None
+            else None
+        )
+        if cached is not None:
+            _record_turn(session, request.message, cached)
+            return result(cached)
+        prompt_tokens = _build_prompt(
+            request, session, tokenizer, template, context, closing
+        )
+        try:
+            reply = await run_in_threadpool(
+                _generate,
+                model,
+                tokenizer,
+                prompt_tokens,
+                None if closing else on_text,
+                adapter,
+                cancel,
+            )
+            # Only the closing turn has a summary, built from the tracked
+            # state; JSON in a mid-intake reply is not parsed or repaired.
+            summary = None
+            if closing:
+                reply, summary = _close_intake(request, session, state, reply)
+        except GenerationCancelled:
+            raise
+        except Exception:
+            ERRORS.inc("generation")
+            ADAPTER_OUTCOMES.inc(adapter, "error")
+            raise
+        if summary is not None and request.appointment_datetime is not None:
+            check_deadline(
+                "summary", summary.appointment_datetime, session.session_id
+            )
+        if key is not None and summary is None:
+            cache.put(key, reply, request.visitor_name, request.booking_ref)
+        _record_turn(session, request.message, reply)
+        if summary is not None:
+            _close_session(session)
+        _record_outcome(adapter, state, closing)
+        return result(reply, summary)
+
+
+async def _submit(
+    request: ChatRequest,
+    session,
+    model,
+    tokenizer,
+    on_text: Callable[[str], None] | None = None,
+) -> TurnResult:
+    """Run the turn for ``request``, or join the one already answering it.
+
+    A retry of a message still being answered (the same ``message_id``,
+    or the same text at the same turn) waits for that turn's reply; with
+    a ``message_id``, so does a retry after the turn has finished.
+    """
+    adapter = get_router().route(session.session_id)
+    key = turn_key(
+        session.session_id,
+        session.turn_count,
+        request.message,
+        request.message_id,
+    )
+    return await get_inflight().run(
+        key,
+        lambda cancel: _run_turn(
+            request, session, model, tokenizer, adapter, cancel, on_text
+        ),
+        remember=request.message_id is not None,
     )
 
-    messages = [
-        {"role": "system", "content": system_prompt},
-        {"role": "user", "content": request.message},
-    ]
-    prompt = tokenizer.apply_chat_template(
-        messages, tokenize=False, add_generation_prompt=True
+
+@router.post("/chat", response_model=ChatResponse)
+async def chat(request: ChatRequest, http_request: Request, response: Response):
+    session, model, tokenizer = _open_request_session(request)
+    turn = asyncio.ensure_future(_submit(request, session, model, tokenizer))
+    while not turn.done():
+        await asyncio.wait({turn}, timeout=DISCONNECT_POLL_SECONDS)
+        if not turn.done() and await http_request.is_disconnected():
+            # Nobody will read the reply; stop generating it.
+            turn.cancel()
+            return Response(status_code=499)
+    try:
+        result = turn.result()
+    except SessionClosed:
+        # Another request closed the intake while this one waited.
+        raise HTTPException(status_code=409, detail=CLOSED_DETAIL)
+    response.headers["X-Trace-Id"] = result.trace_id
+    return ChatResponse(
+        reply=result.reply,
+        session_id=result.session_id,
+        summary=result.summary,
     )
-    reply = generate(
-        model,
-        tokenizer,
-        prompt=prompt,
-        max_tokens=256,
+
+
+async def _turn_events(request: ChatRequest, session, model, tokenizer):
+    """Yield ``(event, data)`` pairs for one turn: tokens, then done.
+
+    Replies that were not decoded for this request (the closing turn's
+    summary text, templated and cached replies, a retry joining a turn
+    in flight) arrive as one ``token`` event. Closing the generator
+    before ``done`` cancels the generation unless a retry is waiting on
+    it.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue[str | None] = asyncio.Queue()
+
+    def on_text(text: str) -> None:
+        loop.call_soon_threadsafe(queue.put_nowait, text)
+
+    turn = asyncio.ensure_future(
+        _submit(request, session, model, tokenizer, on_text)
+    )
+    turn.add_done_callback(lambda _: queue.put_nowait(None))
+    try:
+        streamed = False
+        while (text := await queue.get()) is not None:
+            streamed = True
+            yield "token", {"text": text}
+        try:
+            result = turn.result()
+        except SessionClosed:
+            yield "error", {"detail": CLOSED_DETAIL}
+            return
+        except Exception:
+            yield "error", {"detail": "Generation failed"}
+            return
+        if not streamed:
+            yield "token", {"text": result.reply}
+        yield (
+            "done",
+            {
+                "reply": result.reply,
+                "session_id": result.session_id,
+                "trace_id": result.trace_id,
+                "summary": result.summary.model_dump(mode="json")
+                if result.summary
+                else None,
+            },
+        )
+    finally:
+        # The client went away mid-turn.
+        if not turn.done():
+            turn.cancel()
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@router.post("/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """Stream the reply as server-sent events.
+
+    Emits one ``token`` event per decoded text segment, then a ``done``
+    event carrying the full reply, session id and (on the closing turn)
+    the summary.
+    """
+    session, model, tokenizer = _open_request_session(request)
+
+    async def events():
+        async for event, data in _turn_events(
+            request, session, model, tokenizer
+        ):
+            yield _sse(event, data)
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+@router.websocket("/ws/chat")
+async def chat_socket(websocket: WebSocket, session_id: str | None = None):
+    """Hold one connection open for a whole intake.
+
+    The server first sends ``{"event": "session", "session_id": ...}``.
+    Each client frame is a ``ChatRequest`` (its ``session_id`` is
+    ignored) and is answered with the same ``token``/``done``/``error``
+    events as ``/chat/stream``, as ``{"event": ..., **data}`` frames.
+    Messages sent during a turn are answered in order afterwards;
+    disconnecting cancels the turn in progress. Once a turn returns the
+    summary the session is closed and later frames get an ``error``;
+    connecting to a closed session is refused with code 1008.
+    """
+    await websocket.accept()
+    try:
+        session, model, tokenizer = _open_session(session_id)
+    except HTTPException as e:
+        # 1008 (policy violation) for a closed intake, else 1011.
+        code = 1008 if e.status_code == 409 else 1011
+        await websocket.close(code=code, reason=str(e.detail)[:120])
+        return
+    await websocket.send_json(
+        {"event": "session", "session_id": session.session_id}
     )
-    return ChatResponse(reply=reply)
+    frames: asyncio.Queue[str] = asyncio.Queue()
+
+    async def serve():
+        while True:
+            frame = await frames.get()
+            try:
+                request = ChatRequest.model_validate_json(frame)
+            except ValidationError as e:
+                detail = e.errors(include_url=False, include_context=False)
+                await websocket.send_json({"event": "error", "detail": detail})
+                continue
+            request = request.model_copy(
+                update={"session_id": session.session_id}
+            )
+            async for event, data in _turn_events(
+                request, session, model, tokenizer
+            ):
+                await websocket.send_json({"event": event, **data})
+
+    server = asyncio.ensure_future(serve())
+    try:
+        while not server.done():
+            receiving = asyncio.ensure_future(websocket.receive_text())
+            await asyncio.wait(
+                {receiving, server}, return_when=asyncio.FIRST_COMPLETED
+            )
+            if not receiving.done():
+                receiving.cancel()
+                break
+            frames.put_nowait(receiving.result())
+    except WebSocketDisconnect:
+        pass
+    finally:
+        server.cancel()
+    if server.done() and not server.cancelled() and server.exception():
+        logger.error("WebSocket chat failed", exc_info=server.exception())
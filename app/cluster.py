@@ -0,0 +1,513 @@
+"""Front router spreading intake sessions over several inference nodes.
+
+Each node (``app.main``) serves one model instance, so one machine caps
+capacity. This app sits in front of several nodes:
+
+    INTAKE_BOT_CLUSTER_NODES='["http://mini-1:8000","http://mini-2:8000"]' \\
+        uv run uvicorn app.cluster:app --port 8000
+
+Each session is pinned to one node, picked by rendezvous hashing of the
+session id over the healthy nodes, so its transcript and prompt caches
+stay local and adding or losing a node only moves the sessions that
+hash to it. The router assigns ids to new sessions itself, so the first
+turn is already placed.
+
+Nodes are polled on ``/health`` for liveness and load (inference jobs
+queued or running); new sessions skip nodes at ``cluster_max_load``
+unless every node is. A draining node (``POST /admin/nodes/drain``)
+keeps its sessions but gets no new ones. When a node stops answering,
+its sessions fail over to the next node in hash order, which is seeded
+with the transcript the router kept from the turns it proxied. Seeding
+goes through the nodes' admin API, so with more than one node the
+router and its nodes must share ``INTAKE_BOT_ADMIN_TOKEN``; the router
+refuses to start without it.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import uuid
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+
+import httpx
+from fastapi import (
+    Depends,
+    FastAPI,
+    HTTPException,
+    Request,
+    Response,
+    WebSocket,
+    WebSocketDisconnect,
+)
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel
+from websockets.asyncio.client import connect as ws_connect
+from websockets.exceptions import ConnectionClosed, InvalidHandshake
+
+import app.metrics as metrics_module
+from app.admin import require_admin
+from app.config import settings
+from app.metrics import CLUSTER_FAILOVERS, CLUSTER_REQUESTS
+from app.static import AssetStaticFiles
+
+logger = logging.getLogger(__name__)
+
+# WebSocket close code asking the client to reconnect.
+SERVICE_RESTART = 1012
+# Close code a node uses to refuse a session whose intake is closed.
+CLOSED_SESSION = 1008
+
+
+class NoNodeAvailable(Exception):
+    """Every node is down or draining."""
+
+
+@dataclass(slots=True)
+class Node:
+    url: str
+    healthy: bool = True
+    draining: bool = False
+    failures: int = 0
+    # Inference jobs queued or running, from the node's /health.
+    load: float = 0.0
+    open_sessions: int = 0
+
+    @property
+    def ws_url(self) -> str:
+        return "ws" + self.url.removeprefix("http")
+
+
+def rendezvous_score(node_url: str, session_id: str) -> int:
+    digest = hashlib.blake2b(
+        f"{node_url}\0{session_id}".encode(), digest_size=8
+    )
+    return int.from_bytes(digest.digest())
+
+
+class SessionRouter:
+    """Session-to-node placement with failover and drain."""
+
+    def __init__(
+        self,
+        urls: list[str],
+        max_load: float = 8.0,
+        max_failures: int = 2,
+        max_sessions: int = 100_000,
+    ):
+        self.nodes = {url.rstrip("/"): Node(url.rstrip("/")) for url in urls}
+        self.max_load = max_load
+        self.max_failures = max_failures
+        self.max_sessions = max_sessions
+        self._owners: OrderedDict[str, str] = OrderedDict()
+        self._transcripts: dict[str, list[dict]] = {}
+        # Message ids sent without a session id -> the id assigned.
+        self._origins: OrderedDict[str, str] = OrderedDict()
+
+    def assign(self, message_id: str | None) -> str:
+        """A new session id, or the one already given to ``message_id``.
+
+        A retried first message thereby reaches the same node and
+        session as the attempt whose reply was lost.
+        """
+        if message_id is None:
+            return uuid.uuid4().hex
+        session_id = self._origins.get(message_id) or uuid.uuid4().hex
+        self._origins[message_id] = session_id
+        self._origins.move_to_end(message_id)
+        while len(self._origins) > self.max_sessions:
+            self._origins.popitem(last=False)
+        return session_id
+
+    def place(self, session_id: str) -> tuple[Node, Node | None]:
+        """The node serving ``session_id``, and the node it moved from.
+
+        A session stays on its node while that node is up, draining or
+        not; otherwise it goes to the healthy, non-draining node that
+        ranks highest for it and is not overloaded.
+        """
+        owner = self.nodes.get(self._owners.get(session_id, ""))
+        if owner is not None and owner.healthy:
+            self._owners.move_to_end(session_id)
+            return owner, None
+        candidates = sorted(
+            (n for n in self.nodes.values() if n.healthy and not n.draining),
+            key=lambda n: rendezvous_score(n.url, session_id),
+            reverse=True,
+        )
+        if not candidates:
+            raise NoNodeAvailable
+        node = next(
+            (n for n in candidates if n.load < self.max_load),
+            min(candidates, key=lambda n: n.load),
+        )
+        self._owners[session_id] = node.url
+        self._owners.move_to_end(session_id)
+        while len(self._owners) > self.max_sessions:
+            evicted, _ = self._owners.popitem(last=False)
+            self._transcripts.pop(evicted, None)
+        return node, owner
+
+    def record(
+        self, session_id: str, message: str, reply: str, closed: bool = False
+    ) -> None:
+        """Keep a proxied turn for failover; forget closed sessions."""
+        if closed:
+            self._owners.pop(session_id, None)
+            self._transcripts.pop(session_id, None)
+        elif session_id in self._owners:
+            self._transcripts.setdefault(session_id, []).extend(
+                [
+                    {"role": "user", "content": message},
+                    {"role": "assistant", "content": reply},
+                ]
+            )
+
+    def transcript(self, session_id: str) -> list[dict]:
+        return self._transcripts.get(session_id, [])
+
+    def mark_down(self, node: Node) -> None:
+        if node.healthy:
+            logger.warning("Node %s is down; failing over", node.url)
+        node.healthy = False
+        node.failures = max(node.failures, self.max_failures)
+
+    def update(self, node: Node, health: dict | None) -> None:
+        """Apply one /health poll (None if it failed)."""
+        if health is None:
+            node.failures += 1
+            if node.failures >= self.max_failures:
+                self.mark_down(node)
+            return
+        if not node.healthy:
+            logger.info("Node %s is back", node.url)
+        node.healthy = True
+        node.failures = 0
+        queue = health.get("inference_queue", {})
+        node.load = sum(queue.get("queue_depth", {}).values()) + (
+            queue.get("running") is not None
+        )
+        node.open_sessions = health.get("open_sessions", 0)
+
+    def status(self) -> dict:
+        assigned = {url: 0 for url in self.nodes}
+        for url in self._owners.values():
+            assigned[url] = assigned.get(url, 0) + 1
+        return {
+            node.url: {
+                "healthy": node.healthy,
+                "draining": node.draining,
+                "drained": node.draining and assigned[node.url] == 0,
+                "load": node.load,
+                "open_sessions": node.open_sessions,
+                "routed_sessions": assigned[node.url],
+            }
+            for node in self.nodes.values()
+        }
+
+
+_router = SessionRouter(
+    settings.cluster_nodes,
+    max_load=settings.cluster_max_load,
+    max_failures=settings.cluster_max_failures,
+)
+_client: httpx.AsyncClient | None = None
+
+
+def get_session_router() -> SessionRouter:
+    return _router
+
+
+async def _poll(node: Node) -> None:
+    try:
+        response = await _client.get(f"{node.url}/health", timeout=2.0)
+        response.raise_for_status()
+        health = response.json()
+    except (httpx.HTTPError, ValueError):
+        health = None
+    _router.update(node, health)
+
+
+async def poll_nodes(stop_event: asyncio.Event) -> None:
+    """Poll every node's /health until ``stop_event`` is set."""
+    while not stop_event.is_set():
+        await asyncio.gather(*(_poll(n) for n in _router.nodes.values()))
+        try:
+            await asyncio.wait_for(
+                stop_event.wait(), settings.cluster_poll_interval
+            )
+        except TimeoutError:
+            pass
+
+
+@asynccontextmanager
+async def lifespan(application: FastAPI):
+    global _client
+    if len(_router.nodes) > 1 and settings.admin_token is None:
+        # Failover seeding would be refused and lose every transcript.
+        raise RuntimeError(
+            "INTAKE_BOT_ADMIN_TOKEN must be set, to the same value on the "
+            "router and every node, to fail sessions over between nodes"
+        )
+    _client = httpx.AsyncClient(
+        timeout=httpx.Timeout(120.0, connect=2.0),
+        limits=httpx.Limits(max_connections=None),
+    )
+    static_files.precompress()
+    stop = asyncio.Event()
+    poller = asyncio.create_task(poll_nodes(stop))
+    logger.info("Routing sessions over %d nodes", len(_router.nodes))
+    yield
+    stop.set()
+    await poller
+    await _client.aclose()
+
+
+app = FastAPI(title=f"{settings.app_name} (router)", lifespan=lifespan)
+
+
+async def _route(session_id: str) -> Node:
+    """Place the session, moving its transcript if it changed nodes."""
+    try:
+        node, previous = _router.place(session_id)
+    except NoNodeAvailable:
+        raise HTTPException(status_code=503, detail="No inference node up")
+    if previous is not None and previous is not node:
+        CLUSTER_FAILOVERS.inc(node.url)
+        await _seed(node, session_id)
+    CLUSTER_REQUESTS.inc(node.url)
+    return node
+
+
+async def _seed(node: Node, session_id: str) -> None:
+    messages = _router.transcript(session_id)
+    if not messages:
+        return
+    headers = (
+        {"X-Admin-Token": settings.admin_token} if settings.admin_token else {}
+    )
+    try:
+        response = await _client.put(
+            f"{node.url}/admin/sessions/{session_id}",
+            json={"messages": messages},
+            headers=headers,
+        )
+        response.raise_for_status()
+    except httpx.HTTPError:
+        logger.warning(
+            "Could not move session %s to %s; it restarts there",
+            session_id,
+            node.url,
+        )
+
+
+async def _chat_body(request: Request) -> dict:
+    try:
+        body = await request.json()
+    except ValueError:
+        body = None
+    if not isinstance(body, dict):
+        raise HTTPException(status_code=422, detail="Expected a JSON object")
+    body["session_id"] = body.get("session_id") or _router.assign(
+        body.get("message_id")
+    )
+    return body
+
+
+async def _send(path: str, body: dict, stream: bool = False):
+    """POST to the session's node, failing over if it cannot connect."""
+    for _ in range(len(_router.nodes)):
+        node = await _route(body["session_id"])
+        try:
+            request = _client.build_request(
+                "POST", f"{node.url}{path}", json=body
+            )
+            return node, await _client.send(request, stream=stream)
+        except httpx.ConnectError:
+            _router.mark_down(node)
+    raise HTTPException(status_code=503, detail="No inference node up")
+
+
+def _node_headers(node: Node, response: httpx.Response) -> dict:
+    headers = {"X-Intake-Node": node.url}
+    if trace_id := response.headers.get("x-trace-id"):
+        headers["X-Trace-Id"] = trace_id
+    return headers
+
+
+@app.post("/chat")
+async def chat(request: Request):
+    body = await _chat_body(request)
+    node, response = await _send("/chat", body)
+    if response.status_code == 200:
+        data = response.json()
+        _router.record(
+            body["session_id"],
+            body.get("message", ""),
+            data["reply"],
+            closed=data.get("summary") is not None,
+        )
+    return Response(
+        response.content,
+        status_code=response.status_code,
+        headers=_node_headers(node, response),
+        media_type=response.headers.get("content-type"),
+    )
+
+
+@app.post("/chat/stream")
+async def chat_stream(request: Request):
+    body = await _chat_body(request)
+    node, upstream = await _send("/chat/stream", body, stream=True)
+    if upstream.status_code != 200:
+        content = await upstream.aread()
+        await upstream.aclose()
+        return Response(
+            content,
+            status_code=upstream.status_code,
+            media_type=upstream.headers.get("content-type"),
+        )
+
+    async def relay():
+        event = done = None
+        try:
+            async for line in upstream.aiter_lines():
+                yield line + "\n"
+                if line.startswith("event: "):
+                    event = line[7:]
+                elif event == "done" and line.startswith("data: "):
+                    done = json.loads(line[6:])
+        except httpx.TransportError:
+            _router.mark_down(node)
+            yield 'event: error\ndata: {"detail": "Node went away"}\n\n'
+        finally:
+            await upstream.aclose()
+        if done is not None:
+            _router.record(
+                body["session_id"],
+                body.get("message", ""),
+                done["reply"],
+                closed=done.get("summary") is not None,
+            )
+
+    return StreamingResponse(
+        relay(),
+        media_type="text/event-stream",
+        headers={"X-Intake-Node": node.url},
+    )
+
+
+@app.websocket("/ws/chat")
+async def chat_socket(websocket: WebSocket, session_id: str | None = None):
+    """Relay a chat WebSocket to the session's node.
+
+    If the node goes away the client is closed with 1012 (service
+    restart); the widget reconnects and lands on the failover node.
+    """
+    await websocket.accept()
+    session_id = session_id or uuid.uuid4().hex
+    try:
+        node = await _route(session_id)
+        upstream = await ws_connect(
+            f"{node.ws_url}/ws/chat?session_id={session_id}"
+        )
+    except HTTPException:
+        await websocket.close(code=1013, reason="No inference node up")
+        return
+    except (OSError, InvalidHandshake):
+        _router.mark_down(node)
+        await websocket.close(code=SERVICE_RESTART, reason="Node down")
+        return
+
+    sent: list[str] = []
+
+    async def client_to_node():
+        while True:
+            text = await websocket.receive_text()
+            try:
+                sent.append(json.loads(text).get("message", ""))
+            except (ValueError, AttributeError):
+                sent.append("")
+            await upstream.send(text)
+
+    async def node_to_client():
+        async for text in upstream:
+            await websocket.send_text(text)
+            frame = json.loads(text)
+            if frame.get("event") == "done" and sent:
+                _router.record(
+                    session_id,
+                    sent.pop(0),
+                    frame["reply"],
+                    closed=frame.get("summary") is not None,
+                )
+            elif frame.get("event") == "error" and sent:
+                sent.pop(0)
+
+    from_client = asyncio.ensure_future(client_to_node())
+    from_node = asyncio.ensure_future(node_to_client())
+    done, pending = await asyncio.wait(
+        {from_client, from_node}, return_when=asyncio.FIRST_COMPLETED
+    )
+    for task in pending:
+        task.cancel()
+    await upstream.close()
+    if from_client in done and isinstance(
+        from_client.exception(), WebSocketDisconnect
+    ):
+        return
+    if from_node in done and upstream.close_code == CLOSED_SESSION:
+        # The session's intake is closed; reconnecting would not help.
+        await websocket.close(
+            code=CLOSED_SESSION, reason=upstream.close_reason or ""
+        )
+        return
+    # The node closed the connection or died mid-intake.
+    error = next((t.exception() for t in done if t.exception()), None)
+    if isinstance(error, ConnectionClosed) and error.rcvd is None:
+        _router.mark_down(node)
+    try:
+        await websocket.close(code=SERVICE_RESTART)
+    except RuntimeError:
+        pass
+
+
+@app.get("/health")
+async def health():
+    nodes = _router.status()
+    up = sum(n["healthy"] for n in nodes.values())
+    return {"status": "ok" if up else "degraded", "nodes": nodes}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    return PlainTextResponse(
+        metrics_module.render(),
+        media_type="text/plain; version=0.0.4",
+    )
+
+
+class DrainRequest(BaseModel):
+    node: str
+    draining: bool = True
+
+
+@app.post("/admin/nodes/drain", dependencies=[Depends(require_admin)])
+async def drain_node(request: DrainRequest):
+    """Stop (or resume) sending new sessions to a node."""
+    node = _router.nodes.get(request.node.rstrip("/"))
+    if node is None:
+        raise HTTPException(status_code=404, detail="Unknown node")
+    node.draining = request.draining
+    return _router.status()[node.url]
+
+
+@app.get("/", include_in_schema=False)
+async def index(request: Request):
+    return static_files.index_response(request.headers)
+
+
+static_files = AssetStaticFiles(directory="static")
+app.mount("/static", static_files, name="static")
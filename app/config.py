@@ -1,19 +1,103 @@
+from dataclasses import dataclass
 from pathlib import Path
+from typing import Literal
 
+from pydantic import field_validator
 from pydantic_settings import BaseSettings
 
 
+@dataclass(frozen=True)
+class ModelVariant:
+    path: Path
+    hf_path: str
+    # None keeps the weights in bfloat16.
+    q_bits: int | None = None
+
+
+# Built by scripts/build_model_variants.py; ``model_path`` accepts a name.
+MODEL_VARIANTS = {
+    "qwen2.5-3b": ModelVariant(
+        Path("models/qwen2.5-3b"), "Qwen/Qwen2.5-3B-Instruct"
+    ),
+    "qwen2.5-3b-8bit": ModelVariant(
+        Path("models/qwen2.5-3b-8bit"), "Qwen/Qwen2.5-3B-Instruct", 8
+    ),
+    "qwen2.5-3b-4bit": ModelVariant(
+        Path("models/qwen2.5-3b-4bit"), "Qwen/Qwen2.5-3B-Instruct", 4
+    ),
+    "qwen2.5-7b-4bit": ModelVariant(
+        Path("models/qwen2.5-7b-4bit"), "Qwen/Qwen2.5-7B-Instruct", 4
+    ),
+}
+
+
 class Settings(BaseSettings):
     model_config = {"env_prefix": "INTAKE_BOT_"}
 
     app_name: str = "Office Hours Intake Bot"
     model_path: Path = Path("models/qwen2.5-3b")
+    # LoRA adapters served over the base model: name -> adapter dir, and
+    # each one's share of new sessions ("base" is the bare model).
+    adapters: dict[str, Path] = {}
+    adapter_weights: dict[str, float] = {}
+    inference_backend: Literal["mlx", "fake"] = "mlx"
+    # "onnx" embeds chat messages and retrieval queries with the int8
+    # ONNX export in onnx_embed_path (scripts/export_onnx_embedder.py)
+    # instead of PyTorch; documents are embedded by PyTorch either way.
+    query_embed_backend: Literal["torch", "onnx"] = "torch"
+    onnx_embed_path: Path = Path("models/all-MiniLM-L6-v2-onnx-int8")
+    fake_prefill_tps: float = 600.0
+    fake_decode_tps: float = 30.0
+    fake_reply_tokens: int = 40
     max_turns: int = 10
     host: str = "0.0.0.0"
     port: int = 8000
     chroma_db_path: Path = Path("chroma_db")
     rag_corpus_path: Path = Path("rag-corpus")
     rag_top_k: int = 3
+    # Indexing: chunks per embedding batch, CPU processes that embed
+    # (0 embeds in this one), and the on-disk cache of chunk embeddings
+    # that lets rebuilds skip unchanged text (None disables it).
+    embed_batch_size: int = 64
+    embed_workers: int = 0
+    embed_cache_path: Path | None = Path("embed_cache.sqlite3")
+    response_cache_size: int = 1024
+    response_cache_ttl: float = 3600.0
+    # Memory governor (app.memory): the budget for everything it counts
+    # (None only measures), how often it sweeps, and seconds unused
+    # before the embedding model is unloaded (None keeps it loaded).
+    memory_budget_mb: float | None = None
+    memory_sweep_interval: float = 5.0
+    embedder_idle_unload: float | None = None
+    # Split mode: API workers use the model, embeddings, RAG index and
+    # sessions of one model server (python -m app.model_server) on this
+    # Unix socket, waiting up to model_server_timeout s for it at start.
+    model_server_socket: Path | None = None
+    model_server_timeout: float = 300.0
+    # Seconds a background inference job may wait before it is served
+    # ahead of newer chat turns.
+    scheduler_max_wait: float = 30.0
+    # Watch docs/system-prompt.md and the corpus, reloading on change.
+    hot_reload: bool = False
+    session_log_path: Path = Path("logs/sessions.log")
+    session_flush_interval: float = 0.05
+    session_flush_batch: int = 256
+    trace_log_path: Path = Path("logs/traces.jsonl")
+    profile_dir: Path = Path("logs/profiles")
+    admin_token: str | None = None
+    # Front router (app.cluster): inference node base URLs, how often
+    # their /health is polled, failed polls before a node is taken out,
+    # and the queued jobs at which a node stops taking new sessions.
+    cluster_nodes: list[str] = []
+    cluster_poll_interval: float = 2.0
+    cluster_max_failures: int = 2
+    cluster_max_load: float = 8.0
+
+    @field_validator("model_path", mode="before")
+    @classmethod
+    def _resolve_variant(cls, value):
+        variant = MODEL_VARIANTS.get(str(value))
+        return variant.path if variant is not None else value
 
 
 settings = Settings()
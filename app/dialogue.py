@@ -0,0 +1,301 @@
+"""Dialogue state tracking and rule-based summary slot filling.
+
+Most IntakeSummary fields are answers to the intake flow's menu
+questions. ``DialogueState`` replays a session's messages: each
+assistant turn is classified by the question it asks, and the
+student's reply is parsed as the answer to that question. Course,
+category, subcategory, artifact and self-assessment are therefore
+known deterministically by the time the student confirms the
+reflection.
+
+On the closing turn the model only writes ``issue_description`` and
+``professor_prep_note`` (see ``SLOT_INSTRUCTION``); ``build_summary``
+fills everything else from the tracked state.
+"""
+
+import json
+import re
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+
+from app.extraction import repair_json
+from app.summary import CourseType, IntakeSummary
+
+SLOT_INSTRUCTION = (
+    "The intake is complete. Do not reply to the visitor. Write only a "
+    'JSON object with two keys: "issue_description" (a 2-4 sentence '
+    "summary of the visitor's issue in your own words) and "
+    '"professor_prep_note" (1-3 sentences on what Dr. Francom should '
+    "prepare)."
+)
+
+# Added to the prep note, without diagnostic language, when the student
+# was pointed to support resources (docs/dialogue-flow.md, edge cases).
+CONCERN_NOTE = (
+    "The student mentioned having a difficult time during the intake "
+    "and was given counseling resources; a brief check-in may help."
+)
+
+# Question an assistant turn asks, checked in order (the reflection
+# repeats the confidence wording, so "confirm" must win).
+_QUESTIONS = [
+    ("confirm", r"does that (sound right|cover it)"),
+    ("course", r"1\.\s*SPA 212-T"),
+    ("category", r"what area do you need help with"),
+    ("grammar_topic", r"which grammar topic"),
+    ("composition_part", r"what part of the composition"),
+    ("exam", r"which exam"),
+    ("artifact", r"specific assignment or exercise"),
+    ("confidence", r"totally lost"),
+    ("describe", r"what you'd like to discuss"),
+    ("prepare", r"have ready or review"),
+    ("detail", r"tell me a bit more"),
+]
+
+_COURSE_ANSWERS = [
+    (CourseType.non_course, r"^\s*3\b|something else|not (about )?a course"),
+    (CourseType.other_course, r"^\s*2\b|another|different|other course"),
+    (CourseType.spa_212, r"^\s*1\b|212"),
+]
+
+_CATEGORY_ANSWERS = [
+    ("composition", r"writing|composici|essay|escritura"),
+    ("assignment_instructions", r"instructions"),
+    ("exam_prep", r"exam|midterm|final|quiz"),
+    ("interview_prep", r"interview"),
+    ("oral_presentation", r"presentation"),
+    ("vocabulary", r"vocab"),
+    ("grammar", r"grammar|verb|conjugat|tense"),
+    ("cultural_content", r"cultur"),
+    ("literary_comprehension", r"reading|literary|story|poem|novel"),
+    ("general", r"general question"),
+]
+
+_GRAMMAR_ANSWERS = [
+    ("ser_estar", r"\bser\b|estar"),
+    ("preterite_imperfect", r"preterite|imperfect"),
+    ("subjunctive_formation", r"subjunctive.*(conjugat|form)"),
+    ("subjunctive_triggers", r"subjunctive"),
+    ("commands_formal", r"\bformal|usted"),
+    ("commands_informal", r"command"),
+    ("object_pronouns_double", r"double|two together"),
+    ("object_pronouns", r"pronoun"),
+    ("gustar_verbs", r"gustar"),
+    ("conditional", r"conditional"),
+    ("si_clauses", r"\bsi clause|if-then"),
+    ("future_tense", r"future"),
+    ("adverbial_clauses", r"clause"),
+]
+
+_COMPOSITION_ANSWERS = [
+    ("composition_thesis", r"prompt|instructions"),
+    ("composition_organization", r"organiz|thesis|ideas"),
+    ("composition_grammar", r"grammar"),
+]
+
+# Categories whose SPA 212-T taxonomy has a single topic.
+_DEFAULT_SUBCATEGORY = {
+    "literary_comprehension": "literary_analysis",
+    "cultural_content": "cultural_context",
+}
+
+_CONFIDENCE_ANSWERS = [
+    ("just_checking", r"confirm|right track|checking|make sure"),
+    ("mostly_ok", r"mostly|specific question|understand most"),
+    ("lost", r"lost|no idea|where to (start|begin)"),
+    ("struggling", r"struggl|mistakes|sort of|kind of"),
+]
+
+_ARTIFACT = re.compile(
+    r"\b(ED \d+|Escritura I{1,3}|Chapter \d+(?: \w+)?|"
+    r"Exam \d(?:/Final)?(?:: Chapters \d-\d)?)",
+    re.IGNORECASE,
+)
+_EXAMS = {
+    "1": "Exam 1: Chapters 1-2",
+    "2": "Exam 2: Chapters 3-4",
+    "3": "Exam 3/Final: Chapters 5-6",
+}
+_NO = re.compile(r"^\s*(no|nope|nothing|not really|none)\b", re.IGNORECASE)
+_CONCERN = re.compile(r"Counseling Center")
+_CORRECTION = re.compile(r"\b(no|not quite|actually|but|wrong)\b", re.I)
+
+
+def _match(text: str, answers: list[tuple]) -> object | None:
+    for value, pattern in answers:
+        if re.search(pattern, text, re.IGNORECASE):
+            return value
+    return None
+
+
+@dataclass(slots=True)
+class DialogueState:
+    """Summary slots filled so far from the student's answers."""
+
+    course: CourseType | None = None
+    issue_category: str | None = None
+    issue_subcategory: str | None = None
+    specific_artifact: str | None = None
+    student_self_assessment: str | None = None
+    turn_count: int = 0
+    # Question the bot asked last, awaiting the student's answer.
+    pending: str | None = "course"
+    # Question the latest student message answered.
+    answered: str | None = None
+    confirmed: bool = False
+    # The student was pointed to counseling resources during the intake.
+    concern: bool = False
+    answers: list[str] = field(default_factory=list)
+
+    @classmethod
+    def from_messages(cls, messages: list[dict]) -> "DialogueState":
+        state = cls()
+        for message in messages:
+            state.update(message["role"], message["content"])
+        return state
+
+    def update(self, role: str, content: str) -> None:
+        if role == "assistant":
+            if _CONCERN.search(content):
+                self.concern = True
+            self.pending = next(
+                (
+                    step
+                    for step, pattern in _QUESTIONS
+                    if re.search(pattern, content, re.IGNORECASE)
+                ),
+                None,
+            )
+        elif role == "user":
+            self.turn_count += 1
+            self.answers.append(content)
+            self.answered = self.pending
+            self._answer(content)
+            self.pending = None
+
+    def _answer(self, text: str) -> None:
+        step = self.pending
+        if step == "course" or (step is None and self.course is None):
+            self.course = _match(text, _COURSE_ANSWERS) or self.course
+            if self.course is CourseType.non_course:
+                self.issue_category = "general"
+        elif step == "category":
+            self.issue_category = _match(text, _CATEGORY_ANSWERS) or "other"
+            self.issue_subcategory = _DEFAULT_SUBCATEGORY.get(
+                self.issue_category
+            )
+        elif step == "detail" and self.issue_category == "other":
+            # "Something else" is refined by the follow-up description.
+            self.issue_category = _match(text, _CATEGORY_ANSWERS) or "other"
+        elif step == "grammar_topic":
+            self.issue_subcategory = _match(text, _GRAMMAR_ANSWERS)
+        elif step == "composition_part":
+            self.issue_subcategory = _match(text, _COMPOSITION_ANSWERS)
+        elif step == "exam":
+            number = re.search(r"\b([123])\b|final", text, re.IGNORECASE)
+            if number:
+                self.specific_artifact = _EXAMS[number.group(1) or "3"]
+        elif step == "artifact" and _NO.search(text):
+            return
+        elif step == "artifact":
+            # Short answers are the artifact name itself; in longer ones
+            # look for a recognizable name.
+            found = _ARTIFACT.search(text)
+            if len(text) <= 40 or not found:
+                self.specific_artifact = text.strip().rstrip(".!")
+            else:
+                self.specific_artifact = found.group(0)
+        elif step == "confidence":
+            self.student_self_assessment = _match(text, _CONFIDENCE_ANSWERS)
+        elif step == "confirm":
+            self.confirmed = not _CORRECTION.search(text)
+        elif step == "prepare":
+            self.confirmed = True
+
+        if self.specific_artifact is None and step != "artifact":
+            found = _ARTIFACT.search(text)
+            if found and self.course is not CourseType.non_course:
+                self.specific_artifact = found.group(0)
+
+    @property
+    def complete(self) -> bool:
+        """Whether every slot the summary requires has been filled."""
+        return self.course is not None and self.issue_category is not None
+
+    def ready_to_close(self, max_turns: int) -> bool:
+        return self.complete and (
+            self.confirmed or self.turn_count >= max_turns
+        )
+
+
+def build_summary(
+    state: DialogueState,
+    *,
+    session_id: str,
+    booking_ref: str,
+    appointment_datetime: datetime,
+    issue_description: str,
+    professor_prep_note: str,
+    now: datetime | None = None,
+) -> IntakeSummary:
+    """Fill the summary from tracked slots plus the two free-text fields."""
+    course_flow = state.course is not CourseType.non_course
+    if state.concern:
+        professor_prep_note = f"{professor_prep_note} {CONCERN_NOTE}"
+    return IntakeSummary(
+        session_id=session_id,
+        booking_ref=booking_ref,
+        appointment_datetime=appointment_datetime,
+        course=state.course,
+        issue_category=state.issue_category,
+        issue_subcategory=(
+            state.issue_subcategory
+            if state.course is CourseType.spa_212
+            else None
+        ),
+        specific_artifact=state.specific_artifact,
+        issue_description=issue_description,
+        student_self_assessment=(
+            state.student_self_assessment if course_flow else None
+        ),
+        professor_prep_note=professor_prep_note,
+        turn_count=min(max(state.turn_count, 1), 10),
+        created_at=now or datetime.now(tz=timezone.utc),
+    )
+
+
+def parse_free_text(text: str, state: DialogueState) -> tuple[str, str]:
+    """Read the model's two free-text fields, tolerating loose output.
+
+    Falls back to the student's own words, so a malformed reply never
+    blocks the summary.
+    """
+    match = re.search(r"\{.*\}?", text, re.DOTALL)
+    fields = {}
+    if match:
+        try:
+            fields = json.loads(repair_json(match.group(0)))
+        except json.JSONDecodeError:
+            fields = {}
+    if not isinstance(fields, dict):
+        fields = {}
+    description = str(fields.get("issue_description") or "").strip()
+    prep_note = str(fields.get("professor_prep_note") or "").strip()
+    if not description and match is None:
+        description = text.strip()
+    if not description and state.answers:
+        description = max(state.answers, key=len).strip()
+    if not prep_note:
+        topic = state.issue_subcategory or state.issue_category or "general"
+        prep_note = f"Prepare for a {topic.replace('_', ' ')} discussion."
+    return description or "Visitor did not describe the issue.", prep_note
+
+
+def closing_message(summary: IntakeSummary) -> str:
+    """The visitor-facing closing turn: sign-off plus the summary JSON."""
+    when = summary.appointment_datetime.strftime("%A, %B %d at %I:%M %p")
+    return (
+        "Thanks for sharing all of that! I'll send a summary to "
+        "Dr. Francom so he can prepare for your appointment. "
+        f"See you on {when}!\n\n{summary.model_dump_json(indent=2)}"
+    )
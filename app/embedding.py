@@ -0,0 +1,227 @@
+"""Batched chunk embedding for indexing, with an on-disk cache.
+
+Re-indexing used to embed every chunk of every changed file, and a new
+Chroma directory or chunking setting meant embedding the whole corpus
+again even though most chunk texts were unchanged. ``embed_texts``
+embeds chunks in batches of ``embed_batch_size`` and keeps every
+embedding in an ``EmbeddingCache``: a SQLite table keyed by the
+embedding model id and a hash of the exact text embedded. A rebuild
+only pays for text the model has never seen.
+
+On a CPU-only host ``embed_workers`` > 1 spreads the batches over that
+many spawned processes, each loading its own copy of the model (and
+its memory, for the length of the build) with an even share of the
+cores.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections.abc import Callable, Sequence
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import AbstractContextManager
+from dataclasses import dataclass
+from multiprocessing import get_context
+from pathlib import Path
+
+import numpy as np
+
+from app.config import settings
+from app.metrics import CACHE_HITS, CACHE_MISSES
+
+
+def text_hash(text: str) -> str:
+    return hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
+
+
+class EmbeddingCache:
+    """Embeddings on disk, keyed by (model id, text hash)."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "model TEXT NOT NULL, hash TEXT NOT NULL, vector BLOB NOT NULL, "
+            "PRIMARY KEY (model, hash))"
+        )
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute(
+                "SELECT COUNT(*) FROM embeddings"
+            ).fetchone()[0]
+
+    def get_many(
+        self, model_id: str, hashes: Sequence[str]
+    ) -> dict[str, list[float]]:
+        found = {}
+        with self._lock:
+            # Stay under SQLite's limit on bound parameters.
+            for i in range(0, len(hashes), 500):
+                batch = hashes[i : i + 500]
+                rows = self._db.execute(
+                    "SELECT hash, vector FROM embeddings WHERE model = ? "
+                    f"AND hash IN ({','.join('?' * len(batch))})",
+                    (model_id, *batch),
+                )
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, np.float32).tolist()
+        return found
+
+    def put_many(
+        self, model_id: str, items: Sequence[tuple[str, list[float]]]
+    ) -> None:
+        with self._lock, self._db:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?)",
+                (
+                    (model_id, key, np.asarray(v, np.float32).tobytes())
+                    for key, v in items
+                ),
+            )
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+@dataclass(slots=True)
+class EmbeddingReport:
+    """What one ``embed_texts`` call cost.
+
+    ``embedded`` counts distinct texts, so repeated chunks make it less
+    than ``chunks - cached``.
+    """
+
+    chunks: int
+    cached: int
+    embedded: int
+    seconds: float
+
+    @property
+    def chunks_per_second(self) -> float:
+        return self.chunks / self.seconds if self.seconds else float("inf")
+
+
+def embed_texts(
+    texts: Sequence[str],
+    model,
+    model_id: str,
+    cache: EmbeddingCache | None = None,
+    batch_size: int | None = None,
+    workers: int | None = None,
+    batch_slot: Callable[[], AbstractContextManager] | None = None,
+) -> tuple[list[list[float]], EmbeddingReport]:
+    """Embed ``texts`` with ``model``, reusing and filling ``cache``.
+
+    ``model`` is any llama-index embedding; with ``workers`` > 1 the
+    worker processes load ``model_id`` themselves instead. The batch
+    size and workers default to the settings. Identical texts are
+    embedded once. Each finished batch is cached right away, so an
+    interrupted build keeps what it paid for.
+
+    ``batch_slot()`` is entered around each in-process batch, e.g. to
+    take a scheduler slot per batch so chat turns run in between.
+    Worker processes embed on the CPU and do not take it.
+    """
+    if batch_size is None:
+        batch_size = settings.embed_batch_size
+    if workers is None:
+        workers = settings.embed_workers
+    start = time.perf_counter()
+    hashes = [text_hash(text) for text in texts]
+    found = cache.get_many(model_id, list(set(hashes))) if cache else {}
+    cached = sum(1 for key in hashes if key in found)
+    missing: dict[str, str] = {}
+    for key, text in zip(hashes, texts):
+        if key not in found:
+            missing.setdefault(key, text)
+
+    keys = list(missing)
+    batches = [
+        keys[i : i + batch_size] for i in range(0, len(keys), batch_size)
+    ]
+    for batch, vectors in zip(
+        batches,
+        _run_batches(batches, missing, model, model_id, workers, batch_slot),
+    ):
+        if cache is not None:
+            cache.put_many(model_id, list(zip(batch, vectors)))
+        found.update(zip(batch, vectors))
+
+    CACHE_HITS.inc("embedding", amount=cached)
+    CACHE_MISSES.inc("embedding", amount=len(missing))
+    report = EmbeddingReport(
+        chunks=len(texts),
+        cached=cached,
+        embedded=len(missing),
+        seconds=time.perf_counter() - start,
+    )
+    return [found[key] for key in hashes], report
+
+
+def _run_batches(
+    batches, texts_by_key, model, model_id, workers, batch_slot=None
+):
+    """Yield each batch's vectors, in order."""
+    texts = ([texts_by_key[key] for key in batch] for batch in batches)
+    if workers <= 1 or len(batches) <= 1:
+        for batch in texts:
+            if batch_slot is None:
+                vectors = model.get_text_embedding_batch(batch)
+            else:
+                with batch_slot():
+                    vectors = model.get_text_embedding_batch(batch)
+            yield vectors
+        return
+    workers = min(workers, len(batches))
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    # Spawned, not forked: torch's thread pools do not survive a fork.
+    with ProcessPoolExecutor(
+        workers,
+        mp_context=get_context("spawn"),
+        initializer=_start_worker,
+        initargs=(model_id, len(batches[0]), threads),
+    ) as pool:
+        yield from pool.map(_embed_in_worker, texts)
+
+
+_worker_model = None
+
+
+def _start_worker(model_id: str, batch_size: int, threads: int) -> None:
+    global _worker_model
+    import torch
+    from llama_index.core.embeddings.utils import resolve_embed_model
+
+    torch.set_num_threads(threads)
+    _worker_model = resolve_embed_model(model_id)
+    _worker_model.embed_batch_size = batch_size
+
+
+def _embed_in_worker(texts: list[str]) -> list[list[float]]:
+    return _worker_model.get_text_embedding_batch(texts)
+
+
+_cache: EmbeddingCache | None = None
+_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> EmbeddingCache | None:
+    """The cache at ``settings.embed_cache_path``, opened on first use."""
+    global _cache
+    path = settings.embed_cache_path
+    if path is None:
+        return None
+    with _cache_lock:
+        if _cache is None or _cache.path != path:
+            if _cache is not None:
+                _cache.close()
+            _cache = EmbeddingCache(path)
+        return _cache
@@ -0,0 +1,340 @@
+"""Pull the IntakeSummary out of the closing assistant turn.
+
+The closing turn is prose followed by a JSON object. ``SummaryExtractor``
+is fed decoded text as it streams: it finds the opening brace, tracks
+nesting (string- and escape-aware) one chunk at a time, and validates
+the object the moment its closing brace arrives, so a well-formed
+summary is ready as soon as generation ends.
+
+Malformed output is repaired in tiers, cheapest first:
+
+1. ``local``: fix the JSON text (trailing commas, Python literals, raw
+   newlines in strings, truncation) without touching its content.
+2. ``fields``: coerce near-miss values (enum case and spacing, numeric
+   strings, out-of-range turn counts).
+3. ``redecode``: ask the model to continue from the longest valid
+   prefix of the object. Only the broken tail is regenerated, not the
+   whole closing turn, and only when a callback is supplied.
+"""
+
+import json
+import logging
+from collections.abc import Callable
+from dataclasses import dataclass
+
+from pydantic import TypeAdapter, ValidationError
+
+from app.metrics import SUMMARY_EXTRACTIONS
+from app.summary import CourseType, IntakeSummary, IssueCategory, SelfAssessment
+
+logger = logging.getLogger(__name__)
+
+# Building a TypeAdapter compiles the validator; do it once per process.
+SUMMARY_ADAPTER = TypeAdapter(IntakeSummary)
+_SUMMARY_LIST_ADAPTER = TypeAdapter(list[IntakeSummary])
+
+_LITERALS = {"None": "null", "True": "true", "False": "false"}
+_ENUM_FIELDS = {
+    "course": CourseType,
+    "issue_category": IssueCategory,
+    "student_self_assessment": SelfAssessment,
+}
+_NULLABLE_FIELDS = (
+    "issue_subcategory",
+    "specific_artifact",
+    "student_self_assessment",
+)
+
+
+@dataclass(slots=True)
+class Extraction:
+    summary: IntakeSummary | None
+    prose: str
+    raw: str | None
+    # None when the output validated as generated, else the repair tier.
+    repair: str | None = None
+    error: str | None = None
+
+
+class SummaryExtractor:
+    """Incrementally locate and parse the JSON summary in a text stream."""
+
+    def __init__(self, validate: bool = True):
+        self._validate = validate
+        self._prose: list[str] = []
+        self._json: list[str] = []
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self.started = False
+        self.complete = False
+        self.summary: IntakeSummary | None = None
+        self.error: str | None = None
+
+    @property
+    def prose(self) -> str:
+        return "".join(self._prose)
+
+    @property
+    def raw(self) -> str | None:
+        return "".join(self._json) if self.started else None
+
+    def feed(self, text: str) -> bool:
+        """Consume a decoded chunk; return True once the object closed."""
+        if self.complete:
+            return True
+        if not self.started:
+            start = text.find("{")
+            if start < 0:
+                self._prose.append(text)
+                return False
+            self._prose.append(text[:start])
+            self.started = True
+            text = text[start:]
+
+        for i, ch in enumerate(text):
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch == "{":
+                self._depth += 1
+            elif ch == "}":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._json.append(text[: i + 1])
+                    self.complete = True
+                    if self._validate:
+                        self.validate()
+                    return True
+        self._json.append(text)
+        return False
+
+    def validate(self) -> None:
+        try:
+            self.summary = SUMMARY_ADAPTER.validate_json(self.raw)
+        except ValidationError as e:
+            self.error = str(e)
+
+    def finish(
+        self, redecode: Callable[[str], str] | None = None
+    ) -> Extraction:
+        """Return the summary, repairing the output if necessary.
+
+        ``redecode(prefix)`` must return the model's continuation of the
+        assistant turn ``prefix``; it is only called when the cheaper
+        repairs fail.
+        """
+        if not self.started:
+            return Extraction(None, self.prose, None)
+        if self.summary is not None:
+            SUMMARY_EXTRACTIONS.inc("clean")
+            return Extraction(self.summary, self.prose, self.raw)
+
+        result = repair(self.raw)
+        if result.summary is None and redecode is not None:
+            prefix = resume_prefix(self.raw)
+            continuation = redecode(self.prose + prefix)
+            retried = SummaryExtractor()
+            retried.feed(prefix + continuation)
+            if retried.summary is not None:
+                result = Extraction(
+                    retried.summary, "", retried.raw, repair="redecode"
+                )
+            elif retried.started:
+                result = repair(retried.raw)
+                if result.summary is not None:
+                    result.repair = "redecode"
+
+        result.prose = self.prose
+        SUMMARY_EXTRACTIONS.inc(result.repair or "failed")
+        if result.summary is None:
+            logger.warning("Could not extract summary: %s", result.error)
+        return result
+
+
+def extract_summary(
+    text: str, redecode: Callable[[str], str] | None = None
+) -> Extraction:
+    """Extract the summary from a complete closing turn."""
+    extractor = SummaryExtractor()
+    extractor.feed(text)
+    return extractor.finish(redecode)
+
+
+def extract_many(texts: list[str]) -> list[Extraction]:
+    """Extract summaries from many outputs with one bulk validation.
+
+    Well-formed outputs are validated together in a single call; only
+    the ones that fail fall back to per-item validation and repair.
+    """
+    extractors = []
+    for text in texts:
+        extractor = SummaryExtractor(validate=False)
+        extractor.feed(text)
+        extractors.append(extractor)
+
+    closed = [e for e in extractors if e.complete]
+    try:
+        summaries = _SUMMARY_LIST_ADAPTER.validate_json(
+            "[" + ",".join(e.raw for e in closed) + "]"
+        )
+    except ValidationError:
+        summaries = None
+    for i, extractor in enumerate(closed):
+        if summaries is not None:
+            extractor.summary = summaries[i]
+        else:
+            extractor.validate()
+    return [e.finish() for e in extractors]
+
+
+def repair(raw: str) -> Extraction:
+    """Try the local and field-level repair tiers on a raw object."""
+    fixed = repair_json(raw)
+    try:
+        data = json.loads(fixed)
+    except json.JSONDecodeError as e:
+        return Extraction(None, "", raw, error=str(e))
+    try:
+        summary = SUMMARY_ADAPTER.validate_python(data)
+        return Extraction(summary, "", fixed, repair="local")
+    except ValidationError:
+        pass
+    if not isinstance(data, dict):
+        return Extraction(None, "", raw, error="summary is not an object")
+    try:
+        summary = SUMMARY_ADAPTER.validate_python(coerce_fields(data))
+        return Extraction(summary, "", fixed, repair="fields")
+    except ValidationError as e:
+        return Extraction(None, "", raw, error=str(e))
+
+
+def repair_json(raw: str) -> str:
+    """Fix common syntax slips in model-written JSON.
+
+    Outside strings: drop trailing commas and map Python literals. Inside
+    strings: escape raw newlines. Truncated output is closed off, after
+    dropping a dangling object key that never got its value.
+    """
+    out: list[str] = []
+    stack: list[str] = []
+    # Index in ``out`` just after the last "{" or "," outside strings.
+    member_start = 0
+    in_string = escape = False
+    i = 0
+    while i < len(raw):
+        ch = raw[i]
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+            elif ch == "\n":
+                ch = "\\n"
+            out.append(ch)
+        elif ch == '"':
+            in_string = True
+            out.append(ch)
+        elif ch in "{[":
+            stack.append("}" if ch == "{" else "]")
+            out.append(ch)
+            member_start = len(out)
+        elif ch in "}]":
+            _strip_trailing_comma(out)
+            if stack:
+                stack.pop()
+            out.append(ch)
+        elif ch.isalpha():
+            end = i
+            while end < len(raw) and raw[end].isalpha():
+                end += 1
+            word = raw[i:end]
+            out.append(_LITERALS.get(word, word))
+            i = end
+            continue
+        else:
+            out.append(ch)
+            if ch == ",":
+                member_start = len(out)
+        i += 1
+
+    if stack:
+        if in_string:
+            out.append('"')
+        if stack[-1] == "}" and ":" not in "".join(out[member_start:]):
+            del out[member_start:]
+        _strip_trailing_comma(out)
+        if "".join(out).rstrip().endswith(":"):
+            out.append(" null")
+        out.extend(reversed(stack))
+    return "".join(out)
+
+
+def _strip_trailing_comma(out: list[str]) -> None:
+    j = len(out) - 1
+    while j >= 0 and out[j].isspace():
+        j -= 1
+    if j >= 0 and out[j] == ",":
+        del out[j]
+
+
+def coerce_fields(data: dict) -> dict:
+    """Coerce near-miss field values to what IntakeSummary accepts."""
+    data = dict(data)
+    for field in _NULLABLE_FIELDS:
+        value = data.get(field)
+        if isinstance(value, str) and value.strip().lower() in (
+            "",
+            "null",
+            "none",
+            "n/a",
+        ):
+            data[field] = None
+    for field, enum in _ENUM_FIELDS.items():
+        value = data.get(field)
+        if not isinstance(value, str):
+            continue
+        key = value.strip().lower().replace(" ", "_").replace("-", "_")
+        for member in enum:
+            normalized = member.value.lower().replace(" ", "_")
+            if key == normalized.replace("-", "_"):
+                data[field] = member.value
+    turn_count = data.get("turn_count")
+    if isinstance(turn_count, str) and turn_count.strip().isdigit():
+        turn_count = int(turn_count)
+    if isinstance(turn_count, int):
+        data["turn_count"] = min(max(turn_count, 1), 10)
+    return data
+
+
+def resume_prefix(raw: str) -> str:
+    """The longest prefix of ``raw`` the model can safely continue from.
+
+    Keeps every complete top-level member that parses and validates on
+    its own, and ends just after the last one so the model writes the
+    remaining fields and the closing brace.
+    """
+    try:
+        data = json.loads(repair_json(raw))
+    except json.JSONDecodeError:
+        data = None
+    if isinstance(data, dict):
+        try:
+            SUMMARY_ADAPTER.validate_python(data)
+            bad = set()
+        except ValidationError as e:
+            bad = {err["loc"][0] for err in e.errors() if err["loc"]}
+        kept = {k: v for k, v in data.items() if k not in bad}
+    else:
+        kept = {}
+    if not kept:
+        return "{\n  "
+    return json.dumps(kept, indent=2)[:-2] + ",\n  "
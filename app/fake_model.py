@@ -0,0 +1,80 @@
+"""Deterministic stand-in for the MLX model, for load tests and CI.
+
+Selected with ``INTAKE_BOT_INFERENCE_BACKEND=fake``. It needs no model
+weights or Apple Silicon, but keeps the timing shape of real inference:
+prefill sleeps in proportion to prompt length and decode emits one
+token per ``1 / fake_decode_tps`` seconds. Because it is scheduled
+like the real model, queueing behaves realistically under concurrent
+load.
+"""
+
+import time
+import zlib
+from dataclasses import dataclass
+
+from app.config import settings
+
+REPLIES = [
+    "Thanks for sharing that! Which part is giving you the most trouble?",
+    "Got it. Is there a specific assignment or exercise connected to this?",
+    "On a scale from totally lost to just checking, where would you put "
+    "yourself?",
+    "Here's what I'm hearing so far. Does that sound right, or would you "
+    "like to add anything?",
+]
+
+
+class FakeModel:
+    pass
+
+
+class FakeTokenizer:
+    bos_token = None
+
+    def apply_chat_template(self, messages, tokenize=False, **kwargs):
+        text = "\n".join(f"{m['role']}: {m['content']}" for m in messages)
+        return text + "\nassistant:"
+
+    def encode(self, text: str, **kwargs) -> list[int]:
+        return [zlib.crc32(word.encode()) & 0xFFFF for word in text.split()]
+
+
+@dataclass(slots=True)
+class FakeResponse:
+    text: str
+    token: int
+    prompt_tokens: int
+    prompt_tps: float
+    generation_tokens: int
+    generation_tps: float
+    finish_reason: str | None = None
+
+
+def load() -> tuple[FakeModel, FakeTokenizer]:
+    return FakeModel(), FakeTokenizer()
+
+
+def stream_generate(model, tokenizer, prompt, max_tokens: int = 256, **kw):
+    """Yield a canned reply with simulated prefill and decode latency."""
+    prompt_tokens = len(prompt)
+    reply = REPLIES[prompt_tokens % len(REPLIES)].split(" ")
+    words = (reply * (settings.fake_reply_tokens // len(reply) + 1))[
+        : min(settings.fake_reply_tokens, max_tokens)
+    ]
+
+    tic = time.perf_counter()
+    time.sleep(prompt_tokens / settings.fake_prefill_tps)
+    prompt_tps = prompt_tokens / max(time.perf_counter() - tic, 1e-9)
+
+    tic = time.perf_counter()
+    for n, word in enumerate(words, start=1):
+        time.sleep(1 / settings.fake_decode_tps)
+        yield FakeResponse(
+            text=word if n == 1 else " " + word,
+            token=n,
+            prompt_tokens=prompt_tokens,
+            prompt_tps=prompt_tps,
+            generation_tokens=n,
+            generation_tps=n / (time.perf_counter() - tic),
+            finish_reason="stop" if n == len(words) else None,
+        )
@@ -0,0 +1,270 @@
+"""Screen student messages before generation.
+
+The edge cases in docs/dialogue-flow.md that need a fixed, safe reply
+(distress or crisis language, off-topic messages in the course flow)
+are caught here and answered from templates, without a model call.
+Two stages, cheapest first:
+
+1. ``KEYWORDS``: an Aho-Corasick automaton over crisis and distress
+   phrases, matched in one pass over the message at word boundaries.
+2. ``PrototypeClassifier``: cosine similarity between the message's
+   all-MiniLM-L6-v2 embedding and a few prototype sentences per label.
+   It reuses the RAG embedding model and only runs once that model is
+   loaded; the embedding is handed on to retrieval, so the stage adds
+   no second embedding pass.
+
+Both stages favor precision: a missed message still reaches the model,
+whose system prompt covers the same edge cases.
+"""
+
+import re
+from collections import deque
+from dataclasses import dataclass
+
+import numpy as np
+
+import app.rag as rag
+from app.dialogue import DialogueState
+from app.summary import CourseType
+
+CRISIS_REPLY = (
+    "It sounds like you're going through a really hard time, and I'm "
+    "glad you said something. If you might be in danger, please call or "
+    "text 988 (Suicide & Crisis Lifeline) or call 911 right now. The WFU "
+    "Counseling Center (336-758-5273) is also there to support you. "
+    "Whenever you're ready, we can keep going with your intake, or stop "
+    "here."
+)
+DISTRESS_REPLY = (
+    "It sounds like you're going through a tough time. The WFU "
+    "Counseling Center (336-758-5273) is a great place to get support. "
+    "If you'd like, we can keep going with your intake for Dr. Francom "
+    "whenever you're ready."
+)
+OFF_TOPIC_REPLY = (
+    "I appreciate you sharing that! If this isn't about a specific "
+    'course, you can go back and pick "Something else" to let '
+    "Dr. Francom know what you'd like to discuss. Otherwise, is there "
+    "something course-related I can help you get ready for?"
+)
+REPLIES = {
+    "crisis": CRISIS_REPLY,
+    "distress": DISTRESS_REPLY,
+    "off_topic": OFF_TOPIC_REPLY,
+}
+
+# Only unambiguous phrases: "lost", "struggling" or "stressed about the
+# exam" are ordinary intake answers and must reach the model.
+KEYWORD_PHRASES = {
+    "kill myself": "crisis",
+    "killing myself": "crisis",
+    "end my life": "crisis",
+    "want to die": "crisis",
+    "wanna die": "crisis",
+    "suicide": "crisis",
+    "suicidal": "crisis",
+    "self harm": "crisis",
+    "self-harm": "crisis",
+    "hurt myself": "crisis",
+    "hurting myself": "crisis",
+    "better off dead": "crisis",
+    "no reason to live": "crisis",
+    "panic attack": "distress",
+    "panic attacks": "distress",
+    "can't stop crying": "distress",
+    "cant stop crying": "distress",
+    "can't cope": "distress",
+    "cant cope": "distress",
+    "mental breakdown": "distress",
+    "nervous breakdown": "distress",
+    "i'm depressed": "distress",
+    "im depressed": "distress",
+    "feel hopeless": "distress",
+    "feeling hopeless": "distress",
+    "family emergency": "distress",
+    "passed away": "distress",
+}
+
+PROTOTYPES = {
+    "distress": [
+        "I'm not doing okay and everything feels like too much right now.",
+        "I've been really anxious and can't sleep or eat.",
+        "I feel completely alone and I don't know who to talk to.",
+        "Things at home are really bad and I can't focus on anything.",
+        "I'm overwhelmed with my life and don't know how to keep going.",
+    ],
+    "off_topic": [
+        "What's the weather going to be like this weekend?",
+        "Can you recommend a good restaurant near campus?",
+        "Who do you think will win the game tonight?",
+        "Tell me a joke.",
+        "What's the best phone to buy right now?",
+        "Can you help me plan my spring break trip?",
+    ],
+    "on_topic": [
+        "I keep mixing up ser and estar.",
+        "I'm confused about when to use the subjunctive.",
+        "I need help organizing my ideas for the composition.",
+        "I'm preparing for the exam on chapters three and four.",
+        "I don't understand the instructions for the assignment.",
+        "The cultural reading in chapter three is confusing.",
+        "I'm totally lost and don't know where to start.",
+        "I want to talk about research opportunities and my major.",
+        "I have a question about my grade in the class.",
+    ],
+}
+# Minimum best-prototype similarity, and lead over "on_topic", needed
+# to route. Set high: a near miss costs one model turn, a false alarm
+# answers a real question with a template.
+THRESHOLDS = {"distress": 0.6, "off_topic": 0.55}
+MARGIN = 0.1
+# Menu picks ("1", "Vocabulary") are on-topic by construction and too
+# short for a meaningful embedding.
+MIN_EMBED_WORDS = 3
+
+
+@dataclass(frozen=True, slots=True)
+class Match:
+    phrase: str
+    label: str
+    start: int
+
+
+class KeywordAutomaton:
+    """Aho-Corasick automaton: every phrase in one pass over the text."""
+
+    def __init__(self, phrases: dict[str, str]):
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail = [0]
+        self._out: list[list[tuple[str, str]]] = [[]]
+        for phrase, label in phrases.items():
+            state = 0
+            for ch in phrase:
+                if ch not in self._goto[state]:
+                    self._goto[state][ch] = len(self._goto)
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                state = self._goto[state][ch]
+            self._out[state].append((phrase, label))
+
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, child in self._goto[state].items():
+                queue.append(child)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(ch, 0)
+                self._out[child] += self._out[self._fail[child]]
+
+    def search(self, text: str) -> list[Match]:
+        """Phrases found in ``text`` (already normalized) at word bounds."""
+        matches = []
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(ch, 0)
+            for phrase, label in self._out[state]:
+                start = i - len(phrase) + 1
+                before = text[start - 1] if start > 0 else " "
+                after = text[i + 1] if i + 1 < len(text) else " "
+                if not before.isalnum() and not after.isalnum():
+                    matches.append(Match(phrase, label, start))
+        return matches
+
+
+KEYWORDS = KeywordAutomaton(KEYWORD_PHRASES)
+
+
+def normalize(text: str) -> str:
+    text = text.lower().replace("’", "'")
+    return re.sub(r"\s+", " ", text)
+
+
+class PrototypeClassifier:
+    """Nearest-prototype labels for message embeddings."""
+
+    def __init__(self, embed_model, prototypes: dict[str, list[str]]):
+        self.labels = []
+        texts = []
+        for label, sentences in prototypes.items():
+            self.labels += [label] * len(sentences)
+            texts += sentences
+        vectors = np.asarray(embed_model.get_text_embedding_batch(texts))
+        self._vectors = vectors / np.linalg.norm(vectors, axis=1)[:, None]
+
+    def scores(self, embedding: list[float]) -> dict[str, float]:
+        """Best cosine similarity to each label's prototypes."""
+        query = np.asarray(embedding)
+        similarity = self._vectors @ (query / np.linalg.norm(query))
+        best: dict[str, float] = {}
+        for label, value in zip(self.labels, similarity.tolist()):
+            best[label] = max(best.get(label, -1.0), value)
+        return best
+
+    def classify(self, embedding: list[float]) -> str | None:
+        scores = self.scores(embedding)
+        on_topic = scores.get("on_topic", -1.0)
+        label = max(THRESHOLDS, key=lambda name: scores.get(name, -1.0))
+        score = scores.get(label, -1.0)
+        if score >= THRESHOLDS[label] and score - on_topic >= MARGIN:
+            return label
+        return None
+
+
+_classifier: PrototypeClassifier | None = None
+
+
+def get_classifier() -> PrototypeClassifier | None:
+    """The prototype classifier, once the query embedding model is loaded."""
+    global _classifier
+    if _classifier is None and rag.query_embed_model_loaded():
+        _classifier = PrototypeClassifier(
+            rag.get_query_embed_model(), PROTOTYPES
+        )
+    return _classifier
+
+
+@dataclass(frozen=True, slots=True)
+class Screening:
+    route: str | None = None
+    source: str | None = None
+    # The message's query embedding, when computed, for retrieval.
+    embedding: list[float] | None = None
+
+    @property
+    def reply(self) -> str | None:
+        return REPLIES.get(self.route)
+
+
+def screen(
+    message: str, state: DialogueState, history: list[dict]
+) -> Screening:
+    """Decide whether ``message`` gets a templated reply.
+
+    ``state`` is the dialogue state including this message; off-topic
+    redirects only apply in the course flow, and only once per session
+    (after that the model closes the intake as the flow describes).
+    """
+    labels = {m.label for m in KEYWORDS.search(normalize(message))}
+    if "crisis" in labels:
+        return Screening("crisis", "keyword")
+    if labels:
+        return Screening("distress", "keyword")
+
+    classifier = get_classifier()
+    if classifier is None or len(message.split()) < MIN_EMBED_WORDS:
+        return Screening()
+    embedding = rag.get_query_embed_model().get_query_embedding(message)
+    label = classifier.classify(embedding)
+    if label == "off_topic" and (
+        state.course not in (CourseType.spa_212, CourseType.other_course)
+        or any(m["content"] == OFF_TOPIC_REPLY for m in history)
+    ):
+        label = None
+    if label is None:
+        return Screening(embedding=embedding)
+    return Screening(label, "embedding", embedding)
@@ -0,0 +1,241 @@
+"""Cancellation and deduplication of in-flight chat turns.
+
+Students on flaky mobile connections close the tab mid-reply or submit
+the same message again, and each attempt used to run a full generation
+that nobody read.
+
+``CancelToken`` is checked by the decode loop before every step; once
+tripped, the generation stops at the next token. ``InflightTurns`` runs
+each turn as a task keyed by session and idempotency key. A retry with
+the same key attaches to the running task instead of generating again,
+and the token trips only when the last client waiting on the turn has
+disconnected. Results of turns submitted with an explicit message id
+are kept for a while, so a retry that arrives after the reply was lost
+gets the same reply without a second turn being recorded; the memory
+governor may drop them early. A message id sent without a session id
+is also mapped to the session its first attempt opened, so the retry
+of a first message whose reply (and new session id) was lost lands in
+that session rather than opening another one.
+
+Seconds saved are counted in ``intake_generation_seconds_saved_total``:
+for a cancelled generation, the typical generation time still ahead of
+it; for a deduplicated retry, the duration of the turn it reused.
+"""
+
+import asyncio
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+from typing import Any
+
+from app.memory import register, sizeof
+from app.metrics import DEDUPLICATED_TURNS, GENERATION_SECONDS_SAVED
+
+# Weight of the newest generation in the typical-duration average.
+EWMA_ALPHA = 0.2
+
+
+class GenerationCancelled(Exception):
+    """Raised by a generation whose cancel token was tripped."""
+
+
+class CancelToken:
+    """A flag shared by a turn's waiters and its decode loop."""
+
+    __slots__ = ("_event",)
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self) -> None:
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+
+_typical_seconds: float | None = None
+_typical_lock = threading.Lock()
+
+
+def record_generation(seconds: float) -> None:
+    """Fold a completed generation into the typical duration."""
+    global _typical_seconds
+    with _typical_lock:
+        if _typical_seconds is None:
+            _typical_seconds = seconds
+        else:
+            _typical_seconds += EWMA_ALPHA * (seconds - _typical_seconds)
+
+
+def record_cancelled(elapsed: float) -> float:
+    """Count the seconds a generation cancelled after ``elapsed`` saved."""
+    saved = max((_typical_seconds or 0.0) - elapsed, 0.0)
+    GENERATION_SECONDS_SAVED.inc("cancelled", amount=saved)
+    return saved
+
+
+def turn_key(
+    session_id: str, turn: int, message: str, message_id: str | None
+) -> str:
+    """Idempotency key of a submitted message.
+
+    Without an explicit ``message_id``, a message is a retry if it has
+    the same text at the same turn of the same session.
+    """
+    if message_id is not None:
+        return f"{session_id}:id:{message_id}"
+    digest = hashlib.blake2b(
+        f"{turn}\0{message}".encode(), digest_size=12
+    ).hexdigest()
+    return f"{session_id}:{digest}"
+
+
+@dataclass(slots=True)
+class _Turn:
+    task: asyncio.Task
+    token: CancelToken
+    started: float = field(default_factory=time.perf_counter)
+    waiters: int = 0
+
+
+class InflightTurns:
+    """Turns being generated, shared by every request that submits them."""
+
+    def __init__(self, max_done: int = 1024):
+        self.max_done = max_done
+        self._running: dict[str, _Turn] = {}
+        # Message ids sent without a session id -> the session opened.
+        self._origins: OrderedDict[str, str] = OrderedDict()
+        # Finished turns with explicit message ids: key -> (result, s).
+        self._done: OrderedDict[str, tuple[Any, float]] = OrderedDict()
+        # Guards _done against the memory governor's sweep thread.
+        self._done_lock = threading.Lock()
+        self.done_bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._running)
+
+    async def run(
+        self,
+        key: str | None,
+        start: Callable[[CancelToken], Awaitable[Any]],
+        remember: bool = False,
+    ):
+        """Run ``start(token)`` once per key and return its result.
+
+        Callers with a key already running (or, with ``remember``,
+        already finished) share that turn's result. Cancelling a caller
+        detaches it; the turn is cancelled once no caller is left.
+        """
+        done = self._remembered(key) if key is not None else None
+        if done is not None:
+            result, seconds = done
+            DEDUPLICATED_TURNS.inc("finished")
+            GENERATION_SECONDS_SAVED.inc("deduplicated", amount=seconds)
+            return result
+
+        turn = self._running.get(key) if key is not None else None
+        if turn is not None and turn.token.cancelled:
+            # Everyone left that turn and it is winding down; start over.
+            turn = None
+        attached = turn is not None
+        if turn is None:
+            token = CancelToken()
+            turn = _Turn(asyncio.ensure_future(start(token)), token)
+            if key is not None:
+                self._running[key] = turn
+            turn.task.add_done_callback(
+                lambda task: self._finish(key, turn, remember)
+            )
+        else:
+            DEDUPLICATED_TURNS.inc("in_flight")
+
+        turn.waiters += 1
+        try:
+            result = await asyncio.shield(turn.task)
+        finally:
+            turn.waiters -= 1
+            if turn.waiters == 0 and not turn.task.done():
+                turn.token.cancel()
+        if attached:
+            GENERATION_SECONDS_SAVED.inc(
+                "deduplicated", amount=time.perf_counter() - turn.started
+            )
+        return result
+
+    def session_for(self, message_id: str) -> str | None:
+        """The session a first message with ``message_id`` opened."""
+        return self._origins.get(message_id)
+
+    def record_origin(self, message_id: str, session_id: str) -> None:
+        """Remember that ``message_id`` opened ``session_id``."""
+        self._origins[message_id] = session_id
+        self._origins.move_to_end(message_id)
+        while len(self._origins) > self.max_done:
+            self._origins.popitem(last=False)
+
+    def stats(self) -> dict:
+        return {
+            "running": len(self._running),
+            "seconds_saved": {
+                reason: round(GENERATION_SECONDS_SAVED.value(reason), 2)
+                for reason in ("cancelled", "deduplicated")
+            },
+        }
+
+    def _finish(self, key: str | None, turn: _Turn, remember: bool) -> None:
+        if key is not None and self._running.get(key) is turn:
+            del self._running[key]
+        # Retrieving the exception also marks it as handled when every
+        # waiter has left.
+        if turn.task.cancelled() or turn.task.exception() is not None:
+            return
+        if remember and key is not None:
+            seconds = time.perf_counter() - turn.started
+            with self._done_lock:
+                if key in self._done:
+                    self._forget(key)
+                self._done[key] = (turn.task.result(), seconds)
+                self.done_bytes += sizeof(key) + sizeof(self._done[key])
+                while len(self._done) > self.max_done:
+                    self._forget(next(iter(self._done)))
+
+    def _remembered(self, key: str) -> tuple[Any, float] | None:
+        with self._done_lock:
+            done = self._done.get(key)
+            if done is not None:
+                self._done.move_to_end(key)
+            return done
+
+    def evict(self, nbytes: int) -> int:
+        """Forget the oldest finished turns until ``nbytes`` are freed."""
+        with self._done_lock:
+            before = self.done_bytes
+            while self._done and before - self.done_bytes < nbytes:
+                self._forget(next(iter(self._done)))
+            return before - self.done_bytes
+
+    def _forget(self, key: str) -> None:
+        self.done_bytes -= sizeof(key) + sizeof(self._done.pop(key))
+
+
+_inflight = InflightTurns()
+
+
+def get_inflight() -> InflightTurns:
+    return _inflight
+
+
+# Evicted before the response cache: retries after a lost reply are
+# rarer than students sharing a menu answer.
+register(
+    "remembered_turns",
+    lambda: _inflight.done_bytes,
+    evict=_inflight.evict,
+    priority=10,
+)
@@ -0,0 +1,383 @@
+"""Client side of the model server's Unix socket protocol.
+
+In split mode (``settings.model_server_socket``) the API runs as several
+stateless uvicorn workers, and one ``app.model_server`` process holds
+everything that must exist exactly once: the model weights, the
+embedding model and RAG index, the inference scheduler and the session
+store. Workers parse and validate requests, screen messages, assemble
+and tokenize prompts and stream replies; they reach the model server
+through the objects here, which stand in for the local ones:
+
+- ``RemoteModel`` is what ``chat.get_model`` returns (with a locally
+  loaded tokenizer), and ``chat._generate`` streams from it;
+- ``RemoteSessionStore`` replaces the session store;
+- ``RemoteEmbedding`` replaces the embedding model, and ``rag`` sends
+  retrieval and re-indexing to the server.
+
+Every message is a frame: a 4-byte big-endian length, then an orjson
+object. A request carries an ``op``; the reply is one frame (an
+``error`` key on failure), except for ``generate``, which answers with
+a ``start`` event once the model is granted, one ``token`` event per
+decoded segment and a final ``done`` event. Prompts cross the socket
+as token ids, so the server never re-tokenizes. The client sends
+nothing while a generation streams; closing the connection cancels it.
+"""
+
+import logging
+import select
+import socket
+import struct
+import threading
+import time
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+
+import orjson
+
+from app.inflight import CancelToken
+from app.sessions import ChatSession, SessionClosed, SessionStore
+
+logger = logging.getLogger(__name__)
+
+HEADER = struct.Struct(">I")
+MAX_FRAME_BYTES = 64 * 1024 * 1024
+# How often a streaming generation checks its cancel token.
+CANCEL_POLL_SECONDS = 0.1
+
+
+class ModelServerError(RuntimeError):
+    """The model server is unreachable or failed a request."""
+
+
+def encode_frame(payload: dict) -> bytes:
+    body = orjson.dumps(payload)
+    if len(body) > MAX_FRAME_BYTES:
+        raise ValueError(f"Frame of {len(body)} bytes is too large")
+    return HEADER.pack(len(body)) + body
+
+
+def decode_header(header: bytes) -> int:
+    (size,) = HEADER.unpack(header)
+    if size > MAX_FRAME_BYTES:
+        raise ValueError(f"Frame of {size} bytes is too large")
+    return size
+
+
+@dataclass(slots=True)
+class Generation:
+    """Outcome of one generation, with ``perf_counter`` timestamps.
+
+    ``granted`` is when the scheduler handed over the model and
+    ``start`` when decoding began (after any adapter swap).
+    ``cancelled`` names the stage a cancelled generation stopped in,
+    ``"queued"`` or ``"decode"``.
+    """
+
+    queued: float
+    granted: float = 0.0
+    start: float = 0.0
+    first_token: float | None = None
+    end: float = 0.0
+    text: str = ""
+    prompt_tokens: int = 0
+    generation_tokens: int = 0
+    generation_tps: float = 0.0
+    cancelled: str | None = None
+
+    def to_frame(self) -> dict:
+        """The ``done`` event, with times relative to ``queued``."""
+        return {
+            "event": "done",
+            "granted": self.granted - self.queued,
+            "start": self.start - self.queued,
+            "first_token": None
+            if self.first_token is None
+            else self.first_token - self.queued,
+            "end": self.end - self.queued,
+            "prompt_tokens": self.prompt_tokens,
+            "generation_tokens": self.generation_tokens,
+            "generation_tps": self.generation_tps,
+            "cancelled": self.cancelled,
+        }
+
+    @classmethod
+    def from_frame(cls, frame: dict, queued: float, text: str) -> "Generation":
+        """Rebuild a ``done`` event on this process's clock."""
+        first_token = frame["first_token"]
+        return cls(
+            queued=queued,
+            granted=queued + frame["granted"],
+            start=queued + frame["start"],
+            first_token=None if first_token is None else queued + first_token,
+            end=queued + frame["end"],
+            text=text,
+            prompt_tokens=frame["prompt_tokens"],
+            generation_tokens=frame["generation_tokens"],
+            generation_tps=frame["generation_tps"],
+            cancelled=frame["cancelled"],
+        )
+
+
+class Connection:
+    """One blocking connection to the model server."""
+
+    def __init__(self, path: Path):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            self.sock.connect(str(path))
+        except OSError as e:
+            self.sock.close()
+            raise ModelServerError(
+                f"Model server not reachable at {path}: {e}"
+            ) from e
+        self._buffer = bytearray()
+
+    def send(self, payload: dict) -> None:
+        self.sock.sendall(encode_frame(payload))
+
+    def receive(self, timeout: float | None = None) -> dict | None:
+        """Read the next frame; None if nothing arrived within ``timeout``."""
+        while (frame := self._pop()) is None:
+            if timeout is not None and not self._readable(timeout):
+                return None
+            chunk = self.sock.recv(65536)
+            if not chunk:
+                raise ModelServerError("Model server closed the connection")
+            self._buffer += chunk
+        return frame
+
+    def _pop(self) -> dict | None:
+        if len(self._buffer) < HEADER.size:
+            return None
+        size = decode_header(self._buffer[: HEADER.size])
+        end = HEADER.size + size
+        if len(self._buffer) < end:
+            return None
+        frame = orjson.loads(self._buffer[HEADER.size : end])
+        del self._buffer[:end]
+        return frame
+
+    def _readable(self, timeout: float) -> bool:
+        # poll, unlike select, copes with descriptors above 1024.
+        poller = select.poll()
+        poller.register(self.sock, select.POLLIN)
+        return bool(poller.poll(timeout * 1000))
+
+    def alive(self) -> bool:
+        """False once the server has hung up on this idle connection."""
+        return not self._readable(0)
+
+    def close(self) -> None:
+        self.sock.close()
+
+
+class ModelClient:
+    """Pooled connections to the model server at ``path``.
+
+    Safe to use from any thread; each call borrows a connection, so
+    concurrent calls never interleave frames.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._idle: list[Connection] = []
+        self._lock = threading.Lock()
+
+    def _checkout(self) -> Connection:
+        while True:
+            with self._lock:
+                connection = self._idle.pop() if self._idle else None
+            if connection is None:
+                return Connection(self.path)
+            if connection.alive():
+                return connection
+            connection.close()
+
+    def _checkin(self, connection: Connection) -> None:
+        with self._lock:
+            self._idle.append(connection)
+
+    def call(self, op: str, **fields) -> dict:
+        """Send one request and return its reply."""
+        connection = self._checkout()
+        try:
+            connection.send({"op": op, **fields})
+            reply = connection.receive()
+        except (OSError, ModelServerError) as e:
+            connection.close()
+            raise ModelServerError(f"Model server call {op} failed: {e}")
+        self._checkin(connection)
+        if "error" in reply:
+            raise ModelServerError(reply["error"])
+        return reply
+
+    def stream(
+        self,
+        request: dict,
+        cancel: CancelToken | None = None,
+    ) -> Iterable[dict]:
+        """Send a ``generate`` request and yield its events.
+
+        Stops early, closing the connection so the server stops too,
+        once ``cancel`` is tripped.
+        """
+        connection = self._checkout()
+        try:
+            connection.send({"op": "generate", **request})
+            while True:
+                if cancel is not None and cancel.cancelled:
+                    connection.close()
+                    return
+                frame = connection.receive(timeout=CANCEL_POLL_SECONDS)
+                if frame is None:
+                    continue
+                if frame["event"] in ("done", "error"):
+                    break
+                yield frame
+        except (OSError, ModelServerError) as e:
+            connection.close()
+            raise ModelServerError(f"Generation stream failed: {e}")
+        except BaseException:
+            connection.close()
+            raise
+        self._checkin(connection)
+        yield frame
+
+    def wait_ready(self, timeout: float) -> dict:
+        """Wait for the server to come up; returns its ``stats`` reply."""
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                return self.call("stats")
+            except ModelServerError:
+                if time.monotonic() >= deadline:
+                    raise
+                time.sleep(0.25)
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection in idle:
+            connection.close()
+
+
+class RemoteModel:
+    """The model as seen from an API worker."""
+
+    def __init__(self, client: ModelClient):
+        self.client = client
+
+    def generate(
+        self,
+        prompt_tokens: list[int],
+        on_text: Callable[[str], None] | None,
+        adapter: str,
+        cancel: CancelToken | None,
+        job_class: str,
+        deadline: datetime | None,
+    ) -> Generation:
+        """Generate on the model server, streaming text to ``on_text``."""
+        queued = time.perf_counter()
+        request = {
+            "prompt": prompt_tokens,
+            "adapter": adapter,
+            "job_class": job_class,
+            "deadline": deadline.timestamp() if deadline else None,
+        }
+        started = None
+        parts = []
+        for frame in self.client.stream(request, cancel):
+            event = frame["event"]
+            if event == "start":
+                started = time.perf_counter()
+            elif event == "token":
+                parts.append(frame["text"])
+                if on_text is not None:
+                    on_text(frame["text"])
+            elif event == "done":
+                return Generation.from_frame(frame, queued, "".join(parts))
+            else:
+                raise ModelServerError(frame["detail"])
+        # Cancelled: the server sees the connection close and stops.
+        now = time.perf_counter()
+        return Generation(
+            queued=queued,
+            granted=started or now,
+            start=started or now,
+            end=now,
+            text="".join(parts),
+            cancelled="queued" if started is None else "decode",
+        )
+
+
+class RemoteSessionStore(SessionStore):
+    """Sessions kept by the model server, shared by every worker.
+
+    ``get_or_create`` returns a snapshot of the session; ``append``
+    updates it and the server's copy.
+    """
+
+    def __init__(self, client: ModelClient):
+        super().__init__()
+        self.client = client
+
+    def get_or_create(self, session_id: str | None = None) -> ChatSession:
+        reply = self.client.call("session", session_id=session_id)
+        if reply.get("closed"):
+            raise SessionClosed(session_id)
+        return ChatSession(
+            session_id=reply["session_id"],
+            messages=reply["messages"],
+            created_at=reply["created_at"],
+        )
+
+    def append(self, session: ChatSession, role: str, content: str) -> None:
+        self.client.call(
+            "append",
+            session_id=session.session_id,
+            role=role,
+            content=content,
+        )
+        session.messages.append({"role": role, "content": content})
+
+    def close(self, session_id: str) -> None:
+        self.client.call("close", session_id=session_id)
+
+
+class RemoteEmbedding:
+    """The embedding model as seen from an API worker."""
+
+    def __init__(self, client: ModelClient):
+        self.client = client
+
+    def get_query_embedding(self, query: str) -> list[float]:
+        reply = self.client.call("embed", texts=[query], query=True)
+        return reply["embeddings"][0]
+
+    def get_text_embedding_batch(
+        self, texts: list[str], **kwargs
+    ) -> list[list[float]]:
+        return self.client.call("embed", texts=list(texts))["embeddings"]
+
+
+_client: ModelClient | None = None
+
+
+def get_client() -> ModelClient | None:
+    """The model server client, or None when models load in-process."""
+    return _client
+
+
+def open_client(path: Path) -> ModelClient:
+    global _client
+    _client = ModelClient(path)
+    return _client
+
+
+def close_client() -> None:
+    global _client
+    if _client is not None:
+        _client.close()
+        _client = None
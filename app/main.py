@@ -1,36 +1,134 @@
+import asyncio
 import logging
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI
-from fastapi.staticfiles import StaticFiles
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
+from starlette.concurrency import run_in_threadpool
 
-import app.chat as chat_module
+import app.adapters as adapters_module
+import app.inflight as inflight_module
+import app.ipc as ipc
+import app.memory as memory_module
+import app.metrics as metrics_module
 import app.rag as rag_module
+import app.reload as reload_module
+import app.response_cache as response_cache_module
+import app.sessions as sessions_module
+import app.tracing as tracing_module
+from app.admin import router as admin_router
 from app.chat import router as chat_router
 from app.config import settings
+from app.model_server import local_status
+from app.static import AssetStaticFiles
 
 logger = logging.getLogger(__name__)
 
 
 @asynccontextmanager
 async def lifespan(application: FastAPI):
-    doc_count = rag_module.build_index()
-    logger.info("Startup complete — RAG index: %d docs", doc_count)
+    tracing_module.open_trace_log(settings.trace_log_path)
+    asset_count = static_files.precompress()
+    if settings.model_server_socket is not None:
+        await _attach_model_server(asset_count)
+    else:
+        restored = sessions_module.open_store(
+            settings.session_log_path,
+            flush_interval=settings.session_flush_interval,
+            batch_size=settings.session_flush_batch,
+        )
+        doc_count = rag_module.build_index()
+        adapter_count = adapters_module.load_configured()
+        logger.info(
+            "Startup complete — RAG index: %d docs, %d open sessions "
+            "restored, %d adapters, %d static assets",
+            doc_count,
+            restored,
+            adapter_count,
+            asset_count,
+        )
+    stop = asyncio.Event()
+    watcher = (
+        asyncio.create_task(reload_module.watch(stop))
+        if settings.hot_reload
+        else None
+    )
+    governor = asyncio.create_task(memory_module.govern(stop))
     yield
+    stop.set()
+    if watcher is not None:
+        await watcher
+    await governor
+    sessions_module.close_store()
+    tracing_module.disarm_profiler()
+    tracing_module.close_trace_log()
+    ipc.close_client()
+
+
+async def _attach_model_server(asset_count: int) -> None:
+    """Start as a split-mode worker over the model server's state."""
+    client = ipc.open_client(settings.model_server_socket)
+    status = await run_in_threadpool(
+        client.wait_ready, settings.model_server_timeout
+    )
+    sessions_module.use_store(ipc.RemoteSessionStore(client))
+    adapters_module.route_configured(status["adapters"])
+    if status["rag_index_loaded"]:
+        # Enables the guardrails' embedding classifier, as indexing does.
+        rag_module.get_query_embed_model()
+    logger.info(
+        "Startup complete — worker of the model server at %s "
+        "(%d open sessions, %d adapters), %d static assets",
+        settings.model_server_socket,
+        status["open_sessions"],
+        len(status["adapters"]),
+        asset_count,
+    )
 
 
 app = FastAPI(title=settings.app_name, lifespan=lifespan)
 app.include_router(chat_router)
+app.include_router(admin_router)
 
 
 @app.get("/health")
 async def health():
+    client = ipc.get_client()
+    if client is None:
+        status = local_status()
+    else:
+        # Model, index, sessions and queue live on the model server.
+        try:
+            status = await run_in_threadpool(client.call, "stats")
+        except ipc.ModelServerError as e:
+            return JSONResponse(
+                {"status": "model_server_unavailable", "detail": str(e)},
+                status_code=503,
+            )
+        # "memory" is the server's; this worker's caches are its own.
+        status["worker_memory"] = memory_module.get_governor().stats()
     return {
         "status": "ok",
         "model_path": str(settings.model_path),
-        "model_loaded": chat_module._model is not None,
-        "rag_index_loaded": rag_module._index is not None,
+        **status,
+        "response_cache": response_cache_module.get_response_cache().stats(),
+        "inflight_turns": inflight_module.get_inflight().stats(),
     }
 
 
-app.mount("/static", StaticFiles(directory="static"), name="static")
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    return PlainTextResponse(
+        metrics_module.render(),
+        media_type="text/plain; version=0.0.4",
+    )
+
+
+@app.get("/", include_in_schema=False)
+async def index(request: Request):
+    """The chat widget, with asset links pinned to content hashes."""
+    return static_files.index_response(request.headers)
+
+
+static_files = AssetStaticFiles(directory="static")
+app.mount("/static", static_files, name="static")
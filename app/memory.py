@@ -0,0 +1,200 @@
+"""Resident memory accounting, and a budget enforced on the caches.
+
+One process holds the model weights, the embedding model, the Chroma
+index, the session state and every cache, and the Mac Mini has no
+memory to spare: once they outgrow RAM the box swaps and every turn
+slows down. Each of them registers a ``Component`` here that reports
+its resident bytes; caches also say how to shed bytes.
+
+``MemoryGovernor.sweep`` runs every ``memory_sweep_interval`` seconds.
+When the components together exceed ``memory_budget_mb`` it evicts
+from the caches, lowest ``priority`` first, until the total fits, so a
+growing cache loses hit rate instead of pushing the host into swap.
+Weights, the index and sessions are counted but never evicted. With
+``embedder_idle_unload`` set, a sweep also unloads the embedding model
+once it has gone unused that long; the next query loads it again.
+
+Sizes are estimates: array and tensor sizes for models, file sizes for
+the index and ``sys.getsizeof`` over cached objects. The interpreter,
+libraries and allocator slack are not counted, so set the budget below
+the memory the host can spare by that margin (compare the peak RSS in
+``stats()``). In split mode each process governs its own components:
+the model server its models, index and sessions, every worker its own
+response cache.
+"""
+
+import asyncio
+import logging
+import resource
+import sys
+import threading
+from collections.abc import Callable
+from dataclasses import dataclass, fields, is_dataclass
+
+from pydantic import BaseModel
+
+from app.config import settings
+from app.metrics import MEMORY_BYTES, MEMORY_EVICTED_BYTES
+
+logger = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+
+
+@dataclass(slots=True)
+class Component:
+    """Something resident that the governor accounts for."""
+
+    name: str
+    measure: Callable[[], int]
+    # Frees at least the given number of bytes if it can; returns the
+    # bytes freed. Components without it are never evicted.
+    evict: Callable[[int], int] | None = None
+    # Over budget, evictable components are evicted lowest first.
+    priority: int = 0
+    # Frees whatever has gone unused, on every sweep.
+    release_idle: Callable[[], int] | None = None
+
+
+def sizeof(obj) -> int:
+    """Approximate deep size of plain data, in bytes.
+
+    Follows strings, numbers, containers, dataclasses and pydantic
+    models; objects shared between containers are counted each time.
+    """
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(sizeof(k) + sizeof(v) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(sizeof(item) for item in obj)
+    elif is_dataclass(obj) and not isinstance(obj, type):
+        size += sum(sizeof(getattr(obj, f.name)) for f in fields(obj))
+    elif isinstance(obj, BaseModel):
+        size += sizeof(obj.__dict__)
+    return size
+
+
+def peak_rss() -> int:
+    """This process's peak resident set size, in bytes."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes.
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class MemoryGovernor:
+    """Registered components, and a byte budget over their total."""
+
+    def __init__(self, budget: int | None = None):
+        self.budget = budget
+        self.evicted: dict[str, int] = {}
+        self._components: dict[str, Component] = {}
+        self._usage: dict[str, int] | None = None
+        self._over_budget = False
+        self._lock = threading.Lock()
+
+    def register(self, component: Component) -> None:
+        self._components[component.name] = component
+
+    def usage(self) -> dict[str, int]:
+        """Measure every component now."""
+        usage = {}
+        for name, component in self._components.items():
+            usage[name] = max(0, int(component.measure()))
+            MEMORY_BYTES.set(name, value=usage[name])
+        self._usage = usage
+        return usage
+
+    def sweep(self) -> int:
+        """Release idle components, then evict caches down to the budget.
+
+        Returns the number of bytes freed.
+        """
+        with self._lock:
+            freed = 0
+            for component in list(self._components.values()):
+                if component.release_idle is not None:
+                    freed += self._freed(component, component.release_idle())
+            usage = self.usage()
+            if self.budget is None:
+                return freed
+            excess = sum(usage.values()) - self.budget
+            if excess <= 0:
+                self._over_budget = False
+                return freed
+            evictable = sorted(
+                (c for c in self._components.values() if c.evict is not None),
+                key=lambda c: c.priority,
+            )
+            for component in evictable:
+                if excess <= 0:
+                    break
+                released = self._freed(component, component.evict(excess))
+                excess -= released
+                freed += released
+            self.usage()
+            if excess > 0 and not self._over_budget:
+                logger.warning(
+                    "Resident memory is %.0f MB over the %.0f MB budget "
+                    "with every cache evicted",
+                    excess / MB,
+                    self.budget / MB,
+                )
+            self._over_budget = excess > 0
+            return freed
+
+    def _freed(self, component: Component, nbytes: int) -> int:
+        if nbytes > 0:
+            self.evicted[component.name] = (
+                self.evicted.get(component.name, 0) + nbytes
+            )
+            MEMORY_EVICTED_BYTES.inc(component.name, amount=nbytes)
+        return nbytes
+
+    def stats(self) -> dict:
+        """Usage as of the last sweep (measured now if there was none)."""
+        usage = self._usage if self._usage is not None else self.usage()
+        return {
+            "budget_bytes": self.budget,
+            "resident_bytes": sum(usage.values()),
+            "components": dict(usage),
+            "evicted_bytes": dict(self.evicted),
+            "peak_rss_bytes": peak_rss(),
+        }
+
+
+_governor = MemoryGovernor(
+    int(settings.memory_budget_mb * MB)
+    if settings.memory_budget_mb is not None
+    else None
+)
+
+
+def get_governor() -> MemoryGovernor:
+    return _governor
+
+
+def register(
+    name: str,
+    measure: Callable[[], int],
+    evict: Callable[[int], int] | None = None,
+    priority: int = 0,
+    release_idle: Callable[[], int] | None = None,
+) -> None:
+    """Account for ``name`` in the process-wide governor."""
+    _governor.register(Component(name, measure, evict, priority, release_idle))
+
+
+async def govern(stop_event: asyncio.Event) -> None:
+    """Sweep periodically until ``stop_event`` is set."""
+    while True:
+        try:
+            await asyncio.wait_for(
+                stop_event.wait(), settings.memory_sweep_interval
+            )
+            return
+        except TimeoutError:
+            pass
+        try:
+            await asyncio.to_thread(_governor.sweep)
+        except Exception:
+            logger.exception("Memory sweep failed")
@@ -0,0 +1,330 @@
+"""The model server: the one process that holds the models in split mode.
+
+uvicorn workers are separate processes, so without this every worker
+would load its own copy of the weights from ``get_model``. In split
+mode one model server per host loads the model, its adapters and the
+embedding model, owns the RAG index, the inference scheduler and the
+session store, and serves them over a Unix socket; the API itself runs
+as stateless workers on every core::
+
+    export INTAKE_BOT_MODEL_SERVER_SOCKET=/tmp/intake-model.sock
+    uv run python -m app.model_server &
+    uv run uvicorn app.main:app --workers 4
+
+The server loads everything before it listens, and workers wait for it
+at startup. Generations from all workers queue in this process's
+scheduler, so priorities and deadlines hold across them. The protocol
+and the stand-ins workers use are in ``app.ipc``.
+
+What stays per worker: the response cache, in-flight turn dedup (a
+retry that reaches another worker generates again), the system prompt
+and /metrics (a generation's timings are recorded by the worker that
+asked for it). Adapters are configured through settings; the admin API
+refuses adapter changes on workers.
+"""
+
+import argparse
+import asyncio
+import functools
+import logging
+import os
+import signal
+import socket
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+import orjson
+
+import app.adapters as adapters_module
+import app.chat as chat_module
+import app.memory as memory_module
+import app.rag as rag_module
+import app.reload as reload_module
+import app.scheduler as scheduler_module
+import app.sessions as sessions_module
+from app.config import settings
+from app.inflight import CancelToken
+from app.ipc import HEADER, decode_header, encode_frame
+
+logger = logging.getLogger(__name__)
+
+# Generations block in their own threads while they wait for the model;
+# a separate pool keeps them from starving embedding and retrieval.
+GENERATION_THREADS = 64
+
+
+def local_status() -> dict:
+    """Model, index, session and queue state of this process."""
+    return {
+        "model_loaded": chat_module._model is not None,
+        "adapters": sorted(adapters_module.get_registry().adapters),
+        "rag_index_loaded": rag_module._index is not None,
+        "open_sessions": len(sessions_module.get_store().sessions),
+        "inference_queue": scheduler_module.get_scheduler().stats(),
+        "memory": memory_module.get_governor().stats(),
+    }
+
+
+async def read_frame(reader: asyncio.StreamReader) -> dict | None:
+    """Read one frame; None when the peer closed between frames."""
+    try:
+        header = await reader.readexactly(HEADER.size)
+    except asyncio.IncompleteReadError as e:
+        if e.partial:
+            raise
+        return None
+    return orjson.loads(await reader.readexactly(decode_header(header)))
+
+
+async def write_frame(writer: asyncio.StreamWriter, payload: dict) -> None:
+    writer.write(encode_frame(payload))
+    await writer.drain()
+
+
+class ModelServer:
+    """Answers worker requests on one process's models and sessions."""
+
+    def __init__(self):
+        self._generations = ThreadPoolExecutor(
+            GENERATION_THREADS, thread_name_prefix="generation"
+        )
+        self._calls = {
+            "stats": self._stats,
+            "session": self._session,
+            "append": self._append,
+            "close": self._close,
+            "embed": self._embed,
+            "retrieve": self._retrieve,
+            "reindex": self._reindex,
+        }
+        self._writers: set[asyncio.StreamWriter] = set()
+
+    async def handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        """Serve one worker connection until it closes."""
+        self._writers.add(writer)
+        try:
+            while (request := await read_frame(reader)) is not None:
+                op = request.pop("op", None)
+                if op == "generate":
+                    if not await self._generate(request, reader, writer):
+                        break
+                else:
+                    await write_frame(writer, await self._call(op, request))
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except ValueError:
+            logger.exception("Malformed frame from a worker")
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+
+    async def _call(self, op: str | None, request: dict) -> dict:
+        handler = self._calls.get(op)
+        if handler is None:
+            return {"error": f"Unknown op {op!r}"}
+        try:
+            return await handler(**request)
+        except Exception as e:
+            logger.exception("Model server call %s failed", op)
+            return {"error": f"{type(e).__name__}: {e}"}
+
+    async def _generate(
+        self,
+        request: dict,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+    ) -> bool:
+        """Stream one generation; False if the worker hung up on it."""
+        loop = asyncio.get_running_loop()
+        events: asyncio.Queue[dict | None] = asyncio.Queue()
+        cancel = CancelToken()
+
+        def emit(frame: dict) -> None:
+            loop.call_soon_threadsafe(events.put_nowait, frame)
+
+        deadline = request.get("deadline")
+        model, tokenizer = chat_module.get_model()
+        job = loop.run_in_executor(
+            self._generations,
+            functools.partial(
+                chat_module.run_generation,
+                model,
+                tokenizer,
+                request["prompt"],
+                on_text=lambda text: emit({"event": "token", "text": text}),
+                adapter=request["adapter"],
+                cancel=cancel,
+                job_class=request["job_class"],
+                deadline=datetime.fromtimestamp(deadline, tz=timezone.utc)
+                if deadline is not None
+                else None,
+                on_start=lambda: emit({"event": "start"}),
+            ),
+        )
+        job.add_done_callback(lambda _: events.put_nowait(None))
+        # The worker sends nothing until the generation is done, so any
+        # read completing means it closed the connection.
+        hangup = asyncio.ensure_future(reader.read(1))
+        hangup.add_done_callback(
+            lambda task: task.cancelled() or cancel.cancel()
+        )
+        try:
+            while (frame := await events.get()) is not None:
+                if not cancel.cancelled:
+                    try:
+                        await write_frame(writer, frame)
+                    except ConnectionError:
+                        cancel.cancel()
+        finally:
+            # Stop watching before the last frame: the worker may send
+            # its next request as soon as it has read it.
+            hangup.cancel()
+            await asyncio.wait({hangup})
+        try:
+            frame = job.result().to_frame()
+        except Exception as e:
+            logger.exception("Generation failed")
+            frame = {"event": "error", "detail": f"{e}"}
+        if cancel.cancelled:
+            return False
+        await write_frame(writer, frame)
+        return True
+
+    async def _stats(self) -> dict:
+        return local_status()
+
+    async def _session(self, session_id: str | None) -> dict:
+        try:
+            session = sessions_module.get_store().get_or_create(session_id)
+        except sessions_module.SessionClosed:
+            return {"session_id": session_id, "closed": True}
+        return {
+            "session_id": session.session_id,
+            "created_at": session.created_at,
+            "messages": session.messages,
+        }
+
+    async def _append(self, session_id: str, role: str, content: str) -> dict:
+        store = sessions_module.get_store()
+        store.append(store.get_or_create(session_id), role, content)
+        return {}
+
+    async def _close(self, session_id: str) -> dict:
+        sessions_module.get_store().close(session_id)
+        return {}
+
+    async def _embed(self, texts: list[str], query: bool = False) -> dict:
+        # Workers embed messages and guardrail prototypes, never
+        # documents, so both go to the query model.
+        model = rag_module.get_query_embed_model()
+        if query:
+            embedding = await asyncio.to_thread(
+                model.get_query_embedding, texts[0]
+            )
+            return {"embeddings": [embedding]}
+        embeddings = await asyncio.to_thread(
+            model.get_text_embedding_batch, texts
+        )
+        return {"embeddings": embeddings}
+
+    async def _retrieve(
+        self, query: str, embedding: list[float] | None
+    ) -> dict:
+        context = await asyncio.to_thread(
+            rag_module.retrieve_context, query, embedding
+        )
+        return {"context": context}
+
+    async def _reindex(self) -> dict:
+        return {"documents": await asyncio.to_thread(rag_module.build_index)}
+
+    def close(self) -> None:
+        """Hang up on every worker and drop queued generations."""
+        for writer in list(self._writers):
+            writer.close()
+        self._generations.shutdown(wait=False, cancel_futures=True)
+
+
+def _claim_socket(path: Path) -> None:
+    """Remove a stale socket file, refusing to displace a live server."""
+    if not path.exists():
+        return
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+        try:
+            probe.connect(str(path))
+        except OSError:
+            path.unlink()
+            return
+    raise RuntimeError(f"A model server is already listening on {path}")
+
+
+async def serve(path: Path) -> None:
+    """Load everything, then serve workers on ``path`` until signalled."""
+    _claim_socket(path)
+    restored = sessions_module.open_store(
+        settings.session_log_path,
+        flush_interval=settings.session_flush_interval,
+        batch_size=settings.session_flush_batch,
+    )
+    await asyncio.to_thread(chat_module.get_model)
+    doc_count = await asyncio.to_thread(rag_module.build_index)
+    adapter_count = adapters_module.load_configured()
+
+    server = ModelServer()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    listener = await asyncio.start_unix_server(server.handle, path=str(path))
+    os.chmod(path, 0o600)
+    logger.info(
+        "Model server listening on %s — RAG index: %d docs, %d open "
+        "sessions restored, %d adapters",
+        path,
+        doc_count,
+        restored,
+        adapter_count,
+    )
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stop.set)
+    watcher = (
+        asyncio.create_task(reload_module.watch(stop))
+        if settings.hot_reload
+        else None
+    )
+    governor = asyncio.create_task(memory_module.govern(stop))
+    async with listener:
+        await stop.wait()
+        server.close()
+    if watcher is not None:
+        await watcher
+    await governor
+    sessions_module.close_store()
+    path.unlink(missing_ok=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Serve the model to API workers over a Unix socket"
+    )
+    parser.add_argument(
+        "--socket",
+        type=Path,
+        default=settings.model_server_socket,
+        help="Socket path (default: INTAKE_BOT_MODEL_SERVER_SOCKET)",
+    )
+    args = parser.parse_args()
+    if args.socket is None:
+        parser.error("set --socket or INTAKE_BOT_MODEL_SERVER_SOCKET")
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+    )
+    asyncio.run(serve(args.socket))
+
+
+if __name__ == "__main__":
+    main()
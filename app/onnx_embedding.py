@@ -0,0 +1,155 @@
+"""Query embeddings from an int8 ONNX export of the embedding model.
+
+Every chat turn embeds the student's message (for the guardrails and
+retrieval) through LlamaIndex's ``local:`` model: sentence-transformers
+on PyTorch, which is slow to import, heavy to keep resident and slow
+per query on CPU. With ``query_embed_backend = "onnx"`` queries go to
+``OnnxQueryEmbedding`` instead: the same all-MiniLM-L6-v2 weights,
+exported to ONNX with int8 dynamic quantization and run by
+onnxruntime with one reused session, a ``tokenizers`` tokenizer and
+input buffers allocated once. Documents are still embedded by the
+PyTorch model at index time; the parity test in
+tests/test_onnx_embedding.py checks the two agree on similarities.
+
+Build the export once (it needs the ``onnx`` package)::
+
+    uv run --with onnx python scripts/export_onnx_embedder.py
+
+which calls ``export`` and writes ``model.onnx``, the tokenizer and
+``embedder.json`` to ``settings.onnx_embed_path``.
+"""
+
+import json
+import threading
+from pathlib import Path
+
+import numpy as np
+
+INPUT_NAMES = ("input_ids", "attention_mask", "token_type_ids")
+CONFIG_FILE = "embedder.json"
+
+
+class OnnxQueryEmbedding:
+    """Mean-pooled, normalized embeddings from an ``export`` directory.
+
+    Safe to share between threads: queries take turns on the session
+    and its input buffers.
+    """
+
+    def __init__(self, path: Path, threads: int = 1):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        config = json.loads((path / CONFIG_FILE).read_text())
+        self.source = config["source"]
+        self.max_length = config["max_length"]
+        self.tokenizer = Tokenizer.from_file(str(path / "tokenizer.json"))
+        self.tokenizer.enable_truncation(self.max_length)
+        self.tokenizer.no_padding()
+
+        options = ort.SessionOptions()
+        # One short sequence at a time: more threads only add overhead.
+        options.intra_op_num_threads = threads
+        options.inter_op_num_threads = 1
+        options.graph_optimization_level = (
+            ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        )
+        model_path = path / "model.onnx"
+        self.session = ort.InferenceSession(
+            str(model_path), options, providers=["CPUExecutionProvider"]
+        )
+        self.nbytes = model_path.stat().st_size
+        accepted = {i.name for i in self.session.get_inputs()}
+        self._buffers = {
+            name: np.zeros((1, self.max_length), np.int64)
+            for name in INPUT_NAMES
+            if name in accepted
+        }
+        # A single query is never padded.
+        if "attention_mask" in self._buffers:
+            self._buffers["attention_mask"][:] = 1
+        self._lock = threading.Lock()
+
+    def get_query_embedding(self, query: str) -> list[float]:
+        encoding = self.tokenizer.encode(query)
+        n = len(encoding.ids)
+        with self._lock:
+            self._buffers["input_ids"][0, :n] = encoding.ids
+            if "token_type_ids" in self._buffers:
+                self._buffers["token_type_ids"][0, :n] = encoding.type_ids
+            # Row views of the buffers; onnxruntime reads them in place.
+            feeds = {name: buf[:, :n] for name, buf in self._buffers.items()}
+            (hidden,) = self.session.run(["last_hidden_state"], feeds)
+        vector = hidden[0].mean(axis=0)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    def get_text_embedding(self, text: str) -> list[float]:
+        # all-MiniLM-L6-v2 embeds queries and passages alike.
+        return self.get_query_embedding(text)
+
+    def get_text_embedding_batch(
+        self, texts: list[str], **kwargs
+    ) -> list[list[float]]:
+        return [self.get_query_embedding(text) for text in texts]
+
+
+def export(source: str, out_dir: Path, max_length: int = 256) -> Path:
+    """Export a Hugging Face encoder to int8 ONNX in ``out_dir``.
+
+    ``source`` is a hub id or a local directory. ``max_length`` caps
+    query tokens, as sentence-transformers' ``max_seq_length`` does.
+    Returns the path of the quantized model.
+    """
+    import torch
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from transformers import AutoModel, AutoTokenizer
+
+    class Encoder(torch.nn.Module):
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, input_ids, attention_mask, token_type_ids):
+            return self.model(
+                input_ids=input_ids,
+                attention_mask=attention_mask,
+                token_type_ids=token_type_ids,
+            ).last_hidden_state
+
+    tokenizer = AutoTokenizer.from_pretrained(source)
+    encoder = Encoder(AutoModel.from_pretrained(source)).eval()
+    sample = tokenizer(["how do I use the subjunctive"], return_tensors="pt")
+    if "token_type_ids" not in sample:
+        sample["token_type_ids"] = torch.zeros_like(sample["input_ids"])
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    full_precision = out_dir / "model-fp32.onnx"
+    quantized = out_dir / "model.onnx"
+    axes = {0: "batch", 1: "sequence"}
+    torch.onnx.export(
+        encoder,
+        tuple(sample[name] for name in INPUT_NAMES),
+        str(full_precision),
+        input_names=list(INPUT_NAMES),
+        output_names=["last_hidden_state"],
+        dynamic_axes={
+            **{name: axes for name in INPUT_NAMES},
+            "last_hidden_state": axes,
+        },
+        opset_version=17,
+        dynamo=False,
+    )
+    quantize_dynamic(full_precision, quantized, weight_type=QuantType.QInt8)
+    full_precision.unlink()
+    tokenizer.save_pretrained(out_dir)
+    (out_dir / CONFIG_FILE).write_text(
+        json.dumps(
+            {
+                "source": source,
+                "max_length": min(max_length, tokenizer.model_max_length),
+            },
+            indent=2,
+        )
+        + "\n"
+    )
+    return quantized
@@ -1,12 +1,30 @@
+import functools
+import gc
+import hashlib
 import logging
+import threading
+import time
+from pathlib import Path
 
 import chromadb
+from llama_index.core import Settings as IndexSettings
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.embeddings.utils import resolve_embed_model
 from llama_index.core.indices import VectorStoreIndex
+from llama_index.core.ingestion import run_transformations
 from llama_index.core.readers import SimpleDirectoryReader
-from llama_index.core.storage.storage_context import StorageContext
+from llama_index.core.readers.file.base import default_file_metadata_func
+from llama_index.core.schema import MetadataMode, QueryBundle
 from llama_index.vector_stores.chroma import ChromaVectorStore
 
 from app.config import settings
+from app.embedding import embed_texts, get_embedding_cache
+from app.ipc import RemoteEmbedding, get_client
+from app.memory import register
+from app.onnx_embedding import OnnxQueryEmbedding
+from app.reload import watch_path
+from app.scheduler import BACKGROUND, get_scheduler
+from app.tracing import span, stage
 
 logger = logging.getLogger(__name__)
 
@@ -14,15 +32,149 @@ COLLECTION_NAME = "intake-bot"
 EMBED_MODEL = "local:sentence-transformers/all-MiniLM-L6-v2"
 
 _index: VectorStoreIndex | None = None
+_index_bytes = 0
+_embed_model = None
+_embed_bytes = 0
+_embed_used = 0.0
+_query_embed_model: OnnxQueryEmbedding | None = None
+_embed_lock = threading.Lock()
+_build_lock = threading.Lock()
+
+
+def get_embed_model():
+    """Load and cache the sentence-transformers embedding model.
+
+    In split mode this is a stand-in that embeds on the model server.
+    """
+    global _embed_model, _embed_bytes, _embed_used
+    model = _embed_model
+    if model is None:
+        with _embed_lock:
+            if _embed_model is None:
+                client = get_client()
+                if client is not None:
+                    _embed_model = RemoteEmbedding(client)
+                else:
+                    _embed_model = resolve_embed_model(EMBED_MODEL)
+                    _embed_model.embed_batch_size = settings.embed_batch_size
+                _embed_bytes = _tensor_bytes(_embed_model)
+            model = _embed_model
+    _embed_used = time.monotonic()
+    return model
+
+
+def get_query_embed_model():
+    """The model that embeds chat messages and retrieval queries.
+
+    The int8 ONNX export with ``query_embed_backend = "onnx"``,
+    otherwise ``get_embed_model()``.
+    """
+    global _query_embed_model
+    if settings.query_embed_backend != "onnx":
+        return get_embed_model()
+    if _query_embed_model is None:
+        with _embed_lock:
+            if _query_embed_model is None:
+                _query_embed_model = OnnxQueryEmbedding(
+                    settings.onnx_embed_path
+                )
+                logger.info(
+                    "Embedding queries with the ONNX export in %s",
+                    settings.onnx_embed_path,
+                )
+    return _query_embed_model
+
+
+def query_embed_model_loaded() -> bool:
+    if settings.query_embed_backend == "onnx":
+        return _query_embed_model is not None
+    return _embed_model is not None
+
+
+def _tensor_bytes(embed_model) -> int:
+    """Bytes of a sentence-transformers model's weights and buffers."""
+    module = getattr(embed_model, "_model", None)
+    if not hasattr(module, "parameters"):
+        return 0
+    tensors = [*module.parameters(), *module.buffers()]
+    return sum(t.numel() * t.element_size() for t in tensors)
+
+
+def unload_idle_embed_model() -> int:
+    """Unload the embedding model if unused for ``embedder_idle_unload`` s.
+
+    Returns the bytes freed. The next caller of ``get_embed_model``
+    loads it again.
+    """
+    global _embed_model, _embed_bytes
+    idle = settings.embedder_idle_unload
+    with _embed_lock:
+        if (
+            idle is None
+            or _embed_model is None
+            or isinstance(_embed_model, RemoteEmbedding)
+            or time.monotonic() - _embed_used < idle
+        ):
+            return 0
+        freed, _embed_model, _embed_bytes = _embed_bytes, None, 0
+    gc.collect()
+    logger.info("Unloaded the embedding model after %.0f s unused", idle)
+    return freed
+
+
+class _SharedEmbedding(BaseEmbedding):
+    """The index's handle on ``get_embed_model()``.
+
+    The index keeps this rather than the model itself, so an unloaded
+    embedding model is really freed, and reloaded when the index next
+    embeds.
+    """
+
+    def _get_query_embedding(self, query: str) -> list[float]:
+        return get_embed_model().get_query_embedding(query)
+
+    async def _aget_query_embedding(self, query: str) -> list[float]:
+        return self._get_query_embedding(query)
+
+    def _get_text_embedding(self, text: str) -> list[float]:
+        return get_embed_model().get_text_embedding(text)
+
+    def _get_text_embeddings(self, texts: list[str]) -> list[list[float]]:
+        return get_embed_model().get_text_embedding_batch(texts)
+
+
+def _content_hash(path: Path) -> str:
+    return hashlib.blake2b(path.read_bytes(), digest_size=16).hexdigest()
+
+
+def _file_metadata(file_path: str) -> dict:
+    metadata = default_file_metadata_func(file_path)
+    metadata["content_hash"] = _content_hash(Path(file_path))
+    return metadata
 
 
 def build_index() -> int:
-    """Build the RAG index from the corpus directory.
+    """Build or incrementally update the RAG index from the corpus.
 
-    Returns the number of documents indexed. Skips re-indexing if
-    the collection already has documents.
+    Each chunk's Chroma metadata records its file path and content
+    hash, so only new or changed files are embedded and only chunks of
+    changed or removed files are deleted. New chunks are added before
+    stale ones are removed, so a concurrent query never finds a file
+    missing. Returns the number of documents in the corpus.
+
+    In split mode the index belongs to the model server, which is asked
+    to do the update instead.
     """
-    global _index
+    client = get_client()
+    if client is not None:
+        return client.call("reindex")["documents"]
+    # Updates from the watcher, the admin API and workers take turns.
+    with _build_lock:
+        return _update_index()
+
+
+def _update_index() -> int:
+    global _index, _index_bytes
 
     if not settings.rag_corpus_path.exists():
         logger.warning(
@@ -34,51 +186,125 @@ def build_index() -> int:
     chroma_client = chromadb.PersistentClient(path=str(settings.chroma_db_path))
     collection = chroma_client.get_or_create_collection(COLLECTION_NAME)
     vector_store = ChromaVectorStore(chroma_collection=collection)
-    storage_context = StorageContext.from_defaults(vector_store=vector_store)
+    index = VectorStoreIndex.from_vector_store(
+        vector_store=vector_store,
+        embed_model=_SharedEmbedding(),
+    )
 
-    if collection.count() > 0:
-        logger.info(
-            "RAG collection already has %d documents, loading existing index",
-            collection.count(),
+    on_disk = {
+        str(path): _content_hash(path)
+        for path in sorted(settings.rag_corpus_path.resolve().rglob("*.md"))
+        if path.is_file()
+    }
+    indexed: dict[str | None, str | None] = {}
+    chunk_ids: dict[str | None, list[str]] = {}
+    stored = collection.get(include=["metadatas"])
+    for chunk_id, metadata in zip(stored["ids"], stored["metadatas"]):
+        file_path = (metadata or {}).get("file_path")
+        indexed[file_path] = (metadata or {}).get("content_hash")
+        chunk_ids.setdefault(file_path, []).append(chunk_id)
+
+    changed = [p for p, h in on_disk.items() if indexed.get(p) != h]
+    stale = [
+        chunk_id
+        for file_path, ids in chunk_ids.items()
+        if file_path not in on_disk or file_path in changed
+        for chunk_id in ids
+    ]
+
+    if changed:
+        documents = SimpleDirectoryReader(
+            input_files=changed, file_metadata=_file_metadata
+        ).load_data()
+        for document in documents:
+            document.excluded_embed_metadata_keys.append("content_hash")
+            document.excluded_llm_metadata_keys.append("content_hash")
+        nodes = run_transformations(documents, IndexSettings.transformations)
+        # Embedding shares the accelerator with generation. Jobs are not
+        # preempted, so take the slot per batch and let chat turns run
+        # between batches instead of waiting for the whole corpus.
+        embeddings, report = embed_texts(
+            [n.get_content(metadata_mode=MetadataMode.EMBED) for n in nodes],
+            get_embed_model(),
+            EMBED_MODEL,
+            cache=get_embedding_cache(),
+            batch_slot=functools.partial(
+                get_scheduler().slot, BACKGROUND, kind="reindex"
+            ),
         )
-        _index = VectorStoreIndex.from_vector_store(
-            vector_store=vector_store,
-            embed_model=EMBED_MODEL,
+        for node, embedding in zip(nodes, embeddings):
+            node.embedding = embedding
+        index.insert_nodes(nodes)
+        logger.info(
+            "Embedded %d chunks (%d from cache) at %.1f chunks/s",
+            report.chunks,
+            report.cached,
+            report.chunks_per_second,
         )
-        return collection.count()
+    if stale:
+        collection.delete(ids=stale)
 
-    reader = SimpleDirectoryReader(
-        input_dir=str(settings.rag_corpus_path),
-        recursive=True,
-        required_exts=[".md"],
+    _index = index
+    _index_bytes = _directory_bytes(settings.chroma_db_path)
+    # Load the query model now rather than on the first turn: the
+    # guardrails' classifier waits for it.
+    get_query_embed_model()
+    logger.info(
+        "RAG index ready: %d docs (%d re-indexed, %d stale chunks removed)",
+        len(on_disk),
+        len(changed),
+        len(stale),
     )
-    documents = reader.load_data()
+    return len(on_disk)
 
-    _index = VectorStoreIndex.from_documents(
-        documents=documents,
-        storage_context=storage_context,
-        embed_model=EMBED_MODEL,
-        show_progress=True,
-    )
 
-    doc_count = len(documents)
-    logger.info("RAG index built: %d docs", doc_count)
-    return doc_count
+def _directory_bytes(path: Path) -> int:
+    # Chroma's HNSW segments are read into memory whole; its SQLite
+    # file, also counted, is only paged in. An upper bound, then.
+    return sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+
 
+watch_path("rag_corpus", settings.rag_corpus_path, build_index)
+register(
+    "embedding_model",
+    lambda: _embed_bytes,
+    release_idle=unload_idle_embed_model,
+)
+register("vector_index", lambda: _index_bytes if _index is not None else 0)
+register(
+    "query_embedder",
+    lambda: _query_embed_model.nbytes if _query_embed_model else 0,
+)
 
-def retrieve_context(query: str) -> str:
+
+def retrieve_context(query: str, embedding: list[float] | None = None) -> str:
     """Retrieve relevant context chunks for a query.
 
     Returns concatenated text from the top-k most relevant nodes,
     separated by '---'. Returns an empty string if the index is not
-    built.
+    built. Pass ``embedding`` when the query was already embedded.
     """
-    if _index is None:
+    client = get_client()
+    if client is not None:
+        with span("retrieve_context"):
+            reply = client.call("retrieve", query=query, embedding=embedding)
+            return reply["context"]
+
+    # Read the index once: a concurrent reload swaps the global.
+    index = _index
+    if index is None:
         logger.warning("RAG index not built, returning empty context")
         return ""
 
-    retriever = _index.as_retriever(similarity_top_k=settings.rag_top_k)
-    nodes = retriever.retrieve(query)
+    with span("retrieve_context"):
+        if embedding is None:
+            with stage("retrieval_embedding"):
+                embedding = get_query_embed_model().get_query_embedding(query)
+        with stage("retrieval_search"):
+            retriever = index.as_retriever(similarity_top_k=settings.rag_top_k)
+            nodes = retriever.retrieve(
+                QueryBundle(query_str=query, embedding=embedding)
+            )
 
     if not nodes:
         return ""
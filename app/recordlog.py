@@ -0,0 +1,110 @@
+"""Append-only orjson record log with write-behind batching.
+
+Used for session turns and request traces: ``append()`` only enqueues,
+and a daemon thread writes records to disk in batches.
+"""
+
+import logging
+import os
+import queue
+import threading
+from collections.abc import Iterator
+from pathlib import Path
+
+import orjson
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class RecordLog:
+    """Append-only orjson record log with a write-behind flusher.
+
+    Records are small dicts. ``append()`` only enqueues; a daemon
+    thread drains the queue in batches of up to ``batch_size`` records
+    and writes each batch with a single ``write()`` call.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        flush_interval: float = 0.05,
+        batch_size: int = 256,
+    ):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._thread = threading.Thread(
+            target=self._run, name=f"{self.path.name}-writer", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Flush pending records and stop the writer thread."""
+        if self._thread is None:
+            return
+        self._queue.put(_STOP)
+        self._thread.join()
+        self._thread = None
+
+    def append(self, record: dict) -> None:
+        self._queue.put(record)
+
+    def _run(self) -> None:
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+        try:
+            stopping = False
+            while not stopping:
+                try:
+                    item = self._queue.get(timeout=self.flush_interval)
+                except queue.Empty:
+                    continue
+                batch = []
+                while True:
+                    if item is _STOP:
+                        stopping = True
+                        break
+                    batch.append(orjson.dumps(item))
+                    if len(batch) >= self.batch_size:
+                        break
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                if batch:
+                    os.write(fd, b"\n".join(batch) + b"\n")
+        finally:
+            os.close(fd)
+
+    def replay(self) -> Iterator[dict]:
+        """Yield every decodable record in the log, oldest first.
+
+        A torn final line (e.g. power loss mid-write) is skipped.
+        """
+        if not self.path.exists():
+            return
+        with open(self.path, "rb") as f:
+            for line in f:
+                try:
+                    yield orjson.loads(line)
+                except orjson.JSONDecodeError:
+                    logger.warning("Skipping corrupt record in %s", self.path)
+
+    def rewrite(self, records: Iterator[dict]) -> None:
+        """Atomically replace the log with ``records``.
+
+        Must only be called while the writer thread is stopped.
+        """
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        with open(tmp, "wb") as f:
+            for record in records:
+                f.write(orjson.dumps(record) + b"\n")
+        os.replace(tmp, self.path)
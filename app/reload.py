@@ -0,0 +1,127 @@
+"""Hot reload of file-backed state (system prompt, RAG corpus).
+
+Modules register each reloadable source with ``watch_path``: a path
+and a loader that rebuilds the derived state and swaps it in with a
+single assignment. A request reads that state once, so it keeps the
+snapshot it started with while the next request sees the new one.
+
+Caches derived from a source register with ``on_reload``; after a
+successful reload every hook is called with the names of the sources
+that changed; ``notify`` does the same for state that changes without a
+file (adapters loaded through the admin API). A loader that fails
+leaves the old state in place and skips the hooks.
+
+``watch`` follows the registered paths with watchfiles (installed with
+uvicorn[standard]) and is started from the app lifespan when
+``settings.hot_reload`` is set; ``POST /admin/reload`` triggers a
+reload by hand.
+"""
+
+import asyncio
+import logging
+import threading
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass
+from pathlib import Path
+
+from starlette.concurrency import run_in_threadpool
+
+from app.metrics import RELOADS
+
+logger = logging.getLogger(__name__)
+
+ReloadHook = Callable[[frozenset[str]], None]
+
+
+@dataclass(frozen=True, slots=True)
+class Source:
+    name: str
+    path: Path
+    load: Callable[[], object]
+
+    def owns(self, changed: Path) -> bool:
+        path = self.path.resolve()
+        return changed == path or path in changed.parents
+
+
+_sources: dict[str, Source] = {}
+_hooks: list[ReloadHook] = []
+# Reloads run one at a time so two loaders never race on one swap.
+_reload_lock = threading.Lock()
+
+
+def watch_path(name: str, path: Path, load: Callable[[], object]) -> None:
+    """Register a file or directory whose changes re-run ``load``."""
+    _sources[name] = Source(name, Path(path), load)
+
+
+def on_reload(hook: ReloadHook) -> ReloadHook:
+    """Register a cache invalidation hook; usable as a decorator."""
+    _hooks.append(hook)
+    return hook
+
+
+def changed_sources(paths: Iterable[str | Path]) -> frozenset[str]:
+    """Names of the registered sources that own any of ``paths``."""
+    resolved = [Path(p).resolve() for p in paths]
+    return frozenset(
+        source.name
+        for source in _sources.values()
+        if any(source.owns(path) for path in resolved)
+    )
+
+
+def reload(names: Iterable[str] | None = None) -> frozenset[str]:
+    """Re-run the loaders for ``names`` (default: all), then the hooks.
+
+    Returns the names that reloaded successfully.
+    """
+    names = _sources.keys() if names is None else names
+    reloaded = set()
+    with _reload_lock:
+        for name in names:
+            source = _sources.get(name)
+            if source is None:
+                continue
+            try:
+                source.load()
+            except Exception:
+                RELOADS.inc(name, "error")
+                logger.exception("Reloading %s failed, keeping old", name)
+                continue
+            RELOADS.inc(name, "ok")
+            reloaded.add(name)
+        reloaded = frozenset(reloaded)
+        if reloaded:
+            notify(reloaded)
+            logger.info("Reloaded %s", ", ".join(sorted(reloaded)))
+    return reloaded
+
+
+def notify(names: Iterable[str]) -> None:
+    """Run the invalidation hooks for state changed outside a source.
+
+    For example, an adapter loaded through the admin API.
+    """
+    names = frozenset(names)
+    for hook in _hooks:
+        hook(names)
+
+
+async def watch(stop_event: asyncio.Event | None = None) -> None:
+    """Reload sources as their files change, until ``stop_event`` is set."""
+    from watchfiles import awatch
+
+    # Watch directories rather than files: editors often save by
+    # renaming a temp file over the original, which ends a file watch.
+    roots = {
+        source.path if source.path.is_dir() else source.path.parent
+        for source in _sources.values()
+    }
+    roots = [root for root in roots if root.exists()]
+    if not roots:
+        return
+    async for changes in awatch(*roots, stop_event=stop_event):
+        names = changed_sources(path for _, path in changes)
+        if names:
+            await run_in_threadpool(reload, names)
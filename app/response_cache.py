@@ -0,0 +1,192 @@
+"""Memoized replies for menu turns that many students share.
+
+Answering "1" to the course menu or "Vocabulary" to the category menu
+gets the same reply for every student, yet each one costs a full
+generation. ``ResponseCache`` stores those replies keyed by everything
+that shapes them: the prompt template, the question being answered, the
+normalized answer, the retrieved context, the adapter and the
+appointment time rendered into the system prompt.
+
+Only the menu steps listed in ``CACHEABLE_STEPS`` are cached, and only
+for short answers; free-text drill-down turns (descriptions, the
+confidence reflection, confirmations) depend on what the student said
+earlier and always go to the model. The visitor's name and booking
+reference are stored as ``{{visitor_name}}`` and ``{{booking_ref}}``
+placeholders and filled in per request. The appointment time is part
+of the key instead, since the model words it freely ("Tuesday, March 03
+at 01:00 PM").
+
+Entries expire after a TTL and the least recently used ones are evicted
+beyond ``max_entries``, or sooner when the memory governor needs the
+bytes back. The cache is cleared on every reload (prompt,
+corpus) and whenever an adapter is loaded or unloaded.
+"""
+
+import hashlib
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+from app.config import settings
+from app.memory import register
+from app.metrics import CACHE_HITS, CACHE_MISSES
+from app.reload import on_reload
+
+# Questions whose answers are picked from a fixed menu.
+CACHEABLE_STEPS = frozenset(
+    {"course", "category", "grammar_topic", "composition_part", "exam"}
+)
+# Longer answers are explanations rather than menu picks.
+MAX_INPUT_WORDS = 8
+NAME_PLACEHOLDER = "{{visitor_name}}"
+BOOKING_PLACEHOLDER = "{{booking_ref}}"
+# The OrderedDict node and the (expiry, reply) tuple around each entry.
+ENTRY_OVERHEAD = 160
+
+
+def normalize_input(text: str) -> str:
+    """Fold case, punctuation and spacing: "1." and " 1" are one answer."""
+    text = text.lower().replace("’", "'")
+    text = re.sub(r"[^\w' ]+", " ", text)
+    return " ".join(text.split())
+
+
+def cache_key(
+    template: str,
+    step: str | None,
+    message: str,
+    context: str,
+    adapter: str,
+    appointment: str,
+) -> str | None:
+    """The cache key for a turn, or None if the turn must be generated.
+
+    ``appointment`` is the appointment time as rendered into the
+    system prompt.
+    """
+    if step not in CACHEABLE_STEPS:
+        return None
+    normalized = normalize_input(message)
+    if not normalized or len(normalized.split()) > MAX_INPUT_WORDS:
+        return None
+    h = hashlib.blake2b(digest_size=16)
+    for part in (template, step, normalized, context, adapter, appointment):
+        h.update(part.encode())
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+class ResponseCache:
+    """LRU map of cache keys to reply templates, with a TTL."""
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 3600.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(
+        self,
+        key: str,
+        visitor_name: str | None = None,
+        booking_ref: str | None = None,
+    ) -> str | None:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= now:
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                CACHE_MISSES.inc("response")
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        CACHE_HITS.inc("response")
+        return (
+            entry[1]
+            .replace(NAME_PLACEHOLDER, visitor_name or "there")
+            .replace(BOOKING_PLACEHOLDER, booking_ref or "unknown")
+        )
+
+    def put(
+        self,
+        key: str,
+        reply: str,
+        visitor_name: str | None = None,
+        booking_ref: str | None = None,
+    ):
+        if visitor_name:
+            reply = reply.replace(visitor_name, NAME_PLACEHOLDER)
+        if booking_ref:
+            reply = reply.replace(booking_ref, BOOKING_PLACEHOLDER)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + self.ttl, reply)
+            self.nbytes += _entry_bytes(key, reply)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def evict(self, nbytes: int) -> int:
+        """Drop least recently used entries until ``nbytes`` are freed.
+
+        Returns the number of bytes actually freed.
+        """
+        with self._lock:
+            before = self.nbytes
+            while self._entries and before - self.nbytes < nbytes:
+                self._remove(next(iter(self._entries)))
+            return before - self.nbytes
+
+    def _remove(self, key: str) -> None:
+        _, reply = self._entries.pop(key)
+        self.nbytes -= _entry_bytes(key, reply)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.nbytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+        }
+
+
+def _entry_bytes(key: str, reply: str) -> int:
+    return sys.getsizeof(key) + sys.getsizeof(reply) + ENTRY_OVERHEAD
+
+
+_cache = ResponseCache(
+    settings.response_cache_size, settings.response_cache_ttl
+)
+
+
+def get_response_cache() -> ResponseCache:
+    return _cache
+
+
+# Evicted after remembered retries: a hit here saves a whole generation.
+register(
+    "response_cache", lambda: _cache.nbytes, evict=_cache.evict, priority=20
+)
+
+
+@on_reload
+def _invalidate(names: frozenset[str]) -> None:
+    _cache.clear()
@@ -0,0 +1,161 @@
+"""Priority scheduling of work that runs on the model.
+
+MLX generation is not re-entrant, so every job that uses the model
+(chat turns, re-indexing, and any other background work) holds
+``InferenceScheduler`` while it runs. When the model frees up, the next
+job is chosen in this order:
+
+1. interactive chat turns, first come first served, since a student is
+   waiting on the reply;
+2. background work (booking pre-warm, summary generation, offline eval,
+   re-indexing), earliest deadline first. A job's deadline is the
+   appointment its output is for (``IntakeSummary.appointment_datetime``);
+   jobs without one go last.
+
+A background job that has waited longer than ``max_wait`` is promoted:
+it then competes with interactive turns by arrival time, so a steady
+stream of chat cannot starve it. Jobs are not preempted, so long work
+such as re-indexing takes one slot per batch rather than one for the
+whole run. Work that finishes after its deadline is counted in
+``intake_deadline_misses_total`` and logged.
+"""
+
+import logging
+import math
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime
+
+from app.config import settings
+from app.metrics import (
+    DEADLINE_MISSES,
+    INFERENCE_PROMOTIONS,
+    INFERENCE_QUEUE_DEPTH,
+    INFERENCE_QUEUE_SECONDS,
+)
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = "interactive"
+BACKGROUND = "background"
+JOB_CLASSES = (INTERACTIVE, BACKGROUND)
+
+
+@dataclass(eq=False, slots=True)
+class Job:
+    job_class: str
+    kind: str
+    # Epoch seconds, or None for work with no deadline.
+    deadline: float | None
+    enqueued: float
+    label: str | None = None
+
+    def rank(self, now: float, max_wait: float) -> tuple:
+        """Sort key; the smallest rank runs next."""
+        if self.job_class == INTERACTIVE or now - self.enqueued >= max_wait:
+            return (0, self.enqueued)
+        deadline = math.inf if self.deadline is None else self.deadline
+        return (1, deadline, self.enqueued)
+
+
+def check_deadline(
+    kind: str, deadline: datetime | float | None, label: str | None = None
+) -> bool:
+    """Report ``kind`` work for ``label`` finishing after ``deadline``.
+
+    Returns True if the deadline was missed.
+    """
+    if deadline is None:
+        return False
+    if isinstance(deadline, datetime):
+        deadline = deadline.timestamp()
+    late = time.time() - deadline
+    if late <= 0:
+        return False
+    DEADLINE_MISSES.inc(kind)
+    logger.warning(
+        "%s for %s finished %.0f s after its appointment",
+        kind,
+        label or "unknown",
+        late,
+    )
+    return True
+
+
+class InferenceScheduler:
+    """Grants the model to one job at a time, by class and deadline."""
+
+    def __init__(self, max_wait: float = 30.0):
+        self.max_wait = max_wait
+        self._cond = threading.Condition()
+        self._waiting: list[Job] = []
+        self._running: Job | None = None
+
+    @contextmanager
+    def slot(
+        self,
+        job_class: str = INTERACTIVE,
+        kind: str = "chat",
+        deadline: datetime | None = None,
+        label: str | None = None,
+    ):
+        """Hold the model for one job, blocking until it is its turn."""
+        if job_class not in JOB_CLASSES:
+            raise ValueError(f"Unknown job class {job_class!r}")
+        job = Job(
+            job_class,
+            kind,
+            deadline.timestamp() if deadline is not None else None,
+            time.monotonic(),
+            label,
+        )
+        with self._cond:
+            self._waiting.append(job)
+            INFERENCE_QUEUE_DEPTH.inc(job_class)
+            if self._running is None:
+                self._grant()
+            while self._running is not job:
+                self._cond.wait()
+        try:
+            yield job
+        finally:
+            with self._cond:
+                self._running = None
+                self._grant()
+            if job_class == BACKGROUND:
+                check_deadline(kind, job.deadline, label)
+
+    def _grant(self) -> None:
+        """Hand the model to the best waiting job (lock held)."""
+        if not self._waiting:
+            return
+        now = time.monotonic()
+        job = min(self._waiting, key=lambda j: j.rank(now, self.max_wait))
+        self._waiting.remove(job)
+        self._running = job
+        INFERENCE_QUEUE_DEPTH.dec(job.job_class)
+        INFERENCE_QUEUE_SECONDS.observe(now - job.enqueued, job.job_class)
+        if job.job_class == BACKGROUND and any(
+            j.job_class == INTERACTIVE for j in self._waiting
+        ):
+            INFERENCE_PROMOTIONS.inc(job.kind)
+        self._cond.notify_all()
+
+    def stats(self) -> dict:
+        with self._cond:
+            depth = Counter(job.job_class for job in self._waiting)
+            running = self._running
+        return {
+            "running": running.kind if running is not None else None,
+            "queue_depth": {name: depth[name] for name in JOB_CLASSES},
+        }
+
+
+_scheduler = InferenceScheduler(settings.scheduler_max_wait)
+
+
+def get_scheduler() -> InferenceScheduler:
+    return _scheduler
@@ -0,0 +1,174 @@
+"""Intake session state with durable, append-only persistence.
+
+Every turn is appended to a newline-delimited orjson log. Appends are
+handed to a background writer thread (write-behind), so persistence
+never blocks the response path. On startup the log is replayed to
+rehydrate open sessions and then compacted so closed sessions do not
+slow down the next restart.
+"""
+
+import time
+import uuid
+from collections import OrderedDict
+from collections.abc import Iterator
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from app.memory import register, sizeof
+from app.recordlog import RecordLog
+
+
+@dataclass(slots=True)
+class ChatSession:
+    """In-memory state for one intake conversation."""
+
+    session_id: str
+    messages: list[dict] = field(default_factory=list)
+    created_at: float = field(default_factory=time.time)
+    closed: bool = False
+
+    @property
+    def turn_count(self) -> int:
+        """Number of completed user turns in the conversation."""
+        return sum(1 for m in self.messages if m["role"] == "user")
+
+
+class SessionClosed(Exception):
+    """The session's intake was already summarized and closed."""
+
+
+class SessionStore:
+    """Session registry keyed by session id.
+
+    With a ``RecordLog`` attached, every mutation is also recorded in
+    the log. Without one, sessions live only in process memory. The ids
+    of the last ``max_closed`` closed sessions are remembered (in
+    memory only) so a late message cannot reopen a finished intake.
+    """
+
+    def __init__(self, log: RecordLog | None = None, max_closed: int = 10_000):
+        self.log = log
+        self.sessions: dict[str, ChatSession] = {}
+        self.closed: OrderedDict[str, None] = OrderedDict()
+        self.max_closed = max_closed
+
+    def get_or_create(self, session_id: str | None = None) -> ChatSession:
+        """Return the open session, creating it if the id is new.
+
+        Raises ``SessionClosed`` for a recently closed session.
+        """
+        if session_id is not None and session_id in self.sessions:
+            return self.sessions[session_id]
+        if session_id in self.closed:
+            raise SessionClosed(session_id)
+        session = ChatSession(session_id=session_id or uuid.uuid4().hex)
+        self.sessions[session.session_id] = session
+        self._record(
+            {"sid": session.session_id, "op": "open", "ts": session.created_at}
+        )
+        return session
+
+    def append(self, session: ChatSession, role: str, content: str) -> None:
+        session.messages.append({"role": role, "content": content})
+        self._record(
+            {"sid": session.session_id, "op": "turn", "r": role, "c": content}
+        )
+
+    def close(self, session_id: str) -> None:
+        session = self.sessions.pop(session_id, None)
+        if session is None:
+            return
+        session.closed = True
+        self.closed[session_id] = None
+        while len(self.closed) > self.max_closed:
+            self.closed.popitem(last=False)
+        self._record({"sid": session_id, "op": "close"})
+
+    def rehydrate(self) -> int:
+        """Rebuild open sessions from the log and compact it.
+
+        Returns the number of open sessions restored.
+        """
+        if self.log is None:
+            return 0
+        sessions: dict[str, ChatSession] = {}
+        for record in self.log.replay():
+            sid = record["sid"]
+            op = record["op"]
+            if op == "open":
+                sessions[sid] = ChatSession(
+                    session_id=sid, created_at=record["ts"]
+                )
+            elif op == "turn":
+                session = sessions.get(sid)
+                if session is not None:
+                    session.messages.append(
+                        {"role": record["r"], "content": record["c"]}
+                    )
+            elif op == "close":
+                sessions.pop(sid, None)
+        self.sessions = sessions
+        self.log.rewrite(self._snapshot_records())
+        return len(sessions)
+
+    def _snapshot_records(self) -> Iterator[dict]:
+        for session in self.sessions.values():
+            yield {
+                "sid": session.session_id,
+                "op": "open",
+                "ts": session.created_at,
+            }
+            for m in session.messages:
+                yield {
+                    "sid": session.session_id,
+                    "op": "turn",
+                    "r": m["role"],
+                    "c": m["content"],
+                }
+
+    def _record(self, record: dict) -> None:
+        if self.log is not None:
+            self.log.append(record)
+
+
+_store = SessionStore()
+
+
+def get_store() -> SessionStore:
+    return _store
+
+
+def open_store(
+    path: Path, flush_interval: float = 0.05, batch_size: int = 256
+) -> int:
+    """Attach a persistent log, rehydrate sessions, and start writing.
+
+    Returns the number of open sessions restored from disk.
+    """
+    global _store
+    log = RecordLog(path, flush_interval=flush_interval, batch_size=batch_size)
+    store = SessionStore(log)
+    restored = store.rehydrate()
+    log.start()
+    _store = store
+    return restored
+
+
+def use_store(store: SessionStore) -> None:
+    """Make ``store`` the active store (a split-mode worker's remote one)."""
+    global _store
+    _store = store
+
+
+def close_store() -> None:
+    """Flush the session log and detach it from the active store."""
+    if _store.log is not None:
+        _store.log.stop()
+
+
+def _session_bytes() -> int:
+    # A split-mode worker's remote store keeps no sessions.
+    return sum(sizeof(s.messages) for s in list(_store.sessions.values()))
+
+
+register("sessions", _session_bytes)
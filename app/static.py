@@ -0,0 +1,193 @@
+"""Serve the chat widget with precompressed, cacheable responses.
+
+Students open the widget on phones, often over a slow link, so page load
+should cost as few bytes and round trips as possible. ``AssetStaticFiles``
+(the ``/static`` mount) keeps each file in memory, compressed once with
+brotli (when installed) and gzip, and picks the variant the client
+accepts. Every response carries a strong ETag derived from the content,
+so revalidation is a bodiless 304.
+
+The index page served at ``/`` links its assets with their content
+hash as ``?v=``. Those URLs change whenever the file does, so they are
+served as immutable and cached for a year; everything else, including
+the page itself, is revalidated on each load (``no-cache``).
+"""
+
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from urllib.parse import parse_qs
+
+from starlette.datastructures import Headers
+from starlette.responses import Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+COMPRESSIBLE = (
+    "text/",
+    "application/javascript",
+    "application/json",
+    "image/svg+xml",
+)
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+# Preferred first when the client accepts several.
+ENCODINGS = ("br", "gzip")
+# Relative asset links in the index page, rewritten to versioned URLs.
+_ASSET_LINK = re.compile(r'(src|href)="(\w[\w./-]*)"')
+
+
+@dataclass(frozen=True, slots=True)
+class Asset:
+    digest: str
+    media_type: str
+    # Content encoding ("identity", "br", "gzip") -> body.
+    bodies: dict[str, bytes]
+    # (mtime_ns, size) of the source file, to notice edits.
+    stamp: tuple[int, int] = (0, 0)
+
+
+def _digest(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=8).hexdigest()
+
+
+def make_asset(data: bytes, media_type: str, stamp=(0, 0)) -> Asset:
+    """Hash and compress ``data`` once, keeping only smaller variants."""
+    bodies = {"identity": data}
+    if media_type.startswith(COMPRESSIBLE):
+        if brotli is not None:
+            bodies["br"] = brotli.compress(data, quality=11)
+        bodies["gzip"] = gzip.compress(data, compresslevel=9, mtime=0)
+        for encoding in ENCODINGS:
+            if len(bodies.get(encoding, data)) >= len(data):
+                bodies.pop(encoding, None)
+    return Asset(_digest(data), media_type, bodies, stamp)
+
+
+def choose_encoding(accept_encoding: str, available) -> str:
+    """The best encoding in ``available`` that the client accepts."""
+    accepted = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        if match := re.search(r"q=([\d.]+)", params):
+            q = float(match.group(1))
+        accepted[name.strip()] = q
+    for encoding in ENCODINGS:
+        q = accepted.get(encoding, accepted.get("*", 0.0))
+        if encoding in available and q > 0:
+            return encoding
+    return "identity"
+
+
+class AssetStaticFiles(StaticFiles):
+    """``StaticFiles`` serving precompressed, content-addressed assets."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._assets: dict[str, Asset] = {}
+        self._index: Asset | None = None
+        self._lock = threading.Lock()
+
+    def asset(self, full_path, stat_result: os.stat_result) -> Asset:
+        stamp = (stat_result.st_mtime_ns, stat_result.st_size)
+        key = str(full_path)
+        asset = self._assets.get(key)
+        if asset is None or asset.stamp != stamp:
+            media_type = (
+                mimetypes.guess_type(key)[0] or "application/octet-stream"
+            )
+            asset = make_asset(Path(key).read_bytes(), media_type, stamp)
+            with self._lock:
+                self._assets[key] = asset
+        return asset
+
+    def precompress(self) -> int:
+        """Load and compress every file up front; returns the count."""
+        count = 0
+        for path in Path(self.directory).rglob("*"):
+            if path.is_file():
+                self.asset(path, path.stat())
+                count += 1
+        return count
+
+    def versioned_url(self, name: str) -> str | None:
+        """``/static/<name>?v=<hash>``, or None if there is no such file."""
+        path = Path(self.directory) / name
+        if not path.is_file():
+            return None
+        return f"/static/{name}?v={self.asset(path, path.stat()).digest}"
+
+    def file_response(
+        self,
+        full_path,
+        stat_result: os.stat_result,
+        scope,
+        status_code: int = 200,
+    ) -> Response:
+        asset = self.asset(full_path, stat_result)
+        query = parse_qs(scope.get("query_string", b"").decode())
+        immutable = query.get("v") == [asset.digest]
+        return self.respond(
+            asset,
+            Headers(scope=scope),
+            IMMUTABLE if immutable else REVALIDATE,
+            status_code,
+        )
+
+    def respond(
+        self,
+        asset: Asset,
+        request_headers: Headers,
+        cache_control: str = REVALIDATE,
+        status_code: int = 200,
+    ) -> Response:
+        encoding = choose_encoding(
+            request_headers.get("accept-encoding", ""), asset.bodies
+        )
+        # Strong ETags are per representation.
+        etag = (
+            f'"{asset.digest}"'
+            if encoding == "identity"
+            else f'"{asset.digest}-{encoding}"'
+        )
+        headers = {
+            "etag": etag,
+            "cache-control": cache_control,
+            "vary": "Accept-Encoding",
+        }
+        if encoding != "identity":
+            headers["content-encoding"] = encoding
+        if self.is_not_modified(Headers(headers), request_headers):
+            return NotModifiedResponse(Headers(headers))
+        return Response(
+            asset.bodies[encoding],
+            status_code=status_code,
+            headers=headers,
+            media_type=asset.media_type,
+        )
+
+    def index_response(self, request_headers: Headers) -> Response:
+        """``index.html`` with its asset links pinned to content hashes."""
+        path = Path(self.directory) / "index.html"
+        html = path.read_text()
+
+        def pin(match: re.Match) -> str:
+            url = self.versioned_url(match.group(2))
+            return f'{match.group(1)}="{url or match.group(2)}"'
+
+        data = _ASSET_LINK.sub(pin, html).encode()
+        index = self._index
+        if index is None or index.digest != _digest(data):
+            index = make_asset(data, "text/html")
+            self._index = index
+        return self.respond(index, request_headers)
@@ -0,0 +1,334 @@
+"""Per-turn span tracing and an on-demand sampling CPU profiler.
+
+Each /chat turn opens a ``Trace``; code on the request path wraps its
+stages in ``span()``. When the turn finishes the trace (id, session,
+turn number and a flat list of timed spans) is appended as one JSONL
+record to the trace log. Outside an active trace ``span()`` does no
+work, so library code can be instrumented unconditionally.
+
+``arm_profiler(n)`` makes the next ``n`` traces run under a sampling
+profiler that periodically captures the Python stacks of the threads
+executing those traces. The profile is written once those traces
+finish, or earlier if the profiler times out, is re-armed or is shut
+down with ``disarm_profiler()``. Samples are written in folded-stack format
+(one ``frame;frame;frame count`` line per unique stack), which
+flamegraph.pl and speedscope read directly.
+"""
+
+import logging
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from app.metrics import STAGE_SECONDS
+from app.recordlog import RecordLog
+
+logger = logging.getLogger(__name__)
+
+_current_trace: ContextVar["Trace | None"] = ContextVar(
+    "current_trace", default=None
+)
+_current_span: ContextVar[int | None] = ContextVar("current_span", default=None)
+
+_log: RecordLog | None = None
+
+
+@dataclass(slots=True)
+class Trace:
+    """Timeline of one conversation turn."""
+
+    session_id: str | None
+    turn: int
+    trace_id: str = field(default_factory=lambda: uuid.uuid4().hex[:16])
+    start: float = field(default_factory=time.perf_counter)
+    started_at: float = field(default_factory=time.time)
+    spans: list[dict] = field(default_factory=list)
+    profile: "SamplingProfiler | None" = None
+
+    def add_span(
+        self,
+        name: str,
+        start: float,
+        end: float,
+        parent: int | None = None,
+        **attrs,
+    ) -> int:
+        """Record a finished span from ``perf_counter`` timestamps."""
+        span = {
+            "id": len(self.spans),
+            "name": name,
+            "parent": parent,
+            "start_ms": round((start - self.start) * 1000, 3),
+            "duration_ms": round((end - start) * 1000, 3),
+        }
+        if attrs:
+            span["attrs"] = attrs
+        self.spans.append(span)
+        return span["id"]
+
+
+def current_trace() -> Trace | None:
+    return _current_trace.get()
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """Time the enclosed block as a child of the current span."""
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+    parent = _current_span.get()
+    # Reserve the slot now so children can point at it as their parent.
+    span_id = trace.add_span(name, 0.0, 0.0, parent, **attrs)
+    token = _current_span.set(span_id)
+    if trace.profile is not None:
+        trace.profile.enter_thread()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        end = time.perf_counter()
+        if trace.profile is not None:
+            trace.profile.exit_thread()
+        _current_span.reset(token)
+        record = trace.spans[span_id]
+        record["start_ms"] = round((start - trace.start) * 1000, 3)
+        record["duration_ms"] = round((end - start) * 1000, 3)
+
+
+@contextmanager
+def stage(name: str):
+    """Time a request stage into both the stage histogram and the trace."""
+    with STAGE_SECONDS.time(name), span(name):
+        yield
+
+
+def record_span(name: str, start: float, end: float, **attrs) -> None:
+    """Attach an already-measured interval to the current trace."""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add_span(name, start, end, _current_span.get(), **attrs)
+
+
+@contextmanager
+def trace_turn(session_id: str | None, turn: int):
+    """Trace one conversation turn and write it to the trace log."""
+    trace = Trace(session_id=session_id, turn=turn)
+    trace.profile = _profiler_slot()
+    token = _current_trace.set(trace)
+    try:
+        with span("chat"):
+            yield trace
+    finally:
+        _current_trace.reset(token)
+        _finish(trace)
+
+
+def _finish(trace: Trace) -> None:
+    record = {
+        "trace_id": trace.trace_id,
+        "session_id": trace.session_id,
+        "turn": trace.turn,
+        "ts": trace.started_at,
+        "duration_ms": trace.spans[0]["duration_ms"],
+        "spans": trace.spans,
+    }
+    if trace.profile is not None:
+        record["profile"] = str(trace.profile.path)
+        trace.profile.release(trace.trace_id)
+    if _log is not None:
+        _log.append(record)
+
+
+def open_trace_log(path: Path) -> None:
+    """Start writing finished traces to ``path`` as JSONL."""
+    global _log
+    _log = RecordLog(path)
+    _log.start()
+
+
+def close_trace_log() -> None:
+    global _log
+    if _log is not None:
+        _log.stop()
+        _log = None
+
+
+class SamplingProfiler:
+    """Samples stacks of threads that are inside profiled traces.
+
+    One profiler is shared by the ``n`` traces it was armed for. It
+    starts sampling on the first of them and writes its folded stacks
+    to ``path`` once the last one finishes, or when ``stop()`` is
+    called, which happens by itself ``timeout`` seconds after arming.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        traces: int,
+        interval: float = 0.005,
+        timeout: float = 300.0,
+    ):
+        self.path = path
+        self.interval = interval
+        self.remaining = traces
+        self.active = 0
+        self.stopped = False
+        self.trace_ids: list[str] = []
+        self.samples: Counter[str] = Counter()
+        self._threads: Counter[int] = Counter()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sampler: threading.Thread | None = None
+        self._timer = threading.Timer(timeout, self.stop)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def acquire(self) -> bool:
+        """Claim one of the armed trace slots, starting the sampler."""
+        with self._lock:
+            if self.remaining == 0 or self.stopped:
+                return False
+            self.remaining -= 1
+            self.active += 1
+            if self._sampler is None:
+                self._sampler = threading.Thread(
+                    target=self._run, name="trace-profiler", daemon=True
+                )
+                self._sampler.start()
+            return True
+
+    def release(self, trace_id: str) -> None:
+        with self._lock:
+            self.trace_ids.append(trace_id)
+            self.active -= 1
+            if self.active == 0 and self.remaining == 0:
+                self._close()
+
+    def stop(self) -> None:
+        """Stop sampling now and write what has been captured so far.
+
+        Traces still running keep their slot but are no longer sampled.
+        """
+        with self._lock:
+            self._close()
+
+    def _close(self) -> None:
+        if self.stopped:
+            return
+        self.stopped = True
+        self._timer.cancel()
+        if self._sampler is None:
+            # Nothing was sampled; still leave a (empty) profile behind.
+            self._write()
+        else:
+            # The sampler thread writes the profile once it stops.
+            self._stop.set()
+
+    def enter_thread(self) -> None:
+        with self._lock:
+            self._threads[threading.get_ident()] += 1
+
+    def exit_thread(self) -> None:
+        ident = threading.get_ident()
+        with self._lock:
+            self._threads[ident] -= 1
+            if self._threads[ident] <= 0:
+                del self._threads[ident]
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            with self._lock:
+                idents = set(self._threads)
+            if not idents:
+                continue
+            for ident, frame in sys._current_frames().items():
+                if ident in idents:
+                    self.samples[_fold(frame)] += 1
+        self._write()
+
+    def _write(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "w") as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+        logger.info(
+            "Wrote CPU profile for %d traces to %s",
+            len(self.trace_ids),
+            self.path,
+        )
+
+
+def _fold(frame) -> str:
+    stack = []
+    while frame is not None:
+        code = frame.f_code
+        stack.append(
+            f"{code.co_name} ({Path(code.co_filename).name}:{frame.f_lineno})"
+        )
+        frame = frame.f_back
+    return ";".join(reversed(stack))
+
+
+_armed: SamplingProfiler | None = None
+_armed_lock = threading.Lock()
+
+
+def arm_profiler(
+    requests: int,
+    directory: Path,
+    interval: float = 0.005,
+    timeout: float = 300.0,
+) -> Path:
+    """Profile the next ``requests`` traced turns, for up to ``timeout`` s.
+
+    A profiler armed earlier is stopped and its profile written.
+    Returns the path the folded-stack profile will be written to.
+    """
+    global _armed
+    stamp = time.strftime("%Y%m%dT%H%M%S")
+    path = directory / f"profile-{stamp}-{uuid.uuid4().hex[:6]}.folded"
+    with _armed_lock:
+        previous = _armed
+        _armed = SamplingProfiler(path, requests, interval, timeout)
+    if previous is not None:
+        previous.stop()
+    return path
+
+
+def disarm_profiler() -> None:
+    """Stop the armed profiler, if any, writing its profile."""
+    global _armed
+    with _armed_lock:
+        profiler = _armed
+        _armed = None
+    if profiler is not None:
+        profiler.stop()
+
+
+def profiler_status() -> dict:
+    with _armed_lock:
+        if _armed is None:
+            return {"armed": False}
+        return {
+            "armed": not _armed.stopped
+            and (_armed.remaining > 0 or _armed.active > 0),
+            "remaining": _armed.remaining,
+            "path": str(_armed.path),
+        }
+
+
+def _profiler_slot() -> SamplingProfiler | None:
+    with _armed_lock:
+        profiler = _armed
+    if profiler is not None and profiler.acquire():
+        return profiler
+    return None
@@ -0,0 +1,136 @@
+"""Microbenchmark harness for the app's hot paths.
+
+Run with ``uv run pytest benchmarks``. Each benchmark records per-call
+timings through the ``benchmark`` fixture; at the end of the session
+all results are written as JSON to ``benchmarks/results/<commit>.json``
+(or ``--bench-json``). Compare two runs with
+``scripts/compare_benchmarks.py``.
+"""
+
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pytest
+
+from tests.conftest import tmp_chroma_path, tmp_rag_corpus  # noqa: F401
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+_results: dict[str, dict] = {}
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        "--bench-json",
+        type=Path,
+        default=None,
+        help="Where to write benchmark results (default: results/<commit>)",
+    )
+
+
+def git_revision() -> str:
+    """Short commit hash, suffixed with -dirty for uncommitted changes."""
+    try:
+        rev = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=REPO_ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+        dirty = subprocess.run(
+            ["git", "diff", "--quiet", "HEAD", "--", "app", "scripts"],
+            cwd=REPO_ROOT,
+        ).returncode
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return f"{rev}-dirty" if dirty else rev
+
+
+class Benchmark:
+    """Time a callable over several rounds and record the statistics."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.stats: dict = {}
+
+    def __call__(
+        self,
+        fn,
+        *args,
+        rounds: int = 15,
+        min_round_time: float = 0.02,
+        setup=None,
+        **kwargs,
+    ):
+        """Benchmark ``fn(*args, **kwargs)``.
+
+        Without ``setup`` each round runs ``fn`` enough times to take at
+        least ``min_round_time``. With ``setup`` (e.g. to reset a cache
+        for a cold-path measurement), ``setup()`` runs untimed before
+        every single call.
+        """
+        number = 1
+        if setup is None:
+            start = time.perf_counter()
+            result = fn(*args, **kwargs)
+            once = time.perf_counter() - start
+            number = max(1, int(min_round_time / max(once, 1e-9)))
+
+        per_call = []
+        for _ in range(rounds):
+            if setup is not None:
+                setup()
+            start = time.perf_counter()
+            for _ in range(number):
+                result = fn(*args, **kwargs)
+            per_call.append((time.perf_counter() - start) / number)
+
+        median = statistics.median(per_call)
+        self.stats = {
+            "rounds": rounds,
+            "calls_per_round": number,
+            "min_s": min(per_call),
+            "median_s": median,
+            "mean_s": statistics.fmean(per_call),
+            "stdev_s": statistics.stdev(per_call) if rounds > 1 else 0.0,
+            "ops_per_s": 1 / median if median else float("inf"),
+        }
+        _results[self.name] = self.stats
+        return result
+
+    def extra(self, **values) -> None:
+        """Attach extra metrics (e.g. rows/sec) to this benchmark."""
+        self.stats.update(values)
+
+
+@pytest.fixture
+def benchmark(request) -> Benchmark:
+    return Benchmark(request.node.name)
+
+
+def pytest_sessionfinish(session, exitstatus):
+    if not _results:
+        return
+    revision = git_revision()
+    path = session.config.getoption("--bench-json") or (
+        RESULTS_DIR / f"{revision}.json"
+    )
+    path.parent.mkdir(parents=True, exist_ok=True)
+    payload = {
+        "revision": revision,
+        "created_at": datetime.now(tz=timezone.utc).isoformat(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "benchmarks": dict(sorted(_results.items())),
+    }
+    path.write_text(json.dumps(payload, indent=2) + "\n")
+    print(f"\nWrote {len(_results)} benchmark results to {path}")
@@ -0,0 +1,61 @@
+from datetime import datetime, timezone
+
+import app.chat as chat_module
+from app.fake_model import FakeTokenizer
+from app.sessions import ChatSession
+
+CONTEXT = (
+    "## Ser vs Estar\n\nSer is used for permanent characteristics. "
+    "Estar is used for temporary states and locations.\n---\n"
+) * 3
+
+
+def _reset_prompt_cache():
+    chat_module._system_prompt_template = None
+
+
+def test_load_system_prompt_cold(benchmark):
+    benchmark(chat_module._load_system_prompt, setup=_reset_prompt_cache)
+
+
+def test_load_system_prompt_warm(benchmark):
+    chat_module._load_system_prompt()
+    benchmark(chat_module._load_system_prompt)
+
+
+def test_prompt_templating(benchmark):
+    """Prompt assembly for a mid-intake turn, as ``/chat`` runs it.
+
+    Covers placeholder substitution, chat-template rendering and
+    tokenization.
+    """
+    template = chat_module._load_system_prompt()
+    tokenizer = FakeTokenizer()
+    session = ChatSession(
+        session_id="bench",
+        messages=[
+            {"role": "user", "content": "SPA 212-T"},
+            {
+                "role": "assistant",
+                "content": "What area do you need help with?",
+            },
+            {"role": "user", "content": "Grammar"},
+            {"role": "assistant", "content": "Which grammar topic?"},
+        ],
+    )
+    request = chat_module.ChatRequest(
+        message="Ser vs. estar",
+        session_id="bench",
+        visitor_name="Parker",
+        booking_ref="bk-123",
+        appointment_datetime=datetime(2026, 3, 3, 13, 0, tzinfo=timezone.utc),
+    )
+
+    benchmark(
+        chat_module._build_prompt,
+        request,
+        session,
+        tokenizer,
+        template,
+        CONTEXT,
+    )
@@ -0,0 +1,58 @@
+import itertools
+from unittest.mock import patch
+
+import pytest
+
+import app.rag as rag_module
+from app.config import settings
+
+
+@pytest.fixture
+def rag_settings(tmp_rag_corpus, tmp_chroma_path, tmp_path):
+    try:
+        rag_module.get_embed_model()
+    except OSError as e:
+        pytest.skip(f"Embedding model unavailable: {e}")
+    # The embedding cache reads the real settings, not app.rag's.
+    with (
+        patch.object(
+            settings, "embed_cache_path", tmp_path / "embed_cache.sqlite3"
+        ),
+        patch("app.rag.settings") as mock_settings,
+    ):
+        mock_settings.rag_corpus_path = tmp_rag_corpus
+        mock_settings.chroma_db_path = tmp_chroma_path
+        mock_settings.rag_top_k = 3
+        rag_module._index = None
+        yield mock_settings
+    rag_module._index = None
+
+
+def test_build_index_cold(benchmark, rag_settings, tmp_path):
+    """Full read, chunk and embed into a fresh Chroma directory."""
+    counter = itertools.count()
+
+    def fresh_store():
+        n = next(counter)
+        rag_settings.chroma_db_path = tmp_path / f"chroma-{n}"
+        # An empty embedding cache too, or every round after the first
+        # would only read cached vectors.
+        settings.embed_cache_path = tmp_path / f"embed_cache-{n}.sqlite3"
+        rag_module._index = None
+
+    benchmark(rag_module.build_index, setup=fresh_store, rounds=5)
+
+
+def test_build_index_warm(benchmark, rag_settings):
+    """Reopen an already populated collection."""
+    rag_module.build_index()
+
+    def reset_index():
+        rag_module._index = None
+
+    benchmark(rag_module.build_index, setup=reset_index, rounds=10)
+
+
+def test_retrieve_context(benchmark, rag_settings):
+    rag_module.build_index()
+    benchmark(rag_module.retrieve_context, "ser vs estar with locations")
@@ -0,0 +1,23 @@
+from app.summary import IntakeSummary
+from tests.test_summary import _valid_summary
+
+SUMMARY_JSON = IntakeSummary(**_valid_summary()).model_dump_json()
+SUMMARY_DICT = IntakeSummary(**_valid_summary()).model_dump(mode="json")
+
+
+def test_summary_validate_dict(benchmark):
+    benchmark(IntakeSummary.model_validate, SUMMARY_DICT)
+
+
+def test_summary_validate_json(benchmark):
+    benchmark(IntakeSummary.model_validate_json, SUMMARY_JSON)
+
+
+def test_summary_dump_json(benchmark):
+    summary = IntakeSummary.model_validate(SUMMARY_DICT)
+    benchmark(summary.model_dump_json)
+
+
+def test_summary_dump_dict(benchmark):
+    summary = IntakeSummary.model_validate(SUMMARY_DICT)
+    benchmark(summary.model_dump, mode="json")
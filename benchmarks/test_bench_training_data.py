@@ -0,0 +1,27 @@
+import json
+import random
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+from generate_training_data import (  # noqa: E402
+    PERSONA_PATH,
+    generate_conversation,
+)
+
+
+def test_generate_training_data(benchmark):
+    """One conversation per persona, serialized to a JSONL line."""
+    personas = json.loads(PERSONA_PATH.read_text())["personas"]
+    random.seed(42)
+
+    def generate_all():
+        return [
+            json.dumps({"messages": generate_conversation(p)}) for p in personas
+        ]
+
+    benchmark(generate_all)
+    benchmark.extra(
+        conversations_per_s=len(personas) / benchmark.stats["median_s"]
+    )
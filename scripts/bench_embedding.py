@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""Time cold and warm RAG index builds through the embedding cache.
+
+A cold build starts from an empty chunk-embedding cache and embeds
+every chunk of the corpus. A warm build indexes into a fresh Chroma
+directory, as after switching vector stores or wiping the index, with
+the cache the cold build filled, so it only pays for chunking, cache
+reads and Chroma inserts. Each batch size and worker count gets its
+own cache. The embedding model and Chroma are loaded before timing
+starts; worker processes (``--workers`` > 1) load their models inside
+the cold build.
+
+The course corpus is only a handful of chunks, so ``--copies`` indexes
+that many copies of it (each copy's chunks embed differently, since a
+chunk's embedded text starts with its file path).
+
+Usage:
+    uv run python scripts/bench_embedding.py
+    uv run python scripts/bench_embedding.py --copies 40 --batch-sizes 16 64
+    uv run python scripts/bench_embedding.py --workers 0 2 --json e.json
+"""
+
+import argparse
+import json
+import logging
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+import chromadb  # noqa: E402
+
+import app.rag as rag_module  # noqa: E402
+from app.config import settings  # noqa: E402
+from app.metrics import CACHE_HITS, CACHE_MISSES  # noqa: E402
+
+
+def build(chroma_path: Path) -> dict:
+    """Build the index into ``chroma_path`` and report its throughput."""
+    settings.chroma_db_path = chroma_path
+    hits = CACHE_HITS.value("embedding")
+    misses = CACHE_MISSES.value("embedding")
+    start = time.perf_counter()
+    rag_module.build_index()
+    seconds = time.perf_counter() - start
+    chunks = rag_module._index.vector_store._collection.count()
+    return {
+        "chunks": chunks,
+        "cached": int(CACHE_HITS.value("embedding") - hits),
+        "embedded": int(CACHE_MISSES.value("embedding") - misses),
+        "seconds": round(seconds, 3),
+        "chunks_per_s": round(chunks / seconds, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Cold vs warm index builds with the embedding cache"
+    )
+    parser.add_argument(
+        "--corpus",
+        type=Path,
+        default=REPO_ROOT / "rag-corpus",
+        help="Markdown corpus to index (default: rag-corpus)",
+    )
+    parser.add_argument(
+        "--copies",
+        type=int,
+        default=20,
+        help="Copies of the corpus to index (default: 20)",
+    )
+    parser.add_argument(
+        "--batch-sizes",
+        type=int,
+        nargs="+",
+        default=[16, 64],
+        help="Embedding batch sizes to try (default: 16 64)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        nargs="+",
+        default=[0],
+        help="Embedding worker processes to try; 0 embeds in-process",
+    )
+    parser.add_argument("--json", type=Path, help="Also write the rows as JSON")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    workdir = Path(tempfile.mkdtemp())
+    try:
+        rows = run(args, workdir)
+    finally:
+        shutil.rmtree(workdir)
+
+    print(
+        f"\n{'batch':>5} {'workers':>7} {'chunks':>6} {'cold/s':>8} "
+        f"{'warm/s':>8} {'warm hit':>8} {'speedup':>7}"
+    )
+    for row in rows:
+        cold, warm = row["cold"], row["warm"]
+        print(
+            f"{row['batch_size']:>5} {row['workers']:>7} "
+            f"{cold['chunks']:>6} {cold['chunks_per_s']:>8.1f} "
+            f"{warm['chunks_per_s']:>8.1f} "
+            f"{warm['cached'] / max(warm['chunks'], 1):>8.0%} "
+            f"{warm['chunks_per_s'] / cold['chunks_per_s']:>6.1f}x"
+        )
+    if args.json:
+        args.json.write_text(json.dumps(rows, indent=2) + "\n")
+
+
+def run(args, workdir: Path) -> list[dict]:
+    corpus = workdir / "corpus"
+    for i in range(args.copies):
+        shutil.copytree(args.corpus, corpus / f"copy-{i}")
+    settings.rag_corpus_path = corpus
+    model = rag_module.get_embed_model()
+    chromadb.PersistentClient(path=str(workdir / "warmup"))
+    rows = []
+    for workers in args.workers:
+        for batch_size in args.batch_sizes:
+            settings.embed_batch_size = model.embed_batch_size = batch_size
+            settings.embed_workers = workers
+            run_dir = workdir / f"batch-{batch_size}-workers-{workers}"
+            settings.embed_cache_path = run_dir / "embeddings.sqlite3"
+            cold = build(run_dir / "cold")
+            warm = build(run_dir / "warm")
+            rows.append(
+                {
+                    "batch_size": batch_size,
+                    "workers": workers,
+                    "cold": cold,
+                    "warm": warm,
+                }
+            )
+            print(
+                f"batch {batch_size}, workers {workers}: "
+                f"cold {cold['chunks_per_s']:.1f} chunks/s, "
+                f"warm {warm['chunks_per_s']:.1f} chunks/s"
+            )
+    return rows
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""Compare query embedding on PyTorch and on the int8 ONNX export.
+
+Each backend runs in a fresh process, which reports the time to import
+and load the model, per-query latency over intake-style messages (after
+a warm-up) and its peak RSS, so one backend's libraries never inflate
+the other's numbers. Also reports how closely the two backends agree
+(mean cosine similarity) when both are available.
+
+Build the export first with scripts/export_onnx_embedder.py.
+
+Usage:
+    uv run python scripts/bench_query_embedding.py
+    uv run python scripts/bench_query_embedding.py --queries 500 --json q.json
+"""
+
+import argparse
+import json
+import resource
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+STARTED = time.perf_counter()
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+MESSAGES = [
+    "Hi",
+    "I keep mixing up ser and estar when I describe places",
+    "When do I use the preterite instead of the imperfect?",
+    "Can you help me outline my composition for Escritura I?",
+    "I'm stressed about the midterm exam next week and don't know "
+    "where to start studying the subjunctive triggers",
+    "Vocabulary",
+    "I think I mostly get it but I want to check my answers for "
+    "Chapter 3 practice before I turn it in on Friday",
+    "Can you recommend a good restaurant near campus?",
+]
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+def child(backend: str, queries: int) -> None:
+    """Load ``backend``, time queries and print one JSON line."""
+    if backend == "onnx":
+        from app.config import settings
+        from app.onnx_embedding import OnnxQueryEmbedding
+
+        model = OnnxQueryEmbedding(settings.onnx_embed_path)
+    else:
+        from app.rag import get_embed_model
+
+        model = get_embed_model()
+    load_seconds = time.perf_counter() - STARTED
+
+    for message in MESSAGES:
+        model.get_query_embedding(message)
+    latencies = []
+    for i in range(queries):
+        start = time.perf_counter()
+        model.get_query_embedding(MESSAGES[i % len(MESSAGES)])
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    print(
+        json.dumps(
+            {
+                "backend": backend,
+                "load_s": round(load_seconds, 2),
+                "p50_ms": round(statistics.median(latencies), 2),
+                "p95_ms": round(latencies[int(0.95 * len(latencies))], 2),
+                "peak_rss_mb": round(peak_rss_mb(), 1),
+                "embeddings": [model.get_query_embedding(m) for m in MESSAGES],
+            }
+        )
+    )
+
+
+def measure(backend: str, queries: int) -> dict | None:
+    proc = subprocess.run(
+        [
+            sys.executable,
+            __file__,
+            "--child",
+            backend,
+            "--queries",
+            str(queries),
+        ],
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        print(f"{backend}: failed\n{proc.stderr.strip()[-2000:]}")
+        return None
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Query embedding latency and memory, PyTorch vs ONNX"
+    )
+    parser.add_argument(
+        "--queries",
+        type=int,
+        default=200,
+        help="Timed queries per backend (default: 200)",
+    )
+    parser.add_argument("--json", type=Path, help="Also write rows as JSON")
+    parser.add_argument(
+        "--child", choices=["torch", "onnx"], help=argparse.SUPPRESS
+    )
+    args = parser.parse_args()
+    if args.child:
+        child(args.child, args.queries)
+        return
+
+    rows = [
+        row
+        for backend in ("torch", "onnx")
+        if (row := measure(backend, args.queries)) is not None
+    ]
+    print(
+        f"\n{'backend':>7} {'load s':>7} {'p50 ms':>7} {'p95 ms':>7} "
+        f"{'peak RSS MB':>11}"
+    )
+    for row in rows:
+        print(
+            f"{row['backend']:>7} {row['load_s']:>7.2f} {row['p50_ms']:>7.2f} "
+            f"{row['p95_ms']:>7.2f} {row['peak_rss_mb']:>11.1f}"
+        )
+    if len(rows) == 2:
+        similarities = [
+            float(sum(a * b for a, b in zip(x, y)))
+            for x, y in zip(rows[0]["embeddings"], rows[1]["embeddings"])
+        ]
+        print(
+            f"\nONNX vs PyTorch cosine: mean "
+            f"{statistics.mean(similarities):.4f}, "
+            f"min {min(similarities):.4f}"
+        )
+    for row in rows:
+        del row["embeddings"]
+    if args.json:
+        args.json.write_text(json.dumps(rows, indent=2) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""Benchmark session log write throughput and startup rehydration.
+
+Writes a log with N open sessions of typical intake length through the
+write-behind RecordLog, then measures how long SessionStore takes to
+rehydrate (replay + compaction) from it.
+
+Usage:
+    uv run python scripts/bench_session_recovery.py
+    uv run python scripts/bench_session_recovery.py --sessions 10000 --turns 7
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+from app.recordlog import RecordLog  # noqa: E402
+from app.sessions import SessionStore  # noqa: E402
+
+USER_TURN = "I keep mixing up ser and estar when I describe locations."
+ASSISTANT_TURN = (
+    "Thanks! Is there a specific assignment or exercise connected to "
+    'this? For example, "Escritura I" or "ED 8" or "Chapter 3 practice."'
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark session persistence and recovery"
+    )
+    parser.add_argument(
+        "--sessions",
+        type=int,
+        default=10_000,
+        help="Number of open sessions to write (default: 10000)",
+    )
+    parser.add_argument(
+        "--turns",
+        type=int,
+        default=7,
+        help="User/assistant turn pairs per session (default: 7)",
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "sessions.log"
+        log = RecordLog(path)
+        store = SessionStore(log)
+        log.start()
+
+        start = time.perf_counter()
+        for i in range(args.sessions):
+            session = store.get_or_create(f"sess-{i:06d}")
+            for _ in range(args.turns):
+                store.append(session, "user", USER_TURN)
+                store.append(session, "assistant", ASSISTANT_TURN)
+        enqueued = time.perf_counter() - start
+        log.stop()
+        written = time.perf_counter() - start
+
+        records = args.sessions * (1 + 2 * args.turns)
+        size_mb = path.stat().st_size / 1e6
+        print(f"Records:          {records:,} ({size_mb:.1f} MB)")
+        print(
+            f"Append (enqueue): {enqueued:.2f}s "
+            f"({records / enqueued:,.0f} records/s, "
+            f"{enqueued / records * 1e6:.1f} µs/record on request path)"
+        )
+        print(f"Durable on disk:  {written:.2f}s")
+
+        start = time.perf_counter()
+        restored = SessionStore(RecordLog(path))
+        count = restored.rehydrate()
+        elapsed = time.perf_counter() - start
+        print(f"Rehydrate:        {elapsed:.2f}s for {count:,} open sessions")
+
+
+if __name__ == "__main__":
+    main()
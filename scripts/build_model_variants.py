@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""Build quantized model variants and compare their latency and quality.
+
+For each variant in app.config.MODEL_VARIANTS (bfloat16, 8-bit and
+4-bit Qwen2.5-3B, plus an optional 4-bit 7B fallback):
+
+1. convert it with mlx_lm.convert if models/<name> does not exist,
+2. score it on training-data/test.jsonl with scripts/evaluate.py
+   (generations are cached, so re-runs only evaluate new variants),
+3. time realistic /chat turns: mid-conversation prompts from the test
+   set, generated with the server's 256-token limit, reporting turn
+   latency, time to first token, decode speed and peak memory.
+
+The score and free-text columns are scripts/evaluate.py's grade of the
+model's own closing-turn output. The table ends with a recommendation:
+the best-scoring variant whose p50 turn latency meets the per-turn
+target (2 s by default). Select it with INTAKE_BOT_MODEL_PATH=<name>.
+``--backend fake`` runs the whole comparison on app.fake_model without
+converting or loading any weights, to check the pipeline end to end.
+
+Usage:
+    uv run python scripts/build_model_variants.py
+    uv run python scripts/build_model_variants.py --include-7b --json v.json
+    uv run python scripts/build_model_variants.py --variants qwen2.5-3b-4bit \\
+        --limit 50 --latency-turns 10
+    uv run python scripts/build_model_variants.py --backend fake --limit 5
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import mlx.core as mx
+from mlx_lm import convert, stream_generate
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+sys.path.insert(0, str(REPO_ROOT / "scripts"))
+
+from evaluate import (  # noqa: E402
+    CACHE_PATH,
+    TEST_PATH,
+    Example,
+    FakeBackend,
+    MlxBackend,
+    ResultCache,
+    digest,
+    evaluate,
+    fingerprint,
+    load_examples,
+    summarize,
+)
+
+from app.config import MODEL_VARIANTS  # noqa: E402
+
+DEFAULT_VARIANTS = ["qwen2.5-3b", "qwen2.5-3b-8bit", "qwen2.5-3b-4bit"]
+FALLBACK_VARIANT = "qwen2.5-7b-4bit"
+# Matches the generation limit of the /chat endpoint.
+TURN_MAX_TOKENS = 256
+
+
+def build(name: str) -> Path:
+    """Convert a variant from Hugging Face unless it already exists."""
+    variant = MODEL_VARIANTS[name]
+    path = REPO_ROOT / variant.path
+    if path.exists():
+        print(f"{name}: using existing {variant.path}")
+        return path
+    print(f"{name}: converting {variant.hf_path} ...")
+    convert(
+        variant.hf_path,
+        mlx_path=str(path),
+        quantize=variant.q_bits is not None,
+        q_bits=variant.q_bits,
+        q_group_size=64 if variant.q_bits is not None else None,
+        dtype="bfloat16",
+    )
+    return path
+
+
+def turn_prompts(examples: list[Example], n: int) -> list[list[dict]]:
+    """Cut test conversations at varied user turns, like live /chat calls."""
+    prompts = []
+    for i, example in enumerate(examples[:n]):
+        users = [j for j, m in enumerate(example.prompt) if m["role"] == "user"]
+        if not users:
+            continue
+        cut = users[i % len(users)]
+        prompts.append(example.prompt[: cut + 1])
+    return prompts
+
+
+def percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+def time_turns(
+    backend, prompts: list[list[dict]], generate=stream_generate
+) -> dict:
+    """Generate one reply per prompt, timing it like a server turn."""
+    model, tokenizer = backend.model, backend.tokenizer
+    # Warm up so the first timed turn does not pay for graph compilation.
+    warm = backend.encode(prompts[0])
+    for _ in generate(model, tokenizer, warm, max_tokens=8):
+        pass
+    mx.reset_peak_memory()
+
+    turns, ttfts, tps = [], [], []
+    for prompt in prompts:
+        tokens = backend.encode(prompt)
+        start = time.perf_counter()
+        first = None
+        response = None
+        for response in generate(
+            model, tokenizer, tokens, max_tokens=TURN_MAX_TOKENS
+        ):
+            if first is None:
+                first = time.perf_counter()
+        turns.append(time.perf_counter() - start)
+        ttfts.append(first - start)
+        tps.append(response.generation_tps)
+    return {
+        "turns": len(turns),
+        "turn_p50_s": round(statistics.median(turns), 3),
+        "turn_p95_s": round(percentile(turns, 0.95), 3),
+        "ttft_p50_s": round(statistics.median(ttfts), 3),
+        "decode_tps": round(statistics.median(tps), 1),
+        "peak_memory_gb": round(mx.get_peak_memory() / 1e9, 2),
+    }
+
+
+def disk_size_gb(path: Path) -> float:
+    size = sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+    return round(size / 1e9, 2)
+
+
+def run_variant(name: str, examples: list[Example], skipped: int, args) -> dict:
+    if args.backend == "fake":
+        path = None
+        backend = FakeBackend(args.max_tokens)
+        model_hash = digest(["fake", args.max_tokens])
+        generate = backend.fake_model.stream_generate
+    else:
+        path = build(name)
+        backend = MlxBackend(str(path), args.adapter, args.max_tokens)
+        model_hash = digest(["mlx", fingerprint(path), args.max_tokens])
+        generate = stream_generate
+    cache = ResultCache(args.cache)
+    try:
+        scores, throughput = evaluate(
+            examples,
+            backend,
+            cache,
+            model_hash,
+            fingerprint(args.adapter),
+            args.batch_size,
+        )
+    finally:
+        cache.close()
+    quality = summarize(scores, throughput, skipped)
+    latency = time_turns(
+        backend, turn_prompts(examples, args.latency_turns), generate
+    )
+    variant = MODEL_VARIANTS[name]
+    return {
+        "variant": name,
+        "bits": variant.q_bits or 16,
+        "disk_gb": disk_size_gb(path) if path is not None else 0.0,
+        "average_score": quality["average_score"],
+        "model_free_text": quality["model_free_text"],
+        **latency,
+    }
+
+
+def recommend(rows: list[dict], target: float) -> tuple[dict, bool]:
+    """Best-scoring variant within the latency target, else the fastest."""
+    within = [r for r in rows if r["turn_p50_s"] <= target]
+    if within:
+        return max(within, key=lambda r: (r["average_score"], -r["bits"])), True
+    return min(rows, key=lambda r: r["turn_p50_s"]), False
+
+
+def print_table(rows: list[dict], target: float) -> None:
+    header = (
+        f"{'variant':<18} {'bits':>4} {'disk GB':>8} {'score':>6} "
+        f"{'text':>6} {'p50 s':>7} {'p95 s':>7} {'TTFT s':>7} "
+        f"{'tok/s':>6} {'peak GB':>8}"
+    )
+    print("\n" + header)
+    print("-" * len(header))
+    for r in rows:
+        mark = "" if r["turn_p50_s"] <= target else "  (over target)"
+        print(
+            f"{r['variant']:<18} {r['bits']:>4} {r['disk_gb']:>8.2f} "
+            f"{r['average_score']:>6.2f} {r['model_free_text']:>6.1%} "
+            f"{r['turn_p50_s']:>7.2f} {r['turn_p95_s']:>7.2f} "
+            f"{r['ttft_p50_s']:>7.2f} {r['decode_tps']:>6.1f} "
+            f"{r['peak_memory_gb']:>8.2f}{mark}"
+        )
+    best, within = recommend(rows, target)
+    if within:
+        print(
+            f"\nRecommended: {best['variant']} (best score with p50 turn "
+            f"<= {target:g} s). Use INTAKE_BOT_MODEL_PATH={best['variant']}"
+        )
+    else:
+        print(
+            f"\nNo variant meets the {target:g} s target; the fastest is "
+            f"{best['variant']} at {best['turn_p50_s']:.2f} s p50."
+        )
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(
+        description="Build quantized variants and benchmark them"
+    )
+    parser.add_argument(
+        "--variants",
+        nargs="+",
+        choices=sorted(MODEL_VARIANTS),
+        default=DEFAULT_VARIANTS,
+        help="Variants to build and compare (default: 3B bf16/8-bit/4-bit)",
+    )
+    parser.add_argument(
+        "--backend",
+        choices=["mlx", "fake"],
+        default="mlx",
+        help="Inference backend (default: mlx; fake skips conversion)",
+    )
+    parser.add_argument(
+        "--include-7b",
+        action="store_true",
+        help=f"Also compare the {FALLBACK_VARIANT} fallback",
+    )
+    parser.add_argument(
+        "--adapter", default=None, help="LoRA adapter to apply to every variant"
+    )
+    parser.add_argument(
+        "--target",
+        type=float,
+        default=2.0,
+        help="Per-turn latency target in seconds (default: 2.0)",
+    )
+    parser.add_argument(
+        "--test-file",
+        type=Path,
+        default=TEST_PATH,
+        help="Held-out conversations (default: training-data/test.jsonl)",
+    )
+    parser.add_argument(
+        "--limit", type=int, default=None, help="Only evaluate the first N rows"
+    )
+    parser.add_argument(
+        "--latency-turns",
+        type=int,
+        default=20,
+        help="Turns timed per variant (default: 20)",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=8,
+        help="Conversations generated per eval batch (default: 8)",
+    )
+    parser.add_argument(
+        "--max-tokens",
+        type=int,
+        default=512,
+        help="Generation limit per eval summary (default: 512)",
+    )
+    parser.add_argument(
+        "--cache",
+        type=Path,
+        default=CACHE_PATH,
+        help="Eval generation cache (default: logs/eval_cache.sqlite)",
+    )
+    parser.add_argument(
+        "--json", type=Path, help="Also write the comparison rows as JSON"
+    )
+    args = parser.parse_args(argv)
+
+    variants = list(args.variants)
+    if args.include_7b and FALLBACK_VARIANT not in variants:
+        variants.append(FALLBACK_VARIANT)
+    examples, skipped = load_examples(args.test_file, None)
+    examples = examples[: args.limit]
+
+    rows = []
+    for name in variants:
+        rows.append(run_variant(name, examples, len(skipped), args))
+        # Free one model's buffers before loading the next.
+        mx.clear_cache()
+
+    print_table(rows, args.target)
+    if args.json:
+        best, within = recommend(rows, args.target)
+        args.json.write_text(
+            json.dumps(
+                {
+                    "target_s": args.target,
+                    "recommended": best["variant"] if within else None,
+                    "variants": rows,
+                },
+                indent=2,
+            )
+            + "\n"
+        )
+
+
+if __name__ == "__main__":
+    main()
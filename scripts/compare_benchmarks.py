@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""Compare two benchmark result files and flag regressions.
+
+Each argument is either a path to a results JSON written by
+``pytest benchmarks`` or a git revision whose results are stored in
+benchmarks/results/<short-hash>.json. A benchmark regresses when its
+median time grows by more than the threshold. Exits with status 1 if
+any benchmark regressed, so it can gate CI.
+
+Usage:
+    uv run pytest benchmarks                 # writes results/<HEAD>.json
+    uv run python scripts/compare_benchmarks.py main HEAD
+    uv run python scripts/compare_benchmarks.py a.json b.json --threshold 0.05
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+RESULTS_DIR = REPO_ROOT / "benchmarks" / "results"
+
+
+def resolve(ref: str) -> Path:
+    """Map a results path or git revision to a results file."""
+    path = Path(ref)
+    if path.exists():
+        return path
+    try:
+        rev = subprocess.run(
+            ["git", "rev-parse", "--short", ref],
+            cwd=REPO_ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except subprocess.CalledProcessError:
+        sys.exit(f"error: {ref!r} is neither a results file nor a git revision")
+    path = RESULTS_DIR / f"{rev}.json"
+    if not path.exists():
+        sys.exit(
+            f"error: no results for {ref} ({rev}); check it out and run "
+            "`uv run pytest benchmarks` first"
+        )
+    return path
+
+
+def format_time(seconds: float) -> str:
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("µs", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.2f} {unit}"
+    return f"{seconds / 1e-9:.0f} ns"
+
+
+def compare(base: dict, head: dict, threshold: float) -> list[str]:
+    """Print a comparison table and return the regressed benchmark names."""
+    regressions = []
+    names = sorted(set(base["benchmarks"]) | set(head["benchmarks"]))
+    width = max(len(n) for n in names)
+    print(
+        f"{'benchmark':<{width}}  {base['revision']:>12}  "
+        f"{head['revision']:>12}  {'change':>8}"
+    )
+    for name in names:
+        old = base["benchmarks"].get(name)
+        new = head["benchmarks"].get(name)
+        if old is None or new is None:
+            status = "added" if old is None else "removed"
+            print(f"{name:<{width}}  {status}")
+            continue
+        change = new["median_s"] / old["median_s"] - 1
+        flag = ""
+        if change > threshold:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        elif change < -threshold:
+            flag = "  improved"
+        print(
+            f"{name:<{width}}  {format_time(old['median_s']):>12}  "
+            f"{format_time(new['median_s']):>12}  {change:>+7.1%}{flag}"
+        )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare benchmark results between two runs or commits"
+    )
+    parser.add_argument("base", help="Baseline results file or git revision")
+    parser.add_argument(
+        "head",
+        nargs="?",
+        default="HEAD",
+        help="Results file or git revision to check (default: HEAD)",
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.10,
+        help="Allowed median slowdown as a fraction (default: 0.10)",
+    )
+    args = parser.parse_args()
+
+    base = json.loads(resolve(args.base).read_text())
+    head = json.loads(resolve(args.head).read_text())
+    if base.get("machine") != head.get("machine"):
+        print(
+            "warning: results come from different machines "
+            f"({base.get('machine')} vs {head.get('machine')})"
+        )
+
+    regressions = compare(base, head, args.threshold)
+    if regressions:
+        print(
+            f"\n{len(regressions)} benchmark(s) regressed by more than "
+            f"{args.threshold:.0%}: {', '.join(regressions)}"
+        )
+        sys.exit(1)
+    print(f"\nNo regressions beyond {args.threshold:.0%}.")
+
+
+if __name__ == "__main__":
+    main()
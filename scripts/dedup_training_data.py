@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+"""Drop or flag near-duplicate conversations in the training JSONL.
+
+The template-driven builders draw from small phrase lists, so many
+generated conversations are near-identical. This stage computes a
+MinHash signature over the word 3-grams of each conversation's user
+and assistant turns and finds near-duplicates with LSH banding, then
+verifies each candidate by its estimated Jaccard similarity.
+
+Splits are processed in priority order test -> valid -> train and a
+conversation is a duplicate if it matches anything already kept in the
+same or a higher-priority split. Test rows are therefore never
+removed in favour of train rows.
+
+LSH only compares the pairs its bands propose, so detection is
+probabilistic: within a split, a pair right at the threshold is missed
+with the probability ``NearDuplicateIndex.miss_probability`` gives
+(high at the default 0.8, falling fast above it). Leakage between
+splits is checked more strictly. Kept test and valid rows go into a
+second index banded for ``--candidate-threshold`` (0.5 by default),
+and its candidates from another split whose signatures come close
+to the threshold are compared by exact Jaccard similarity of their
+shingle sets. With 128 permutations, a cross-split pair at Jaccard 0.8
+escapes that check with probability below 1e-6.
+
+Rows are streamed one at a time; memory is linear in the number of
+kept conversations (one signature each, plus the shingles of kept test
+and valid rows), so 100k+ rows are fine. The leakage check costs more
+per row the more test and valid rows resemble it. Plain
+``<split>.jsonl`` and sharded ``<split>-NNNNN.jsonl`` layouts are both
+read, and the output mirrors the input file names.
+
+Usage:
+    uv run python scripts/dedup_training_data.py
+    uv run python scripts/dedup_training_data.py --threshold 0.9
+    uv run python scripts/dedup_training_data.py --mode flag \\
+        --output-dir training-data/flagged
+"""
+
+import argparse
+import json
+import os
+import time
+import zlib
+from collections.abc import Iterator
+from pathlib import Path
+
+import numpy as np
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+DATA_DIR = REPO_ROOT / "training-data"
+
+# Highest priority first: earlier splits win when rows collide.
+SPLIT_PRIORITY = ("test", "valid", "train")
+SHINGLE_SIZE = 3
+# Standard errors below the threshold a MinHash estimate may fall and
+# still get an exact check in the cross-split leakage pass.
+ESTIMATE_MARGIN = 4
+
+_word_hashes: dict[str, int] = {}
+
+
+def split_files(data_dir: Path, split: str) -> list[Path]:
+    """Input files for ``split``, in plain or sharded layout."""
+    plain = data_dir / f"{split}.jsonl"
+    if plain.exists():
+        return [plain]
+    return sorted(data_dir.glob(f"{split}-[0-9]*.jsonl"))
+
+
+def conversation_text(row: dict) -> str:
+    return "\n".join(
+        m["content"] for m in row["messages"] if m["role"] != "system"
+    )
+
+
+def shingles(text: str) -> np.ndarray:
+    """Hash the word 3-grams of ``text`` to 32-bit integers."""
+    words = text.lower().split()
+    hashes = np.fromiter(
+        (
+            _word_hashes.get(w)
+            or _word_hashes.setdefault(w, zlib.crc32(w.encode()))
+            for w in words
+        ),
+        dtype=np.uint64,
+        count=len(words),
+    )
+    if len(hashes) < SHINGLE_SIZE:
+        return np.unique(hashes)
+    combined = hashes[: len(hashes) - SHINGLE_SIZE + 1].copy()
+    for i in range(1, SHINGLE_SIZE):
+        combined = (
+            combined * np.uint64(0x9E3779B1)
+            + hashes[i : len(hashes) - SHINGLE_SIZE + 1 + i]
+        )
+    return np.unique(combined & np.uint64(0xFFFFFFFF))
+
+
+class MinHasher:
+    """MinHash with multiply-shift hashing in uint64 arithmetic."""
+
+    def __init__(self, num_perm: int, seed: int = 1):
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, 2**63, size=(num_perm, 1), dtype=np.uint64)
+        self.a |= np.uint64(1)
+        self.b = rng.integers(0, 2**63, size=(num_perm, 1), dtype=np.uint64)
+
+    def signature(self, values: np.ndarray) -> np.ndarray:
+        if len(values) == 0:
+            return np.full(len(self.a), 0xFFFFFFFF, dtype=np.uint32)
+        hashed = (self.a * values[np.newaxis, :] + self.b) >> np.uint64(32)
+        return hashed.min(axis=1).astype(np.uint32)
+
+
+def choose_bands(threshold: float, num_perm: int) -> tuple[int, int]:
+    """Pick (bands, rows) whose LSH S-curve midpoint is near threshold."""
+    best = None
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        midpoint = (1 / bands) ** (1 / rows)
+        if best is None or abs(midpoint - threshold) < best[0]:
+            best = (abs(midpoint - threshold), bands, rows)
+    return best[1], best[2]
+
+
+class NearDuplicateIndex:
+    """LSH index over MinHash signatures of kept conversations."""
+
+    def __init__(self, threshold: float, num_perm: int):
+        self.threshold = threshold
+        self.bands, self.rows = choose_bands(threshold, num_perm)
+        self.buckets: list[dict[bytes, list[int]]] = [
+            {} for _ in range(self.bands)
+        ]
+        self.signatures: list[np.ndarray] = []
+        self.keys: list[tuple[str, int]] = []
+
+    def _band_keys(self, signature: np.ndarray) -> Iterator[bytes]:
+        for band in range(self.bands):
+            start = band * self.rows
+            yield signature[start : start + self.rows].tobytes()
+
+    def miss_probability(self, similarity: float) -> float:
+        """Chance that a pair at ``similarity`` shares no band."""
+        return (1 - similarity**self.rows) ** self.bands
+
+    def candidates(self, signature: np.ndarray) -> set[int]:
+        found = set()
+        for band, key in enumerate(self._band_keys(signature)):
+            found.update(self.buckets[band].get(key, ()))
+        return found
+
+    def query(self, signature: np.ndarray) -> tuple[tuple[str, int], float]:
+        """Return the best kept match at or above threshold, if any."""
+        best, best_score = None, 0.0
+        for i in self.candidates(signature):
+            score = float(np.mean(self.signatures[i] == signature))
+            if score >= self.threshold and score > best_score:
+                best, best_score = self.keys[i], score
+        return best, best_score
+
+    def add(self, signature: np.ndarray, key: tuple[str, int]) -> None:
+        i = len(self.signatures)
+        self.signatures.append(signature)
+        self.keys.append(key)
+        for band, band_key in enumerate(self._band_keys(signature)):
+            self.buckets[band].setdefault(band_key, []).append(i)
+
+
+def jaccard(a: np.ndarray, b: np.ndarray) -> float:
+    """Exact Jaccard similarity of two sorted, unique shingle arrays."""
+    common = len(np.intersect1d(a, b, assume_unique=True))
+    union = len(a) + len(b) - common
+    return common / union if union else 1.0
+
+
+class CrossSplitIndex(NearDuplicateIndex):
+    """Kept rows of the higher-priority splits, checked exactly.
+
+    Banded for a lower ``candidate_threshold`` so few similar pairs
+    escape it. Candidates whose signature estimate is within
+    ``ESTIMATE_MARGIN`` standard errors of the threshold are confirmed
+    by exact Jaccard similarity, most similar first.
+    """
+
+    def __init__(
+        self, threshold: float, candidate_threshold: float, num_perm: int
+    ):
+        super().__init__(candidate_threshold, num_perm)
+        self.match_threshold = threshold
+        # The estimate's standard error is at most 0.5 / sqrt(num_perm).
+        self.estimate_floor = threshold - ESTIMATE_MARGIN * 0.5 / num_perm**0.5
+        self.shingles: list[np.ndarray] = []
+        self._matrix = np.empty((1024, num_perm), dtype=np.uint32)
+        self._splits = np.empty(1024, dtype=np.int8)
+
+    def add_row(
+        self, signature: np.ndarray, values: np.ndarray, key: tuple[str, int]
+    ) -> None:
+        i = len(self.signatures)
+        if i == len(self._matrix):
+            self._matrix = np.concatenate([self._matrix, self._matrix])
+            self._splits = np.concatenate([self._splits, self._splits])
+        self._matrix[i] = signature
+        self._splits[i] = SPLIT_PRIORITY.index(key[0])
+        self.add(signature, key)
+        self.shingles.append(values)
+
+    def leak(
+        self, signature: np.ndarray, values: np.ndarray, split: str
+    ) -> tuple[tuple[str, int] | None, float]:
+        """Return an exact match from another split, if any."""
+        ids = np.fromiter(self.candidates(signature), dtype=np.int64)
+        ids = ids[self._splits[ids] != SPLIT_PRIORITY.index(split)]
+        if not len(ids):
+            return None, 0.0
+        estimates = np.mean(self._matrix[ids] == signature, axis=1)
+        for j in np.argsort(-estimates):
+            if estimates[j] < self.estimate_floor:
+                break
+            score = jaccard(values, self.shingles[ids[j]])
+            if score >= self.match_threshold:
+                return self.keys[ids[j]], score
+        return None, 0.0
+
+
+def dedup(
+    data_dir: Path,
+    output_dir: Path,
+    threshold: float,
+    num_perm: int,
+    mode: str,
+    candidate_threshold: float = 0.5,
+) -> dict[str, dict[str, int]]:
+    """Stream every split through the index and write the survivors."""
+    hasher = MinHasher(num_perm)
+    index = NearDuplicateIndex(threshold, num_perm)
+    guard = CrossSplitIndex(threshold, candidate_threshold, num_perm)
+    stats = {}
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    for split in SPLIT_PRIORITY:
+        counts = {"read": 0, "kept": 0, "duplicates": 0, "cross_split": 0}
+        for path in split_files(data_dir, split):
+            out_path = output_dir / path.name
+            tmp_path = out_path.with_suffix(".jsonl.tmp")
+            with open(path) as src, open(tmp_path, "w") as dst:
+                for line in src:
+                    if not line.strip():
+                        continue
+                    row_id = counts["read"]
+                    counts["read"] += 1
+                    row = json.loads(line)
+                    values = shingles(conversation_text(row))
+                    signature = hasher.signature(values)
+                    match, score = guard.leak(signature, values, split)
+                    if match is None:
+                        match, score = index.query(signature)
+                    if match is None:
+                        index.add(signature, (split, row_id))
+                        if split != SPLIT_PRIORITY[-1]:
+                            guard.add_row(signature, values, (split, row_id))
+                        counts["kept"] += 1
+                        dst.write(line if line.endswith("\n") else line + "\n")
+                        continue
+                    counts["duplicates"] += 1
+                    if match[0] != split:
+                        counts["cross_split"] += 1
+                    if mode == "flag":
+                        row["near_duplicate_of"] = {
+                            "split": match[0],
+                            "row": match[1],
+                            "jaccard": round(score, 3),
+                        }
+                        dst.write(json.dumps(row) + "\n")
+            # Rename last so the input may safely be the output directory.
+            os.replace(tmp_path, out_path)
+        stats[split] = counts
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Remove near-duplicate conversations from training data"
+    )
+    parser.add_argument(
+        "--data-dir",
+        type=Path,
+        default=DATA_DIR,
+        help="Directory holding the split JSONL files (default: "
+        "training-data/)",
+    )
+    parser.add_argument(
+        "--output-dir",
+        type=Path,
+        default=None,
+        help="Where to write the result (default: <data-dir>/dedup); may "
+        "equal --data-dir to rewrite in place",
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.8,
+        help="Jaccard similarity at or above which rows are duplicates "
+        "(default: 0.8)",
+    )
+    parser.add_argument(
+        "--candidate-threshold",
+        type=float,
+        default=0.5,
+        help="LSH threshold for the exact cross-split leakage check "
+        "(default: 0.5)",
+    )
+    parser.add_argument(
+        "--num-perm",
+        type=int,
+        default=128,
+        help="MinHash permutations per signature (default: 128)",
+    )
+    parser.add_argument(
+        "--mode",
+        choices=["drop", "flag"],
+        default="drop",
+        help="Drop duplicates, or keep them with a near_duplicate_of field "
+        "(default: drop)",
+    )
+    args = parser.parse_args()
+    output_dir = args.output_dir or args.data_dir / "dedup"
+
+    start = time.perf_counter()
+    stats = dedup(
+        args.data_dir,
+        output_dir,
+        args.threshold,
+        args.num_perm,
+        args.mode,
+        args.candidate_threshold,
+    )
+    elapsed = time.perf_counter() - start
+
+    total = sum(s["read"] for s in stats.values())
+    index = NearDuplicateIndex(args.threshold, args.num_perm)
+    print(
+        f"Within a split, a pair at Jaccard {args.threshold:g} is missed "
+        f"with probability {index.miss_probability(args.threshold):.2f}"
+    )
+    for split, s in stats.items():
+        print(
+            f"{split:>5}: {s['read']} read, {s['kept']} kept, "
+            f"{s['duplicates']} near-duplicates "
+            f"({s['cross_split']} matched a higher-priority split)"
+        )
+    print(
+        f"Processed {total} conversations in {elapsed:.1f}s "
+        f"({total / max(elapsed, 1e-9):,.0f} rows/s); output in {output_dir}"
+    )
+
+
+if __name__ == "__main__":
+    main()
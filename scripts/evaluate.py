@@ -0,0 +1,521 @@
+#!/usr/bin/env python3
+"""Evaluate the intake model on the held-out test set.
+
+Replays each conversation in training-data/test.jsonl up to its final
+turn and runs the closing path /chat serves: the model is asked for
+the two free-text fields only (``SLOT_INSTRUCTION``). Those fields are
+all the model contributes to the summary, so they are what is graded,
+against the same fields of the reference summary in the final turn.
+Each conversation scores 0-3:
+
+    1 point  the model wrote both fields as a JSON object
+    1 point  issue_description overlaps the reference (token F1 >= 0.4)
+    1 point  professor_prep_note overlaps the reference (token F1 >= 0.4)
+
+The Phase 4 target is an average of at least 2.5. The rest of the
+summary comes from the rule-based dialogue tracker, which is the same
+for every model and adapter; its accuracy is reported separately:
+``build_summary`` is run on the state tracked over the transcript and
+the model's fields, and course, issue_category, issue_subcategory and
+student_self_assessment are compared with the reference. Rows whose
+final turn has no parseable reference summary are skipped and counted.
+
+Generations are cached in SQLite keyed by (model hash, adapter hash,
+prompt hash, conversation hash), so a re-run after changing a few test
+rows, the adapter, or the system prompt only generates what changed.
+Model and adapter hashes fingerprint the files on disk (names, sizes,
+modification times) rather than reading the weights.
+
+Usage:
+    uv run python scripts/evaluate.py --adapter adapters/intake-bot-v1
+    uv run python scripts/evaluate.py --backend fake --limit 20
+    uv run python scripts/evaluate.py --batch-size 16 --json eval.json
+"""
+
+import argparse
+import hashlib
+import json
+import re
+import sqlite3
+import sys
+import time
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+from pydantic import ValidationError  # noqa: E402
+
+from app.config import settings  # noqa: E402
+from app.dialogue import (  # noqa: E402
+    SLOT_INSTRUCTION,
+    DialogueState,
+    build_summary,
+    parse_free_text,
+)
+from app.extraction import extract_summary, repair_json  # noqa: E402
+
+TEST_PATH = REPO_ROOT / "training-data" / "test.jsonl"
+CACHE_PATH = REPO_ROOT / "logs" / "eval_cache.sqlite"
+FIELDS = (
+    "course",
+    "issue_category",
+    "issue_subcategory",
+    "student_self_assessment",
+)
+FREE_TEXT_FIELDS = ("issue_description", "professor_prep_note")
+TARGET_SCORE = 2.5
+# Token F1 at which a free-text field counts as matching the reference.
+MATCH_F1 = 0.4
+
+
+@dataclass
+class Example:
+    index: int
+    prompt: list[dict]
+    reference: dict
+    prompt_hash: str
+    conversation_hash: str
+
+
+def digest(value) -> str:
+    data = value if isinstance(value, bytes) else json.dumps(value).encode()
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def fingerprint(path: str | Path | None) -> str:
+    """Cheap identity for a model or adapter directory."""
+    if path is None:
+        return "none"
+    path = Path(path)
+    if not path.exists():
+        return digest(str(path))  # e.g. a Hugging Face repo id
+    files = [path] if path.is_file() else sorted(path.rglob("*"))
+    entries = [
+        (str(f.relative_to(path.parent)), f.stat().st_size, f.stat().st_mtime)
+        for f in files
+        if f.is_file()
+    ]
+    return digest(entries)
+
+
+def reference_summary(content: str) -> dict | None:
+    """The summary JSON in a reference closing turn, if it has one."""
+    raw = extract_summary(content).raw
+    if raw is None:
+        return None
+    try:
+        reference = json.loads(repair_json(raw))
+    except json.JSONDecodeError:
+        return None
+    return reference if isinstance(reference, dict) else None
+
+
+def load_examples(
+    path: Path, system_prompt: str | None
+) -> tuple[list[Example], list[int]]:
+    """Split each test row into prompt (all but the summary) + reference.
+
+    The prompt ends with the closing instruction, as on the served
+    closing turn. Returns the examples and the indexes of rows skipped
+    for lacking a reference summary.
+    """
+    examples, skipped = [], []
+    with open(path) as f:
+        for index, line in enumerate(f):
+            if not line.strip():
+                continue
+            messages = json.loads(line)["messages"]
+            prompt, final = messages[:-1], messages[-1]
+            reference = reference_summary(final["content"])
+            if reference is None:
+                skipped.append(index)
+                continue
+            if system_prompt is not None and prompt[0]["role"] == "system":
+                prompt = [{"role": "system", "content": system_prompt}]
+                prompt += messages[1:-1]
+            system = (
+                prompt[0]["content"] if prompt[0]["role"] == "system" else ""
+            )
+            examples.append(
+                Example(
+                    index=index,
+                    prompt=[
+                        *prompt,
+                        {"role": "system", "content": SLOT_INSTRUCTION},
+                    ],
+                    reference=reference,
+                    prompt_hash=digest([system, SLOT_INSTRUCTION]),
+                    conversation_hash=digest(
+                        [m for m in prompt if m["role"] != "system"]
+                    ),
+                )
+            )
+    return examples, skipped
+
+
+def model_fields(text: str) -> dict[str, str]:
+    """The free-text fields the model wrote, empty where it wrote none.
+
+    Unlike ``parse_free_text`` this does not fall back to the student's
+    words, so a model that ignores the instruction scores nothing.
+    """
+    match = re.search(r"\{.*\}?", text, re.DOTALL)
+    fields = {}
+    if match is not None:
+        try:
+            fields = json.loads(repair_json(match.group(0)))
+        except json.JSONDecodeError:
+            fields = {}
+    if not isinstance(fields, dict):
+        fields = {}
+    return {key: str(fields.get(key) or "").strip() for key in FREE_TEXT_FIELDS}
+
+
+def token_f1(text: str, reference: str) -> float:
+    """Bag-of-words F1 between ``text`` and ``reference``."""
+    words = re.findall(r"\w+", text.lower())
+    ref_words = re.findall(r"\w+", reference.lower())
+    if not words or not ref_words:
+        return 0.0
+    common = sum((Counter(words) & Counter(ref_words)).values())
+    if common == 0:
+        return 0.0
+    precision, recall = common / len(words), common / len(ref_words)
+    return 2 * precision * recall / (precision + recall)
+
+
+def close_intake(example: Example, text: str):
+    """Build the summary from ``text`` as the served closing turn does."""
+    state = DialogueState.from_messages(
+        [m for m in example.prompt if m["role"] != "system"]
+    )
+    description, prep_note = parse_free_text(text, state)
+    reference = example.reference
+    try:
+        appointment = datetime.fromisoformat(
+            str(reference.get("appointment_datetime"))
+        )
+    except ValueError:
+        appointment = datetime.now(tz=timezone.utc)
+    try:
+        return build_summary(
+            state,
+            session_id=str(reference.get("session_id") or "eval"),
+            booking_ref=str(reference.get("booking_ref") or "unknown"),
+            appointment_datetime=appointment,
+            issue_description=description,
+            professor_prep_note=prep_note,
+        )
+    except ValidationError:
+        # The tracked state is missing a required slot.
+        return None
+
+
+def score(example: Example, text: str) -> dict:
+    """Grade the model's free text; check the tracker's fields aside."""
+    reference = example.reference
+    fields = model_fields(text)
+    result = {"free_text": all(fields.values())}
+    for key in FREE_TEXT_FIELDS:
+        result[f"{key}_f1"] = round(
+            token_f1(fields[key], str(reference.get(key) or "")), 3
+        )
+    result["score"] = int(result["free_text"]) + sum(
+        result[f"{key}_f1"] >= MATCH_F1 for key in FREE_TEXT_FIELDS
+    )
+
+    summary = close_intake(example, text)
+    tracker = {"valid": summary is not None}
+    for field in FIELDS:
+        value = getattr(summary, field, None)
+        value = getattr(value, "value", value)
+        tracker[field] = summary is not None and value == reference.get(field)
+    result["tracker"] = tracker
+    return result
+
+
+class ResultCache:
+    """SQLite store of raw generations keyed by the four input hashes."""
+
+    def __init__(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(path)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS generations ("
+            "key TEXT PRIMARY KEY, output TEXT, tokens INTEGER)"
+        )
+
+    def get(self, keys: list[str]) -> dict[str, tuple[str, int]]:
+        found = {}
+        for start in range(0, len(keys), 500):
+            chunk = keys[start : start + 500]
+            marks = ",".join("?" * len(chunk))
+            rows = self.db.execute(
+                "SELECT key, output, tokens FROM generations "
+                f"WHERE key IN ({marks})",
+                chunk,
+            )
+            found.update((k, (o, t)) for k, o, t in rows)
+        return found
+
+    def put(self, items: list[tuple[str, str, int]]) -> None:
+        with self.db:
+            self.db.executemany(
+                "INSERT OR REPLACE INTO generations VALUES (?, ?, ?)", items
+            )
+
+    def close(self) -> None:
+        self.db.close()
+
+
+class MlxBackend:
+    def __init__(self, model_path: str, adapter_path: str | None, max_tokens):
+        from mlx_lm import load
+
+        self.model, self.tokenizer = load(model_path, adapter_path=adapter_path)
+        self.max_tokens = max_tokens
+
+    def encode(self, prompt: list[dict]) -> list[int]:
+        return self.tokenizer.apply_chat_template(
+            prompt, add_generation_prompt=True
+        )
+
+    def generate(self, prompts: list[list[dict]]) -> list[tuple[str, int]]:
+        from mlx_lm import batch_generate
+
+        response = batch_generate(
+            self.model,
+            self.tokenizer,
+            [self.encode(p) for p in prompts],
+            max_tokens=self.max_tokens,
+            return_token_ids=True,
+        )
+        return [
+            (text, len(ids))
+            for text, ids in zip(response.texts, response.token_ids)
+        ]
+
+
+class FakeBackend:
+    def __init__(self, max_tokens: int):
+        import app.fake_model as fake_model
+
+        self.fake_model = fake_model
+        self.model, self.tokenizer = fake_model.load()
+        self.max_tokens = max_tokens
+
+    def encode(self, prompt: list[dict]) -> list[int]:
+        return self.tokenizer.encode(
+            self.tokenizer.apply_chat_template(prompt, tokenize=False)
+        )
+
+    def generate(self, prompts: list[list[dict]]) -> list[tuple[str, int]]:
+        results = []
+        for prompt in prompts:
+            chunks = list(
+                self.fake_model.stream_generate(
+                    self.model,
+                    self.tokenizer,
+                    self.encode(prompt),
+                    max_tokens=self.max_tokens,
+                )
+            )
+            results.append(("".join(c.text for c in chunks), len(chunks)))
+        return results
+
+
+def evaluate(
+    examples: list[Example],
+    backend,
+    cache: ResultCache,
+    model_hash: str,
+    adapter_hash: str,
+    batch_size: int,
+) -> tuple[list[dict], dict]:
+    """Score every example, generating only cache misses in batches."""
+    keys = [
+        digest([model_hash, adapter_hash, e.prompt_hash, e.conversation_hash])
+        for e in examples
+    ]
+    outputs = cache.get(keys)
+    misses = [i for i, key in enumerate(keys) if key not in outputs]
+    print(f"{len(examples) - len(misses)} cached, {len(misses)} to generate")
+
+    generated_tokens = 0
+    start = time.perf_counter()
+    for b in range(0, len(misses), batch_size):
+        batch = misses[b : b + batch_size]
+        results = backend.generate([examples[i].prompt for i in batch])
+        items = []
+        for i, (text, n_tokens) in zip(batch, results):
+            outputs[keys[i]] = (text, n_tokens)
+            items.append((keys[i], text, n_tokens))
+            generated_tokens += n_tokens
+        cache.put(items)
+        print(f"  generated {min(b + batch_size, len(misses))}/{len(misses)}")
+    elapsed = time.perf_counter() - start
+
+    scores = [
+        {"index": e.index, **score(e, outputs[key][0])}
+        for e, key in zip(examples, keys)
+    ]
+    throughput = {
+        "generated": len(misses),
+        "cached": len(examples) - len(misses),
+        "elapsed_s": round(elapsed, 3),
+        "conversations_per_s": round(len(misses) / elapsed, 3)
+        if misses
+        else None,
+        "tokens_per_s": round(generated_tokens / elapsed, 1)
+        if misses
+        else None,
+    }
+    return scores, throughput
+
+
+def summarize(scores: list[dict], throughput: dict, skipped: int) -> dict:
+    n = len(scores)
+    return {
+        "conversations": n,
+        "skipped": skipped,
+        "average_score": round(sum(s["score"] for s in scores) / n, 3),
+        "target": TARGET_SCORE,
+        "model_free_text": round(sum(s["free_text"] for s in scores) / n, 3),
+        "free_text_f1": {
+            key: round(sum(s[f"{key}_f1"] for s in scores) / n, 3)
+            for key in FREE_TEXT_FIELDS
+        },
+        "tracker": {
+            "valid_summary": round(
+                sum(s["tracker"]["valid"] for s in scores) / n, 3
+            ),
+            "field_accuracy": {
+                field: round(sum(s["tracker"][field] for s in scores) / n, 3)
+                for field in FIELDS
+            },
+        },
+        "throughput": throughput,
+    }
+
+
+def print_report(report: dict) -> None:
+    avg = report["average_score"]
+    status = "PASS" if avg >= report["target"] else "below target"
+    print(
+        f"\nAverage score: {avg:.2f}/3 over {report['conversations']} "
+        f"conversations ({status}, target {report['target']})"
+    )
+    if report["skipped"]:
+        print(f"  skipped {report['skipped']} rows without a reference summary")
+    print(
+        f"  {'model_free_text':<24} {report['model_free_text']:.1%} "
+        "(both free-text fields written by the model)"
+    )
+    for key, f1 in report["free_text_f1"].items():
+        print(f"  {key + ' F1':<24} {f1:.3f}")
+    tracker = report["tracker"]
+    print("Dialogue tracker (same for every model):")
+    print(f"  {'valid_summary':<24} {tracker['valid_summary']:.1%}")
+    for field, accuracy in tracker["field_accuracy"].items():
+        print(f"  {field:<24} {accuracy:.1%}")
+    t = report["throughput"]
+    line = f"Generated {t['generated']} ({t['cached']} cached)"
+    if t["generated"]:
+        line += (
+            f" in {t['elapsed_s']:.1f}s: {t['conversations_per_s']:.2f} "
+            f"conversations/s, {t['tokens_per_s']:.1f} tokens/s"
+        )
+    print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Score the intake model's summaries on the test set"
+    )
+    parser.add_argument(
+        "--test-file",
+        type=Path,
+        default=TEST_PATH,
+        help="Held-out conversations (default: training-data/test.jsonl)",
+    )
+    parser.add_argument(
+        "--backend",
+        choices=["mlx", "fake"],
+        default="mlx",
+        help="Inference backend (default: mlx)",
+    )
+    parser.add_argument(
+        "--model",
+        default=str(settings.model_path),
+        help="Model path or HF id (default: the configured model_path)",
+    )
+    parser.add_argument(
+        "--adapter", default=None, help="LoRA adapter directory to apply"
+    )
+    parser.add_argument(
+        "--system-prompt",
+        type=Path,
+        default=None,
+        help="Replace each row's system message with this file's text",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=8,
+        help="Conversations generated per batch (default: 8)",
+    )
+    parser.add_argument(
+        "--max-tokens",
+        type=int,
+        default=512,
+        help="Generation limit per closing turn (default: 512)",
+    )
+    parser.add_argument(
+        "--limit", type=int, default=None, help="Only use the first N rows"
+    )
+    parser.add_argument(
+        "--cache",
+        type=Path,
+        default=CACHE_PATH,
+        help="Generation cache (default: logs/eval_cache.sqlite)",
+    )
+    parser.add_argument(
+        "--json", type=Path, help="Also write the report and scores as JSON"
+    )
+    args = parser.parse_args()
+
+    system_prompt = (
+        args.system_prompt.read_text() if args.system_prompt else None
+    )
+    examples, skipped = load_examples(args.test_file, system_prompt)
+    examples = examples[: args.limit]
+    if args.backend == "fake":
+        backend = FakeBackend(args.max_tokens)
+        model_hash = digest(["fake", args.max_tokens])
+    else:
+        backend = MlxBackend(args.model, args.adapter, args.max_tokens)
+        model_hash = digest(["mlx", fingerprint(args.model), args.max_tokens])
+    adapter_hash = fingerprint(args.adapter)
+
+    cache = ResultCache(args.cache)
+    try:
+        scores, throughput = evaluate(
+            examples, backend, cache, model_hash, adapter_hash, args.batch_size
+        )
+    finally:
+        cache.close()
+
+    report = summarize(scores, throughput, len(skipped))
+    print_report(report)
+    if args.json:
+        args.json.write_text(
+            json.dumps({**report, "scores": scores}, indent=2) + "\n"
+        )
+
+
+if __name__ == "__main__":
+    main()
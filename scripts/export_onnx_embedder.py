@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""Export the RAG embedding model to int8 ONNX for query embedding.
+
+Writes the quantized all-MiniLM-L6-v2 export that the server uses with
+INTAKE_BOT_QUERY_EMBED_BACKEND=onnx, then checks it against the
+PyTorch model on a few intake-style queries. Needs the ``onnx``
+package, which the server itself does not.
+
+Usage:
+    uv run --with onnx python scripts/export_onnx_embedder.py
+    uv run --with onnx python scripts/export_onnx_embedder.py --out /tmp/e
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+import numpy as np
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+from app.config import settings  # noqa: E402
+from app.onnx_embedding import OnnxQueryEmbedding, export  # noqa: E402
+from app.rag import EMBED_MODEL, get_embed_model  # noqa: E402
+
+QUERIES = [
+    "I keep mixing up ser and estar when I describe places",
+    "When do I use the preterite instead of the imperfect?",
+    "Can you help me outline my composition for Escritura I?",
+    "I'm stressed about the midterm exam next week",
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Export the embedding model to int8 ONNX"
+    )
+    parser.add_argument(
+        "--out",
+        type=Path,
+        default=settings.onnx_embed_path,
+        help=f"Output directory (default: {settings.onnx_embed_path})",
+    )
+    args = parser.parse_args()
+
+    source = EMBED_MODEL.removeprefix("local:")
+    path = export(source, args.out)
+    print(f"Wrote {path} ({path.stat().st_size / 1e6:.1f} MB)")
+
+    onnx_model = OnnxQueryEmbedding(args.out)
+    torch_model = get_embed_model()
+    for query in QUERIES:
+        similarity = float(
+            np.dot(
+                onnx_model.get_query_embedding(query),
+                torch_model.get_query_embedding(query),
+            )
+        )
+        print(f"cosine {similarity:.4f}  {query}")
+
+
+if __name__ == "__main__":
+    main()
@@ -9,17 +9,32 @@ Each JSONL line contains a "messages" list of
 {"role": "system"|"user"|"assistant", "content": "..."} dicts,
 ending with the assistant producing a JSON IntakeSummary.
 
+Conversations are generated independently from a per-persona seed and
+assigned to a split by hashing, so rows can be produced by a process
+pool and streamed straight to disk: memory stays flat and the output
+is byte-identical for any --workers value.
+
 Usage:
     uv run python scripts/generate_training_data.py
     uv run python scripts/generate_training_data.py --variations 3
+    uv run python scripts/generate_training_data.py --workers 8
+
+    # 20k conversations: 5,000 personas from the constrained persona
+    # space (9,190 personas in all), 4 variations each
+    uv run python scripts/generate_training_data.py --expand 5000 \\
+        --variations 4 --workers 8 --shard-size 5000
 """
 
 import argparse
+import hashlib
+import itertools
 import json
+import multiprocessing
 import random
-import uuid
+from collections.abc import Iterable, Iterator
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
+from typing import TextIO
 
 REPO_ROOT = Path(__file__).resolve().parent.parent
 PERSONA_PATH = REPO_ROOT / "training-data" / "persona_matrix.json"
@@ -240,17 +255,23 @@ def load_system_prompt() -> str:
     return raw
 
 
-def random_appointment() -> tuple[str, datetime]:
+def random_appointment(
+    rng: random.Random, now: datetime
+) -> tuple[str, datetime]:
     """Generate a random future appointment datetime and name."""
-    name = random.choice(FIRST_NAMES)
-    base = datetime.now(tz=timezone.utc) + timedelta(days=random.randint(1, 14))
-    hour = random.choice([9, 10, 11, 13, 14, 15, 16])
+    name = rng.choice(FIRST_NAMES)
+    base = now + timedelta(days=rng.randint(1, 14))
+    hour = rng.choice([9, 10, 11, 13, 14, 15, 16])
     apt = base.replace(hour=hour, minute=0, second=0, microsecond=0)
     return name, apt
 
 
 def build_spa212_conversation(
-    persona: dict, name: str, apt: datetime
+    persona: dict,
+    name: str,
+    apt: datetime,
+    rng: random.Random,
+    now: datetime,
 ) -> list[dict]:
     """Build a multi-turn conversation for a SPA 212-T persona."""
     messages = []
@@ -264,7 +285,7 @@ def build_spa212_conversation(
     messages.append(
         {
             "role": "assistant",
-            "content": random.choice(GREETING_TEMPLATES).format(
+            "content": rng.choice(GREETING_TEMPLATES).format(
                 name=name, date=date_str
             ),
         }
@@ -272,7 +293,7 @@ def build_spa212_conversation(
     messages.append(
         {
             "role": "user",
-            "content": random.choice(COURSE_CHOICE["SPA 212-T"]),
+            "content": rng.choice(COURSE_CHOICE["SPA 212-T"]),
         }
     )
 
@@ -287,7 +308,7 @@ def build_spa212_conversation(
     messages.append(
         {
             "role": "user",
-            "content": random.choice(cat_responses),
+            "content": rng.choice(cat_responses),
         }
     )
 
@@ -308,7 +329,7 @@ def build_spa212_conversation(
         messages.append(
             {
                 "role": "user",
-                "content": random.choice(GRAMMAR_DRILLDOWN[subcat]),
+                "content": rng.choice(GRAMMAR_DRILLDOWN[subcat]),
             }
         )
     elif cat == "exam_prep" and artifact:
@@ -393,7 +414,7 @@ def build_spa212_conversation(
         messages.append(
             {
                 "role": "user",
-                "content": random.choice(CONFIDENCE_OPTIONS[sa]),
+                "content": rng.choice(CONFIDENCE_OPTIONS[sa]),
             }
         )
 
@@ -421,7 +442,7 @@ def build_spa212_conversation(
     messages.append(
         {
             "role": "user",
-            "content": random.choice(CONFIRM_RESPONSES),
+            "content": rng.choice(CONFIRM_RESPONSES),
         }
     )
 
@@ -432,7 +453,9 @@ def build_spa212_conversation(
         f"See you on {date_str}!"
     )
 
-    summary = build_summary_json(persona, name, apt, len(messages) // 2)
+    summary = build_summary_json(
+        persona, name, apt, len(messages) // 2, rng, now
+    )
     closing += "\n\n" + json.dumps(summary, indent=2)
     messages.append({"role": "assistant", "content": closing})
 
@@ -440,7 +463,11 @@ def build_spa212_conversation(
 
 
 def build_non_course_conversation(
-    persona: dict, name: str, apt: datetime
+    persona: dict,
+    name: str,
+    apt: datetime,
+    rng: random.Random,
+    now: datetime,
 ) -> list[dict]:
     """Build a short non-course conversation."""
     messages = []
@@ -450,7 +477,7 @@ def build_non_course_conversation(
     messages.append(
         {
             "role": "assistant",
-            "content": random.choice(GREETING_TEMPLATES).format(
+            "content": rng.choice(GREETING_TEMPLATES).format(
                 name=name, date=date_str
             ),
         }
@@ -458,7 +485,7 @@ def build_non_course_conversation(
     messages.append(
         {
             "role": "user",
-            "content": random.choice(COURSE_CHOICE["non_course"]),
+            "content": rng.choice(COURSE_CHOICE["non_course"]),
         }
     )
 
@@ -499,7 +526,7 @@ def build_non_course_conversation(
     )
 
     # Turn 4: Closing
-    summary = build_summary_json(persona, name, apt, 4)
+    summary = build_summary_json(persona, name, apt, 4, rng, now)
     closing = (
         f"Got it — I'll pass that along so Dr. Francom can prepare. "
         f"See you on {date_str}!"
@@ -511,7 +538,11 @@ def build_non_course_conversation(
 
 
 def build_other_course_conversation(
-    persona: dict, name: str, apt: datetime
+    persona: dict,
+    name: str,
+    apt: datetime,
+    rng: random.Random,
+    now: datetime,
 ) -> list[dict]:
     """Build a conversation for a non-SPA-212 course."""
     messages = []
@@ -521,7 +552,7 @@ def build_other_course_conversation(
     messages.append(
         {
             "role": "assistant",
-            "content": random.choice(GREETING_TEMPLATES).format(
+            "content": rng.choice(GREETING_TEMPLATES).format(
                 name=name, date=date_str
             ),
         }
@@ -529,7 +560,7 @@ def build_other_course_conversation(
     messages.append(
         {
             "role": "user",
-            "content": random.choice(COURSE_CHOICE["other_course"]),
+            "content": rng.choice(COURSE_CHOICE["other_course"]),
         }
     )
 
@@ -576,7 +607,7 @@ def build_other_course_conversation(
         messages.append(
             {
                 "role": "user",
-                "content": random.choice(CONFIDENCE_OPTIONS[sa]),
+                "content": rng.choice(CONFIDENCE_OPTIONS[sa]),
             }
         )
 
@@ -593,12 +624,14 @@ def build_other_course_conversation(
     messages.append(
         {
             "role": "user",
-            "content": random.choice(CONFIRM_RESPONSES),
+            "content": rng.choice(CONFIRM_RESPONSES),
         }
     )
 
     # Closing
-    summary = build_summary_json(persona, name, apt, len(messages) // 2)
+    summary = build_summary_json(
+        persona, name, apt, len(messages) // 2, rng, now
+    )
     closing = (
         f"Thanks! I'll send a summary to Dr. Francom. "
         f"See you on {date_str}!"
@@ -610,11 +643,16 @@ def build_other_course_conversation(
 
 
 def build_summary_json(
-    persona: dict, name: str, apt: datetime, turn_count: int
+    persona: dict,
+    name: str,
+    apt: datetime,
+    turn_count: int,
+    rng: random.Random,
+    now: datetime,
 ) -> dict:
     """Build the IntakeSummary JSON dict from a persona."""
-    session_id = f"sess-{uuid.uuid4().hex[:8]}"
-    booking_ref = f"cal-{uuid.uuid4().hex[:6]}"
+    session_id = f"sess-{rng.getrandbits(32):08x}"
+    booking_ref = f"cal-{rng.getrandbits(24):06x}"
     notes = persona.get("notes", "")
 
     # Build a plausible issue_description from persona notes
@@ -640,21 +678,33 @@ def build_summary_json(
         "student_self_assessment": persona.get("self_assessment"),
         "professor_prep_note": prep_note,
         "turn_count": turn_count,
-        "created_at": datetime.now(tz=timezone.utc).isoformat(),
+        "created_at": now.isoformat(),
     }
 
 
-def generate_conversation(persona: dict) -> list[dict]:
-    """Generate a full conversation from a persona."""
-    name, apt = random_appointment()
+def generate_conversation(
+    persona: dict,
+    rng: random.Random | None = None,
+    now: datetime | None = None,
+) -> list[dict]:
+    """Generate a full conversation from a persona.
+
+    Pass ``rng`` and ``now`` for reproducible output; by default they
+    are derived from the global ``random`` state and the current time.
+    """
+    if rng is None:
+        rng = random.Random(random.getrandbits(64))
+    if now is None:
+        now = datetime.now(tz=timezone.utc)
+    name, apt = random_appointment(rng, now)
     course = persona["course"]
 
     if course == "SPA 212-T":
-        turns = build_spa212_conversation(persona, name, apt)
+        turns = build_spa212_conversation(persona, name, apt, rng, now)
     elif course == "non_course":
-        turns = build_non_course_conversation(persona, name, apt)
+        turns = build_non_course_conversation(persona, name, apt, rng, now)
     else:
-        turns = build_other_course_conversation(persona, name, apt)
+        turns = build_other_course_conversation(persona, name, apt, rng, now)
 
     # Prepend system message with placeholder context
     system_content = (
@@ -666,6 +716,122 @@ def generate_conversation(persona: dict) -> list[dict]:
     return [{"role": "system", "content": system_content}] + turns
 
 
+SPLIT_NAMES = ("train", "valid", "test")
+
+
+def task_seed(seed: int, persona_id: str, variation: int) -> int:
+    """Deterministic per-conversation seed, independent of worker count."""
+    digest = hashlib.blake2b(
+        f"{seed}:{persona_id}:{variation}".encode(), digest_size=8
+    ).digest()
+    return int.from_bytes(digest, "big")
+
+
+def assign_split(
+    seed: int, persona_id: str, variation: int, ratios: list[float]
+) -> str:
+    """Assign a conversation to a split by hashing its identity."""
+    digest = hashlib.blake2b(
+        f"split:{seed}:{persona_id}:{variation}".encode(), digest_size=8
+    ).digest()
+    point = int.from_bytes(digest, "big") / 2**64 * sum(ratios)
+    cumulative = 0.0
+    for name, ratio in zip(SPLIT_NAMES, ratios):
+        cumulative += ratio
+        if point < cumulative:
+            return name
+    return SPLIT_NAMES[-1]
+
+
+def generate_row(task: tuple) -> tuple[str, str]:
+    """Build one conversation and return (split, JSONL line).
+
+    Runs in pool workers, so it only depends on its arguments.
+    """
+    persona, variation, seed, ratios, now = task
+    persona_id = persona["id"]
+    rng = random.Random(task_seed(seed, persona_id, variation))
+    convo = generate_conversation(persona, rng, now)
+    split = assign_split(seed, persona_id, variation, ratios)
+    return split, json.dumps({"messages": convo})
+
+
+def iter_tasks(
+    personas: Iterable[dict],
+    variations: int,
+    seed: int,
+    ratios: list[float],
+    now: datetime,
+) -> Iterator[tuple]:
+    for persona in personas:
+        for variation in range(variations):
+            yield persona, variation, seed, ratios, now
+
+
+class SplitWriter:
+    """Stream JSONL rows to per-split files, optionally sharded.
+
+    With ``shard_size`` 0 each split goes to ``<split>.jsonl``, the
+    layout mlx_lm.lora expects. Otherwise rows roll over into
+    ``<split>-00000.jsonl``, ``<split>-00001.jsonl``, ... every
+    ``shard_size`` rows.
+    """
+
+    def __init__(self, output_dir: Path, shard_size: int = 0):
+        self.output_dir = output_dir
+        self.shard_size = shard_size
+        self.counts = dict.fromkeys(SPLIT_NAMES, 0)
+        self._files: dict[str, TextIO] = {}
+
+    def write(self, split: str, line: str) -> None:
+        n = self.counts[split]
+        if split not in self._files or (
+            self.shard_size and n % self.shard_size == 0
+        ):
+            self._open(split, n // self.shard_size if self.shard_size else 0)
+        self._files[split].write(line + "\n")
+        self.counts[split] = n + 1
+
+    def _open(self, split: str, shard: int) -> None:
+        if split in self._files:
+            self._files[split].close()
+        name = f"{split}-{shard:05d}.jsonl" if self.shard_size else split
+        if not self.shard_size:
+            name += ".jsonl"
+        self._files[split] = open(self.output_dir / name, "w")
+
+    def close(self) -> None:
+        for f in self._files.values():
+            f.close()
+        self._files.clear()
+        if not self.shard_size:
+            # Keep every split file present, even if it received no rows.
+            for split in SPLIT_NAMES:
+                (self.output_dir / f"{split}.jsonl").touch()
+
+
+def windows(iterable: Iterable, size: int) -> Iterator[list]:
+    iterator = iter(iterable)
+    while window := list(itertools.islice(iterator, size)):
+        yield window
+
+
+def generate_rows(
+    tasks: Iterable[tuple], workers: int, chunksize: int = 16
+) -> Iterator[tuple[str, str]]:
+    """Yield (split, line) rows in task order.
+
+    Tasks are fed to the pool in bounded windows so memory use does not
+    grow with the number of conversations.
+    """
+    if workers <= 1:
+        yield from map(generate_row, tasks)
+        return
+    with multiprocessing.Pool(workers) as pool:
+        for window in windows(tasks, workers * chunksize * 4):
+            yield from pool.imap(generate_row, window, chunksize=chunksize)
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Generate synthetic training data from persona matrix"
@@ -688,46 +854,85 @@ def main():
         default="0.8,0.1,0.1",
         help="Train/val/test split ratios (default: 0.8,0.1,0.1)",
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Generator processes; output is identical for any value "
+        "(default: 1)",
+    )
+    parser.add_argument(
+        "--shard-size",
+        type=int,
+        default=0,
+        help="Rows per output shard; 0 writes one file per split (default: 0)",
+    )
+    parser.add_argument(
+        "--output-dir",
+        type=Path,
+        default=OUTPUT_DIR,
+        help="Directory for the JSONL output (default: training-data/)",
+    )
+    parser.add_argument(
+        "--now",
+        type=datetime.fromisoformat,
+        default=None,
+        help="Reference time for appointments and created_at "
+        "(ISO 8601; default: current time)",
+    )
+    parser.add_argument(
+        "--expand",
+        type=int,
+        default=0,
+        help="Sample this many personas from the combinatorial persona "
+        "space (9,190 in all) instead of the hand-written matrix; use "
+        "--variations for more rows (default: 0, off)",
+    )
+    parser.add_argument(
+        "--min-per-target",
+        type=int,
+        default=2,
+        help="With --expand, minimum personas per IssueCategory and "
+        "grammar drill-down topic (default: 2)",
+    )
     args = parser.parse_args()
 
-    random.seed(args.seed)
     ratios = [float(r) for r in args.split.split(",")]
     assert len(ratios) == 3, "Split must have exactly 3 values"
-
-    # Load persona matrix
-    with open(PERSONA_PATH) as f:
-        matrix = json.load(f)
-
-    personas = matrix["personas"]
-    print(f"Loaded {len(personas)} personas")
-
-    # Generate conversations
-    all_convos = []
-    for persona in personas:
-        for _ in range(args.variations):
-            convo = generate_conversation(persona)
-            all_convos.append({"messages": convo})
-
-    random.shuffle(all_convos)
-    total = len(all_convos)
-    print(f"Generated {total} conversations")
-
-    # Split into train/val/test
-    train_end = int(total * ratios[0])
-    val_end = train_end + int(total * ratios[1])
-
-    splits = {
-        "train.jsonl": all_convos[:train_end],
-        "valid.jsonl": all_convos[train_end:val_end],
-        "test.jsonl": all_convos[val_end:],
-    }
-
-    for filename, convos in splits.items():
-        path = OUTPUT_DIR / filename
-        with open(path, "w") as f:
-            for convo in convos:
-                f.write(json.dumps(convo) + "\n")
-        print(f"Wrote {len(convos)} conversations to {path.name}")
+    now = args.now or datetime.now(tz=timezone.utc).replace(microsecond=0)
+
+    if args.expand:
+        # Imported here: persona_space itself imports this module.
+        from persona_space import PersonaSpace
+
+        space = PersonaSpace()
+        if args.expand > len(space):
+            parser.error(
+                f"--expand {args.expand} exceeds the {len(space):,} "
+                "personas in the space; raise --variations instead"
+            )
+        personas = space.sample(
+            args.expand, seed=args.seed, min_per_target=args.min_per_target
+        )
+        print(f"Sampling {args.expand} of {len(space):,} valid personas")
+    else:
+        with open(PERSONA_PATH) as f:
+            matrix = json.load(f)
+        personas = matrix["personas"]
+        print(f"Loaded {len(personas)} personas")
+
+    args.output_dir.mkdir(parents=True, exist_ok=True)
+    tasks = iter_tasks(personas, args.variations, args.seed, ratios, now)
+    writer = SplitWriter(args.output_dir, args.shard_size)
+    try:
+        for split, line in generate_rows(tasks, args.workers):
+            writer.write(split, line)
+    finally:
+        writer.close()
+
+    print(f"Generated {sum(writer.counts.values())} conversations")
+    for split, count in writer.counts.items():
+        print(f"Wrote {count} conversations to {split}")
 
     print("Done.")
 
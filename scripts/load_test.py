@@ -0,0 +1,392 @@
+#!/usr/bin/env python3
+"""Replay persona-driven intake conversations against the HTTP API.
+
+Builds realistic multi-turn conversations with the same persona matrix
+and turn builders used for training data, then plays the *user* side of
+each one against /chat/stream. Sessions arrive as an open-loop Poisson
+process (or at a constant rate), so queueing under load shows up in the
+numbers instead of being hidden by a fixed worker pool.
+
+Reports turn throughput plus p50/p95/p99 turn latency and
+time-to-first-token (TTFT).
+
+Usage:
+    # Against a server you started yourself (fake or real model)
+    uv run python scripts/load_test.py --base-url http://localhost:8000
+
+    # Spawn a local server on the fake inference backend
+    uv run python scripts/load_test.py --launch fake --sessions 40 --rate 2
+
+    # Spawn a local server on the configured MLX model
+    uv run python scripts/load_test.py --launch mlx --sessions 20 --rate 0.5
+
+    # Spawn a model server plus 4 API workers (split mode)
+    uv run python scripts/load_test.py --launch fake --workers 4
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from generate_training_data import (  # noqa: E402
+    PERSONA_PATH,
+    REPO_ROOT,
+    generate_conversation,
+)
+
+
+@dataclass
+class TurnResult:
+    latency: float
+    ttft: float | None
+    ok: bool
+
+
+@dataclass
+class Results:
+    turns: list[TurnResult] = field(default_factory=list)
+    sessions_completed: int = 0
+
+
+def user_turns(persona: dict) -> list[str]:
+    """Build one conversation for ``persona`` and keep its user turns."""
+    return [
+        m["content"]
+        for m in generate_conversation(persona)
+        if m["role"] == "user"
+    ]
+
+
+async def run_turn(
+    client: httpx.AsyncClient, message: str, session_id: str | None
+) -> tuple[TurnResult, str | None]:
+    start = time.perf_counter()
+    ttft = None
+    event = None
+    try:
+        async with client.stream(
+            "POST",
+            "/chat/stream",
+            json={"message": message, "session_id": session_id},
+        ) as response:
+            if response.status_code != 200:
+                await response.aread()
+                return TurnResult(time.perf_counter() - start, None, False), (
+                    session_id
+                )
+            async for line in response.aiter_lines():
+                if line.startswith("event: "):
+                    event = line[7:]
+                elif line.startswith("data: "):
+                    if event == "token" and ttft is None:
+                        ttft = time.perf_counter() - start
+                    elif event == "done":
+                        session_id = json.loads(line[6:])["session_id"]
+                    elif event == "error":
+                        break
+    except httpx.HTTPError:
+        return TurnResult(time.perf_counter() - start, ttft, False), session_id
+    ok = event == "done"
+    return TurnResult(time.perf_counter() - start, ttft, ok), session_id
+
+
+async def run_session(
+    client: httpx.AsyncClient,
+    turns: list[str],
+    think_time: float,
+    results: Results,
+) -> None:
+    session_id = None
+    for i, message in enumerate(turns):
+        if i and think_time:
+            await asyncio.sleep(random.expovariate(1 / think_time))
+        result, session_id = await run_turn(client, message, session_id)
+        results.turns.append(result)
+        if not result.ok:
+            return
+    results.sessions_completed += 1
+
+
+async def drive(args, personas: list[dict]) -> tuple[Results, float]:
+    results = Results()
+    timeout = httpx.Timeout(args.timeout)
+    limits = httpx.Limits(max_connections=None)
+    async with httpx.AsyncClient(
+        base_url=args.base_url, timeout=timeout, limits=limits
+    ) as client:
+        tasks = []
+        start = time.perf_counter()
+        for i in range(args.sessions):
+            if i:
+                gap = (
+                    random.expovariate(args.rate)
+                    if args.arrival == "poisson"
+                    else 1 / args.rate
+                )
+                await asyncio.sleep(gap)
+            turns = user_turns(random.choice(personas))
+            tasks.append(
+                asyncio.create_task(
+                    run_session(client, turns, args.think_time, results)
+                )
+            )
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - start
+    return results, elapsed
+
+
+def percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return float("nan")
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method="inclusive")[int(pct) - 1]
+
+
+def summarize(results: Results, elapsed: float, sessions: int) -> dict:
+    ok = [t for t in results.turns if t.ok]
+    latencies = [t.latency for t in ok]
+    ttfts = [t.ttft for t in ok if t.ttft is not None]
+    return {
+        "sessions": sessions,
+        "sessions_completed": results.sessions_completed,
+        "turns": len(results.turns),
+        "turn_errors": len(results.turns) - len(ok),
+        "elapsed_s": round(elapsed, 3),
+        "turns_per_s": round(len(ok) / elapsed, 3) if elapsed else 0.0,
+        "latency_s": {
+            f"p{p}": round(percentile(latencies, p), 3) for p in (50, 95, 99)
+        },
+        "ttft_s": {
+            f"p{p}": round(percentile(ttfts, p), 3) for p in (50, 95, 99)
+        },
+    }
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def server_env(
+    backend: str, workdir: Path, env: dict[str, str] | None
+) -> dict[str, str]:
+    return {
+        **os.environ,
+        "INTAKE_BOT_INFERENCE_BACKEND": backend,
+        "INTAKE_BOT_SESSION_LOG_PATH": str(workdir / "sessions.log"),
+        "INTAKE_BOT_TRACE_LOG_PATH": str(workdir / "traces.jsonl"),
+        **(env or {}),
+    }
+
+
+def launch_server(
+    backend: str,
+    workdir: Path,
+    target: str = "app.main:app",
+    env: dict[str, str] | None = None,
+    workers: int = 1,
+) -> tuple[subprocess.Popen, str]:
+    """Start uvicorn on a free port with logs kept out of the repo.
+
+    ``target`` is the ASGI app to serve, ``env`` adds settings and
+    ``workers`` is the number of uvicorn worker processes.
+    """
+    port = free_port()
+    proc = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            target,
+            "--host",
+            "127.0.0.1",
+            "--port",
+            str(port),
+            "--workers",
+            str(workers),
+            "--log-level",
+            "warning",
+        ],
+        cwd=REPO_ROOT,
+        env=server_env(backend, workdir, env),
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 120
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError("Server exited during startup")
+        try:
+            if httpx.get(f"{base_url}/health").status_code == 200:
+                return proc, base_url
+        except httpx.HTTPError:
+            time.sleep(0.25)
+    proc.terminate()
+    raise RuntimeError("Server did not become healthy within 120s")
+
+
+def launch_model_server(
+    backend: str, workdir: Path, env: dict[str, str] | None = None
+) -> tuple[subprocess.Popen, Path]:
+    """Start app.model_server on a socket in ``workdir``.
+
+    Returns once it accepts connections (it listens only after loading).
+    """
+    path = workdir / "model.sock"
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "app.model_server", "--socket", str(path)],
+        cwd=REPO_ROOT,
+        env=server_env(backend, workdir, env),
+    )
+    deadline = time.monotonic() + 300
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError("Model server exited during startup")
+        with socket.socket(socket.AF_UNIX) as probe:
+            try:
+                probe.connect(str(path))
+                return proc, path
+            except OSError:
+                time.sleep(0.25)
+    proc.terminate()
+    raise RuntimeError("Model server did not start within 300s")
+
+
+def launch(
+    backend: str, workdir: Path, workers: int | None
+) -> tuple[list[subprocess.Popen], str]:
+    """Start one API process, or a model server and ``workers`` workers."""
+    if workers is None:
+        proc, base_url = launch_server(backend, workdir)
+        return [proc], base_url
+    model_server, path = launch_model_server(backend, workdir)
+    try:
+        proc, base_url = launch_server(
+            backend,
+            workdir,
+            env={"INTAKE_BOT_MODEL_SERVER_SOCKET": str(path)},
+            workers=workers,
+        )
+    except RuntimeError:
+        model_server.terminate()
+        raise
+    # Stop the workers before the model server they depend on.
+    return [proc, model_server], base_url
+
+
+def print_report(summary: dict) -> None:
+    print(
+        f"Sessions: {summary['sessions_completed']}/{summary['sessions']} "
+        f"completed, {summary['turns']} turns "
+        f"({summary['turn_errors']} errors) in {summary['elapsed_s']:.1f}s"
+    )
+    print(f"Throughput: {summary['turns_per_s']:.2f} turns/s")
+    for name, key in (("Turn latency", "latency_s"), ("TTFT", "ttft_s")):
+        p = summary[key]
+        print(
+            f"{name + ':':14} p50 {p['p50']:.3f}s  "
+            f"p95 {p['p95']:.3f}s  p99 {p['p99']:.3f}s"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Persona-driven load test for the intake chat API"
+    )
+    parser.add_argument(
+        "--base-url",
+        default="http://localhost:8000",
+        help="Server to test (ignored with --launch)",
+    )
+    parser.add_argument(
+        "--launch",
+        choices=["fake", "mlx"],
+        help="Start a local server with this inference backend",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="With --launch, run this many API workers over one model "
+        "server (split mode) instead of a single process",
+    )
+    parser.add_argument(
+        "--sessions",
+        type=int,
+        default=20,
+        help="Number of intake sessions to run (default: 20)",
+    )
+    parser.add_argument(
+        "--rate",
+        type=float,
+        default=1.0,
+        help="Session arrival rate in sessions/second (default: 1.0)",
+    )
+    parser.add_argument(
+        "--arrival",
+        choices=["poisson", "constant"],
+        default="poisson",
+        help="Inter-arrival distribution (default: poisson)",
+    )
+    parser.add_argument(
+        "--think-time",
+        type=float,
+        default=2.0,
+        help="Mean seconds a student waits between turns (default: 2.0)",
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=120.0,
+        help="Per-turn HTTP timeout in seconds (default: 120)",
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=42,
+        help="Random seed for personas and arrivals (default: 42)",
+    )
+    parser.add_argument(
+        "--json",
+        type=Path,
+        help="Also write the summary as JSON to this path",
+    )
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    with open(PERSONA_PATH) as f:
+        personas = json.load(f)["personas"]
+
+    procs = []
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.launch:
+            procs, args.base_url = launch(args.launch, Path(tmp), args.workers)
+        try:
+            results, elapsed = asyncio.run(drive(args, personas))
+        finally:
+            for proc in procs:
+                proc.terminate()
+                proc.wait()
+
+    summary = summarize(results, elapsed, args.sessions)
+    print_report(summary)
+    if args.json:
+        args.json.write_text(json.dumps(summary, indent=2) + "\n")
+
+
+if __name__ == "__main__":
+    main()
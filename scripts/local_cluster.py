@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""Run several inference nodes behind the front router on one machine.
+
+A stand-in for a multi-host deployment: each node is its own uvicorn
+process (``app.main``, the fake backend by default), with its own
+session log and Chroma index, behind one ``app.cluster`` router.
+
+``up`` starts a cluster and keeps it running until Ctrl-C. ``bench``
+starts clusters of 1..N nodes in turn, drives each with the persona
+load test from scripts/load_test.py, and reports how turn throughput
+scales with the node count.
+
+Usage:
+    uv run python scripts/local_cluster.py up --nodes 3
+    uv run python scripts/local_cluster.py bench --max-nodes 4 --json s.json
+    uv run python scripts/local_cluster.py bench --no-rag --decode-tps 100
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import secrets
+import signal
+import subprocess
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+
+from load_test import (
+    PERSONA_PATH,
+    drive,
+    launch_server,
+    summarize,
+)
+
+
+@contextmanager
+def cluster(nodes: int, args, workdir: Path):
+    """Start ``nodes`` inference nodes and a router; yield the router URL."""
+    token = secrets.token_hex(16)
+    procs: list[subprocess.Popen] = []
+    settings = {
+        "INTAKE_BOT_ADMIN_TOKEN": token,
+        "INTAKE_BOT_FAKE_DECODE_TPS": str(args.decode_tps),
+    }
+    if args.no_rag:
+        settings["INTAKE_BOT_RAG_CORPUS_PATH"] = str(workdir / "no-corpus")
+    try:
+        urls = []
+        for i in range(nodes):
+            node_dir = workdir / f"node-{i}"
+            node_dir.mkdir()
+            proc, url = launch_server(
+                args.backend,
+                node_dir,
+                env={
+                    **settings,
+                    "INTAKE_BOT_CHROMA_DB_PATH": str(node_dir / "chroma_db"),
+                },
+            )
+            procs.append(proc)
+            urls.append(url)
+        router_dir = workdir / "router"
+        router_dir.mkdir()
+        proc, router_url = launch_server(
+            args.backend,
+            router_dir,
+            target="app.cluster:app",
+            env={
+                **settings,
+                "INTAKE_BOT_CLUSTER_NODES": json.dumps(urls),
+                "INTAKE_BOT_CLUSTER_POLL_INTERVAL": "0.5",
+            },
+        )
+        procs.append(proc)
+        yield router_url, urls
+    finally:
+        for proc in procs:
+            proc.terminate()
+        for proc in procs:
+            proc.wait()
+
+
+def up(args) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        with cluster(args.nodes, args, Path(tmp)) as (router_url, urls):
+            for url in urls:
+                print(f"node    {url}")
+            print(f"router  {router_url}  (Ctrl-C to stop)")
+            try:
+                signal.pause()
+            except KeyboardInterrupt:
+                pass
+
+
+def bench(args) -> None:
+    with open(PERSONA_PATH) as f:
+        personas = json.load(f)["personas"]
+    rows = []
+    for nodes in range(1, args.max_nodes + 1):
+        random.seed(args.seed)
+        with tempfile.TemporaryDirectory() as tmp:
+            with cluster(nodes, args, Path(tmp)) as (router_url, _):
+                args.base_url = router_url
+                results, elapsed = asyncio.run(drive(args, personas))
+        summary = summarize(results, elapsed, args.sessions)
+        rows.append({"nodes": nodes, **summary})
+        print(
+            f"{nodes} node(s): {summary['turns_per_s']:.2f} turns/s, "
+            f"p50 {summary['latency_s']['p50']:.2f}s, "
+            f"{summary['turn_errors']} errors"
+        )
+
+    base = rows[0]["turns_per_s"] or float("nan")
+    print(
+        f"\n{'nodes':>5} {'turns/s':>8} {'speedup':>8} {'eff.':>6} "
+        f"{'p50 s':>7} {'p95 s':>7}"
+    )
+    for row in rows:
+        speedup = row["turns_per_s"] / base
+        row["speedup"] = round(speedup, 2)
+        print(
+            f"{row['nodes']:>5} {row['turns_per_s']:>8.2f} {speedup:>8.2f} "
+            f"{speedup / row['nodes']:>6.0%} "
+            f"{row['latency_s']['p50']:>7.2f} {row['latency_s']['p95']:>7.2f}"
+        )
+    if args.json:
+        args.json.write_text(json.dumps(rows, indent=2) + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Local multi-node cluster behind the front router"
+    )
+    parser.add_argument(
+        "--backend",
+        choices=["fake", "mlx"],
+        default="fake",
+        help="Inference backend for every node (default: fake)",
+    )
+    parser.add_argument(
+        "--decode-tps",
+        type=float,
+        default=200.0,
+        help="Fake backend decode speed (default: 200 tokens/s)",
+    )
+    parser.add_argument(
+        "--no-rag",
+        action="store_true",
+        help="Start nodes without a RAG corpus (no embedding model needed)",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    up_parser = commands.add_parser("up", help="Start a cluster and wait")
+    up_parser.add_argument(
+        "--nodes", type=int, default=3, help="Inference nodes (default: 3)"
+    )
+
+    bench_parser = commands.add_parser(
+        "bench", help="Measure throughput at 1..N nodes"
+    )
+    bench_parser.add_argument(
+        "--max-nodes",
+        type=int,
+        default=4,
+        help="Largest cluster to measure (default: 4)",
+    )
+    bench_parser.add_argument(
+        "--sessions",
+        type=int,
+        default=60,
+        help="Intake sessions per run (default: 60)",
+    )
+    bench_parser.add_argument(
+        "--rate",
+        type=float,
+        default=6.0,
+        help="Session arrivals per second, enough to saturate (default: 6)",
+    )
+    bench_parser.add_argument(
+        "--arrival",
+        choices=["poisson", "constant"],
+        default="constant",
+        help="Inter-arrival distribution (default: constant)",
+    )
+    bench_parser.add_argument(
+        "--think-time",
+        type=float,
+        default=0.5,
+        help="Mean seconds between a student's turns (default: 0.5)",
+    )
+    bench_parser.add_argument(
+        "--timeout",
+        type=float,
+        default=300.0,
+        help="Per-turn HTTP timeout in seconds (default: 300)",
+    )
+    bench_parser.add_argument(
+        "--seed", type=int, default=42, help="Random seed (default: 42)"
+    )
+    bench_parser.add_argument(
+        "--json", type=Path, help="Also write the rows as JSON"
+    )
+    args = parser.parse_args()
+    if args.command == "up":
+        up(args)
+    else:
+        bench(args)
+
+
+if __name__ == "__main__":
+    main()
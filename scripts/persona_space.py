@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+"""Combinatorial persona space for large synthetic datasets.
+
+The hand-written persona matrix covers 32 paths through the intake
+flow. This module describes the full space those personas are drawn
+from:
+
+    course × issue_category × issue_subcategory
+           × self_assessment × personality × specific_artifact
+
+It only enumerates combinations that obey the dialogue-flow rules
+(e.g. non-course meetings have no self-assessment or subcategory,
+exam prep always names an exam). Valid (course, category, subcategory)
+triples form a short list of strata; within a stratum the remaining
+dimensions are independent, so any persona can be decoded from a
+single integer index in mixed radix. Enumeration and sampling both
+work on indices and never materialize the product.
+
+The space holds 9,190 personas in 37 strata, so a dataset larger
+than that needs several conversation variations per persona.
+
+``PersonaSpace.sample`` first meets a per-target quota for every
+IssueCategory and every GRAMMAR_DRILLDOWN key, then fills the rest
+uniformly without replacement.
+
+Usage:
+    uv run python scripts/persona_space.py            # size and coverage
+    uv run python scripts/persona_space.py --sample 5 # print samples
+"""
+
+import argparse
+import bisect
+import json
+import random
+import sys
+from collections.abc import Iterator
+from dataclasses import dataclass
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from generate_training_data import GRAMMAR_DRILLDOWN  # noqa: E402
+
+from app.summary import CourseType, IssueCategory, SelfAssessment  # noqa: E402
+
+COURSE_CATEGORIES = {
+    CourseType.spa_212.value: [
+        c.value for c in IssueCategory if c is not IssueCategory.general
+    ],
+    CourseType.other_course.value: [
+        "grammar",
+        "vocabulary",
+        "composition",
+        "exam_prep",
+        "interview_prep",
+        "oral_presentation",
+        "assignment_instructions",
+        "other",
+    ],
+    CourseType.non_course.value: ["general", "other"],
+}
+
+# SPA 212-T taxonomy; None means the visitor could not name a topic.
+SPA_SUBCATEGORIES = {
+    "grammar": [*GRAMMAR_DRILLDOWN, None],
+    "composition": [
+        "composition_thesis",
+        "composition_organization",
+        "composition_grammar",
+    ],
+    "literary_comprehension": ["literary_analysis", None],
+    "cultural_content": ["cultural_context", None],
+}
+
+SPA_ARTIFACTS = {
+    "grammar": [
+        None,
+        "ED 8",
+        "ED 10",
+        "ED 12",
+        "Chapter 2 homework",
+        "Chapter 3 practice",
+        "Chapter 5 exercises",
+    ],
+    "vocabulary": [None, "Chapter 4 vocab list", "Chapter 2 vocab quiz"],
+    "composition": ["Escritura I", "Escritura II", "Escritura II draft", None],
+    "exam_prep": [
+        "Exam 1: Chapters 1-2",
+        "Exam 2: Chapters 3-4",
+        "Exam 3/Final: Chapters 5-6",
+    ],
+    "interview_prep": [None, "Oral interview"],
+    "oral_presentation": [None, "Presentación oral"],
+    "literary_comprehension": [None, "Chapter 4 reading"],
+    "cultural_content": [None, "Chapter 3 cultural reading"],
+    "assignment_instructions": ["Escritura II", "ED 8", None],
+}
+
+OTHER_COURSE_ARTIFACTS = [None, "Midterm essay", "Final project", "Homework 3"]
+
+COURSE_PERSONALITIES = [
+    "shy, gives terse answers",
+    "engaged but confused",
+    "anxious, overshares context",
+    "confident, has a specific question",
+    "cooperative, moderate detail",
+    "frustrated, wants concrete steps",
+    "prepared, wants confirmation",
+    "quiet, needs prompting",
+    "overwhelmed, mentions multiple issues",
+    "cheerful, gives good detail",
+    "earnest, tries hard",
+    "panicked about upcoming exam",
+    "one-word answers only",
+    "dumps entire problem in one message",
+]
+
+NON_COURSE_PERSONALITIES = [
+    "professional, concise",
+    "friendly, brief",
+    "chatty, gives background first",
+]
+
+NOTES = {
+    "ser_estar": "Uses ser for locations and temporary states.",
+    "preterite_imperfect": "Mixes up completed vs. ongoing past actions.",
+    "subjunctive_triggers": "Misses the subjunctive after doubt or emotion.",
+    "subjunctive_formation": "Cannot conjugate irregular subjunctive forms.",
+    "commands_informal": "Unsure about negative tú commands.",
+    "commands_formal": "Mixes up usted and tú command forms.",
+    "object_pronouns": "Confuses direct and indirect object pronouns.",
+    "object_pronouns_double": "Unsure of double pronoun order and le->se.",
+    "gustar_verbs": "Struggles with verbs like encantar and molestar.",
+    "conditional": "Mixes conditional with future tense forms.",
+    "si_clauses": "Uses the conditional in both halves of si clauses.",
+    "adverbial_clauses": "Unsure when adverbial clauses need subjunctive.",
+    "future_tense": "Forgets the irregular future stems.",
+    "composition_thesis": "Does not understand what the prompt asks for.",
+    "composition_organization": "Has ideas but cannot structure paragraphs.",
+    "composition_grammar": "Wants help with grammar errors in a draft.",
+    "literary_analysis": "Does not know how to write about literary themes.",
+    "cultural_context": "Wants more background for a class discussion.",
+    "grammar": "Cannot name the grammar topic that is causing trouble.",
+    "vocabulary": "Studies vocab lists but cannot recall words in context.",
+    "composition": "Needs help with a writing assignment.",
+    "exam_prep": "Unsure what to focus on when reviewing for the exam.",
+    "interview_prep": "Freezes when speaking; nervous about the interview.",
+    "oral_presentation": "Needs help preparing an oral presentation.",
+    "literary_comprehension": "Confused about the assigned reading.",
+    "cultural_content": "Confused about the cultural topic from class.",
+    "assignment_instructions": "Cannot parse the assignment instructions.",
+    "general": "Wants to discuss course selection or advising.",
+    "other": "Has trouble explaining what they need.",
+}
+
+
+@dataclass(frozen=True)
+class Stratum:
+    """One valid (course, category, subcategory) with its free dimensions."""
+
+    course: str
+    category: str
+    subcategory: str | None
+    self_assessments: tuple
+    personalities: tuple
+    artifacts: tuple
+
+    @property
+    def size(self) -> int:
+        return (
+            len(self.self_assessments)
+            * len(self.personalities)
+            * len(self.artifacts)
+        )
+
+    def persona(self, offset: int, index: int) -> dict:
+        """Decode ``offset`` (mixed radix) into a persona dict."""
+        offset, a = divmod(offset, len(self.artifacts))
+        sa, p = divmod(offset, len(self.personalities))
+        artifact = self.artifacts[a]
+        subcat = self.subcategory
+        slug = self.course.replace(" ", "").lower()
+        notes = NOTES.get(subcat or self.category, NOTES["other"])
+        if self.course == CourseType.other_course.value:
+            notes = f"Taking a different Spanish course. {notes}"
+        return {
+            "id": f"gen-{index:07d}-{slug}-{self.category}-{subcat or 'none'}",
+            "course": self.course,
+            "issue_category": self.category,
+            "issue_subcategory": subcat,
+            "specific_artifact": artifact,
+            "self_assessment": self.self_assessments[sa],
+            "personality": self.personalities[p],
+            "notes": notes,
+        }
+
+
+def build_strata() -> list[Stratum]:
+    """List every valid stratum under the dialogue-flow constraints."""
+    course_sa = tuple(s.value for s in SelfAssessment)
+    strata = []
+    for course, categories in COURSE_CATEGORIES.items():
+        for category in categories:
+            if course == CourseType.spa_212.value:
+                subcats = SPA_SUBCATEGORIES.get(category, [None])
+                artifacts = SPA_ARTIFACTS.get(category, [None])
+                self_assessments = course_sa
+                personalities = COURSE_PERSONALITIES
+            elif course == CourseType.other_course.value:
+                subcats = [None]
+                artifacts = OTHER_COURSE_ARTIFACTS
+                self_assessments = course_sa
+                personalities = COURSE_PERSONALITIES
+            else:
+                subcats = [None]
+                artifacts = [None]
+                self_assessments = (None,)
+                personalities = NON_COURSE_PERSONALITIES
+            for subcat in subcats:
+                strata.append(
+                    Stratum(
+                        course=course,
+                        category=category,
+                        subcategory=subcat,
+                        self_assessments=tuple(self_assessments),
+                        personalities=tuple(personalities),
+                        artifacts=tuple(artifacts),
+                    )
+                )
+    return strata
+
+
+class PersonaSpace:
+    """Indexable, lazily decoded space of valid personas."""
+
+    def __init__(self, strata: list[Stratum] | None = None):
+        self.strata = strata if strata is not None else build_strata()
+        self._starts = []
+        total = 0
+        for stratum in self.strata:
+            self._starts.append(total)
+            total += stratum.size
+        self.size = total
+
+    def __len__(self) -> int:
+        return self.size
+
+    def persona(self, index: int) -> dict:
+        if not 0 <= index < self.size:
+            raise IndexError(index)
+        i = bisect.bisect_right(self._starts, index) - 1
+        return self.strata[i].persona(index - self._starts[i], index)
+
+    def __iter__(self) -> Iterator[dict]:
+        """Enumerate every valid persona in index order."""
+        for index in range(self.size):
+            yield self.persona(index)
+
+    def coverage_targets(self) -> dict[str, list[int]]:
+        """Map each coverage target to the strata that satisfy it."""
+        targets: dict[str, list[int]] = {}
+        for category in IssueCategory:
+            targets[f"category:{category.value}"] = [
+                i
+                for i, s in enumerate(self.strata)
+                if s.category == category.value
+            ]
+        for subcat in GRAMMAR_DRILLDOWN:
+            targets[f"grammar:{subcat}"] = [
+                i for i, s in enumerate(self.strata) if s.subcategory == subcat
+            ]
+        return targets
+
+    def sample(
+        self, n: int, seed: int = 42, min_per_target: int = 2
+    ) -> Iterator[dict]:
+        """Yield ``n`` distinct personas with guaranteed coverage.
+
+        Every IssueCategory and GRAMMAR_DRILLDOWN key appears at least
+        ``min_per_target`` times (when ``n`` allows); the remainder is
+        drawn uniformly from the whole space. Memory is O(n) for the
+        set of used indices, independent of the size of the space.
+        """
+        if n > self.size:
+            raise ValueError(
+                f"Requested {n} personas but the space only has {self.size}"
+            )
+        rng = random.Random(seed)
+        seen: set[int] = set()
+
+        def draw(strata: list[int]) -> int:
+            weights = [self.strata[i].size for i in strata]
+            while True:
+                i = rng.choices(strata, weights=weights)[0]
+                index = self._starts[i] + rng.randrange(self.strata[i].size)
+                if index not in seen:
+                    return index
+
+        targets = [
+            (
+                strata,
+                min(min_per_target, sum(self.strata[i].size for i in strata)),
+            )
+            for strata in self.coverage_targets().values()
+        ]
+        produced = 0
+        for round_ in range(min_per_target):
+            for strata, quota in targets:
+                if round_ >= quota:
+                    continue
+                if produced == n:
+                    return
+                index = draw(strata)
+                seen.add(index)
+                produced += 1
+                yield self.persona(index)
+
+        everything = list(range(len(self.strata)))
+        while produced < n:
+            index = draw(everything)
+            seen.add(index)
+            produced += 1
+            yield self.persona(index)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Inspect the combinatorial persona space"
+    )
+    parser.add_argument(
+        "--sample",
+        type=int,
+        default=0,
+        help="Print this many sampled personas as JSON lines",
+    )
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    space = PersonaSpace()
+    print(f"{len(space.strata)} strata, {len(space):,} valid personas")
+    for target, strata in space.coverage_targets().items():
+        size = sum(space.strata[i].size for i in strata)
+        print(f"  {target:<40} {size:>7,}")
+    for persona in space.sample(args.sample, seed=args.seed):
+        print(json.dumps(persona))
+
+
+if __name__ == "__main__":
+    main()
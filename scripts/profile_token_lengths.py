@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+"""Profile token lengths of the training JSONL and write packed data.
+
+Renders every conversation with the model's chat template, tokenizes
+the rendered text in batches with the fast (Rust) tokenizer, and
+reports per-split length histograms plus an estimate of how many
+padding tokens mlx_lm.lora computes on. mlx_lm already sorts rows by
+length before batching, so the estimate mirrors that: consecutive
+sorted rows, padded to one plus the next multiple of 32.
+
+Two optional outputs cut that waste further:
+
+``--buckets 512,1024,2048``
+    Writes ``<output-dir>/len-<N>/{train,valid}.jsonl`` with the rows
+    whose length fits in that bucket, and suggests a --batch-size per
+    bucket for a fixed token budget. Short buckets train with large
+    batches and a small --max-seq-length instead of sharing one
+    worst-case setting. Rows keep their chat format, so --mask-prompt
+    still applies. Rows longer than the largest bucket are counted and
+    left out; end the list with --max-seq-len to keep them.
+
+``--pack``
+    Best-fit-decreasing packs whole conversations into rows of at most
+    --max-seq-len tokens and writes them as mlx_lm "text" rows. Test
+    rows are copied unchanged. This trades training fidelity for
+    throughput: "text" rows have no prompt to mask, so the loss covers
+    the system prompt and the student turns too, and mlx_lm has no
+    per-conversation attention mask, so each conversation in a row
+    attends to the ones packed before it. Prefer --buckets unless
+    padding dominates training time.
+
+Rows longer than --max-seq-len are reported and left out of both
+outputs; mlx_lm would otherwise truncate them and cut off the JSON
+summary at the end of the conversation.
+
+Usage:
+    uv run python scripts/profile_token_lengths.py
+    uv run python scripts/profile_token_lengths.py --buckets 512,1024,2048
+    uv run python scripts/profile_token_lengths.py --pack --max-seq-len 2048
+"""
+
+import argparse
+import bisect
+import json
+import shutil
+import statistics
+import sys
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+from app.config import settings  # noqa: E402
+
+DATA_DIR = REPO_ROOT / "training-data"
+SPLITS = ("train", "valid", "test")
+# mlx_lm.tuner.trainer.iterate_batches pads to 1 + a multiple of 32.
+PAD_TO = 32
+
+
+def load_tokenizer(name: str):
+    from transformers import AutoTokenizer
+
+    return AutoTokenizer.from_pretrained(name, use_fast=True)
+
+
+def read_rows(path: Path) -> list[str]:
+    with open(path) as f:
+        return [line for line in f if line.strip()]
+
+
+def render(tokenizer, line: str) -> str:
+    messages = json.loads(line)["messages"]
+    return tokenizer.apply_chat_template(messages, tokenize=False)
+
+
+def token_lengths(
+    tokenizer, lines: list[str], batch_size: int = 512
+) -> tuple[list[int], list[str]]:
+    """Tokenize rendered conversations in batches; return lengths, texts."""
+    lengths, texts = [], []
+    for start in range(0, len(lines), batch_size):
+        batch = [
+            render(tokenizer, line)
+            for line in lines[start : start + batch_size]
+        ]
+        encoded = tokenizer(batch, add_special_tokens=False)["input_ids"]
+        lengths.extend(len(ids) for ids in encoded)
+        texts.extend(batch)
+    return lengths, texts
+
+
+def padded_length(longest: int, max_seq_len: int) -> int:
+    return min(1 + PAD_TO * ((longest + PAD_TO - 1) // PAD_TO), max_seq_len)
+
+
+def padding_waste(
+    lengths: list[int], batch_size: int, max_seq_len: int, sort: bool = True
+) -> tuple[int, int]:
+    """Estimate (real, padded) tokens for one epoch of mlx_lm batching."""
+    ordered = sorted(lengths) if sort else list(lengths)
+    real = padded = 0
+    for start in range(0, len(ordered) - batch_size + 1, batch_size):
+        batch = [
+            min(n, max_seq_len) for n in ordered[start : start + batch_size]
+        ]
+        real += sum(batch)
+        padded += padded_length(max(batch), max_seq_len) * len(batch)
+    return real, padded
+
+
+def histogram(lengths: list[int], bin_width: int, width: int = 40) -> str:
+    if not lengths:
+        return "  (empty)"
+    bins: dict[int, int] = {}
+    for n in lengths:
+        bins[n // bin_width] = bins.get(n // bin_width, 0) + 1
+    peak = max(bins.values())
+    rows = []
+    for b in range(min(bins), max(bins) + 1):
+        count = bins.get(b, 0)
+        bar = "#" * round(count / peak * width)
+        low, high = b * bin_width, (b + 1) * bin_width - 1
+        rows.append(f"  {low:>6}-{high:<6} {count:>7}  {bar}")
+    return "\n".join(rows)
+
+
+def pack(lengths: list[int], capacity: int) -> list[list[int]]:
+    """Best-fit decreasing bin packing of row indices by length."""
+    bins: list[list[int]] = []
+    # Sorted (remaining capacity, bin index) pairs for best-fit lookup.
+    free: list[tuple[int, int]] = []
+    for i in sorted(range(len(lengths)), key=lambda i: -lengths[i]):
+        n = lengths[i]
+        pos = bisect.bisect_left(free, (n, -1))
+        if pos < len(free):
+            remaining, b = free.pop(pos)
+        else:
+            remaining, b = capacity, len(bins)
+            bins.append([])
+        bins[b].append(i)
+        bisect.insort(free, (remaining - n, b))
+    return bins
+
+
+def write_buckets(
+    output_dir: Path,
+    rows: dict[str, tuple[list[str], list[int]]],
+    buckets: list[int],
+    tokens_per_batch: int,
+) -> dict[str, int]:
+    """Write one directory per bucket; return rows too long for any."""
+    for i, limit in enumerate(buckets):
+        floor = buckets[i - 1] if i else 0
+        bucket_dir = output_dir / f"len-{limit}"
+        bucket_dir.mkdir(parents=True, exist_ok=True)
+        counts = {}
+        for split in ("train", "valid"):
+            lines, lengths = rows[split]
+            selected = [
+                line for line, n in zip(lines, lengths) if floor < n <= limit
+            ]
+            (bucket_dir / f"{split}.jsonl").write_text(
+                "".join(
+                    line if line.endswith("\n") else line + "\n"
+                    for line in selected
+                )
+            )
+            counts[split] = len(selected)
+        batch = max(1, tokens_per_batch // limit)
+        print(
+            f"  {bucket_dir}: {counts['train']} train, {counts['valid']} "
+            f"valid -> --max-seq-length {limit} --batch-size {batch}"
+        )
+    return {
+        split: sum(n > buckets[-1] for n in rows[split][1])
+        for split in ("train", "valid")
+    }
+
+
+def write_packed(
+    output_dir: Path,
+    texts: dict[str, list[str]],
+    lengths: dict[str, list[int]],
+    data_dir: Path,
+    max_seq_len: int,
+) -> dict[str, list[int]]:
+    output_dir.mkdir(parents=True, exist_ok=True)
+    packed_lengths = {}
+    for split in ("train", "valid"):
+        fits = [i for i, n in enumerate(lengths[split]) if n <= max_seq_len]
+        bins = pack([lengths[split][i] for i in fits], max_seq_len)
+        with open(output_dir / f"{split}.jsonl", "w") as f:
+            for members in bins:
+                text = "".join(texts[split][fits[i]] for i in members)
+                f.write(json.dumps({"text": text}) + "\n")
+        packed_lengths[split] = [
+            sum(lengths[split][fits[i]] for i in members) for members in bins
+        ]
+        print(
+            f"  {split}: {len(fits)} conversations packed into {len(bins)} rows"
+        )
+    test = data_dir / "test.jsonl"
+    if test.exists():
+        shutil.copyfile(test, output_dir / "test.jsonl")
+    return packed_lengths
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Profile training data token lengths and padding waste"
+    )
+    parser.add_argument(
+        "--data-dir",
+        type=Path,
+        default=DATA_DIR,
+        help="Directory with {train,valid,test}.jsonl (default: "
+        "training-data/)",
+    )
+    parser.add_argument(
+        "--tokenizer",
+        default=str(settings.model_path),
+        help="Tokenizer path or HF id (default: the configured model_path)",
+    )
+    parser.add_argument(
+        "--max-seq-len",
+        type=int,
+        default=2048,
+        help="Sequence length used for training (default: 2048, as mlx_lm)",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=4,
+        help="Training batch size for the padding estimate (default: 4)",
+    )
+    parser.add_argument(
+        "--bin-width",
+        type=int,
+        default=128,
+        help="Histogram bin width in tokens (default: 128)",
+    )
+    parser.add_argument(
+        "--buckets",
+        type=lambda s: sorted(int(b) for b in s.split(",")),
+        help="Comma-separated bucket upper bounds; writes len-<N>/ dirs",
+    )
+    parser.add_argument(
+        "--tokens-per-batch",
+        type=int,
+        default=8192,
+        help="Token budget used to suggest per-bucket batch sizes "
+        "(default: 8192)",
+    )
+    parser.add_argument(
+        "--pack",
+        action="store_true",
+        help="Write conversations packed up to --max-seq-len as text rows "
+        "(no prompt masking; packed conversations attend to each other)",
+    )
+    parser.add_argument(
+        "--output-dir",
+        type=Path,
+        default=None,
+        help="Where --buckets/--pack write (default: <data-dir>/packed)",
+    )
+    args = parser.parse_args()
+    output_dir = args.output_dir or args.data_dir / "packed"
+
+    tokenizer = load_tokenizer(args.tokenizer)
+    rows, texts, lengths = {}, {}, {}
+    for split in SPLITS:
+        path = args.data_dir / f"{split}.jsonl"
+        lines = read_rows(path) if path.exists() else []
+        lengths[split], texts[split] = token_lengths(tokenizer, lines)
+        rows[split] = (lines, lengths[split])
+
+    for split in SPLITS:
+        values = lengths[split]
+        if not values:
+            print(f"\n{split}: no rows")
+            continue
+        over = sum(n > args.max_seq_len for n in values)
+        print(
+            f"\n{split}: {len(values)} conversations, {sum(values):,} tokens; "
+            f"p50 {statistics.median(values):.0f}, max {max(values)}, "
+            f"{over} over --max-seq-len {args.max_seq_len}"
+        )
+        print(histogram(values, args.bin_width))
+
+    train = lengths["train"]
+    if len(train) >= args.batch_size:
+        print(
+            f"\nPadding estimate for train at --batch-size {args.batch_size}:"
+        )
+        for label, sort in (("unsorted", False), ("mlx_lm sorted", True)):
+            real, padded = padding_waste(
+                train, args.batch_size, args.max_seq_len, sort
+            )
+            print(
+                f"  {label:<14} {real:,} real / {padded:,} computed tokens "
+                f"({1 - real / padded:.1%} padding)"
+            )
+
+    if args.buckets:
+        print(f"\nWriting length buckets to {output_dir}:")
+        dropped = write_buckets(
+            output_dir, rows, args.buckets, args.tokens_per_batch
+        )
+        if any(dropped.values()):
+            print(
+                f"  left out {dropped['train']} train and {dropped['valid']} "
+                f"valid rows longer than the largest bucket "
+                f"({args.buckets[-1]})"
+            )
+    if args.pack:
+        print(
+            f"\nWriting packed rows to {output_dir} (text rows: the loss "
+            "covers prompts and packed conversations attend to each other):"
+        )
+        packed = write_packed(
+            output_dir, texts, lengths, args.data_dir, args.max_seq_len
+        )
+        if len(packed["train"]) >= args.batch_size:
+            real, padded = padding_waste(
+                packed["train"], args.batch_size, args.max_seq_len
+            )
+            print(
+                f"  packed train: {real:,} real / {padded:,} computed tokens "
+                f"({1 - real / padded:.1%} padding)"
+            )
+
+
+if __name__ == "__main__":
+    main()
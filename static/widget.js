@@ -0,0 +1,174 @@
+// Intake chat widget: one WebSocket to /ws/chat for the whole intake.
+//
+// Booking details come from the query string of the post-booking link
+// (Cal.com's forwarded parameters or short aliases). Each message carries
+// a message_id; if the connection drops mid-turn the widget reconnects to
+// the same session and resends it, and the server answers from the turn
+// already in flight instead of generating a second reply.
+(() => {
+    "use strict";
+
+    const params = new URLSearchParams(location.search);
+    const booking = {
+        visitor_name: params.get("name") || params.get("attendeeName"),
+        booking_ref: params.get("booking") || params.get("uid"),
+        appointment_datetime: params.get("when") || params.get("startTime"),
+    };
+    const SESSION_KEY = "intake-session:" + (booking.booking_ref || "");
+    const GREETING_OPTIONS = [
+        "SPA 212-T (course help)",
+        "Another course",
+        "Something else (not course-related)",
+    ];
+
+    const log = document.getElementById("log");
+    const form = document.getElementById("form");
+    const input = document.getElementById("input");
+    const send = document.getElementById("send");
+    const status = document.getElementById("status");
+
+    let socket = null;
+    let sessionId = sessionStorage.getItem(SESSION_KEY);
+    let pending = null; // {frame, bubble} awaiting "done"
+    let retryDelay = 500;
+    let finished = false;
+
+    function newId() {
+        if (crypto.randomUUID) return crypto.randomUUID();
+        return Date.now().toString(36) + Math.random().toString(36).slice(2);
+    }
+
+    function bubble(role, text) {
+        const item = document.createElement("li");
+        item.className = "msg msg-" + role;
+        item.textContent = text;
+        log.appendChild(item);
+        item.scrollIntoView({ block: "end" });
+        return item;
+    }
+
+    // Menu replies list choices as "- option" lines; offer them as taps.
+    function showOptions(reply) {
+        const options = reply
+            .split("\n")
+            .map((line) => line.match(/^\s*[-•]\s+(.+)$/))
+            .filter(Boolean)
+            .map((match) => match[1].trim());
+        if (!options.length || finished) return;
+        const row = document.createElement("li");
+        row.className = "options";
+        for (const option of options) {
+            const button = document.createElement("button");
+            button.type = "button";
+            button.textContent = option;
+            button.addEventListener("click", () => submit(option));
+            row.appendChild(button);
+        }
+        log.appendChild(row);
+        row.scrollIntoView({ block: "end" });
+    }
+
+    function clearOptions() {
+        for (const row of log.querySelectorAll(".options")) row.remove();
+    }
+
+    function setBusy(busy) {
+        send.disabled = busy || finished;
+        input.disabled = finished;
+    }
+
+    function connect() {
+        const scheme = location.protocol === "https:" ? "wss:" : "ws:";
+        const query = sessionId
+            ? "?session_id=" + encodeURIComponent(sessionId)
+            : "";
+        socket = new WebSocket(scheme + "//" + location.host + "/ws/chat" + query);
+        socket.addEventListener("open", () => {
+            status.textContent = "";
+            retryDelay = 500;
+            if (pending) socket.send(JSON.stringify(pending.frame));
+        });
+        socket.addEventListener("message", (event) => receive(JSON.parse(event.data)));
+        socket.addEventListener("close", (event) => {
+            if (finished) return;
+            if (event.code === 1008) {
+                // The stored session's intake is already closed.
+                sessionId = null;
+                sessionStorage.removeItem(SESSION_KEY);
+            }
+            status.textContent = "Reconnecting…";
+            setTimeout(connect, retryDelay);
+            retryDelay = Math.min(retryDelay * 2, 8000);
+        });
+    }
+
+    function receive(event) {
+        if (event.event === "session") {
+            sessionId = event.session_id;
+            sessionStorage.setItem(SESSION_KEY, sessionId);
+            return;
+        }
+        if (!pending) return;
+        const item = pending.bubble;
+        if (event.event === "token") {
+            item.classList.remove("msg-pending");
+            item.textContent += event.text;
+            item.scrollIntoView({ block: "end" });
+        } else if (event.event === "done") {
+            item.classList.remove("msg-pending");
+            item.textContent = event.reply;
+            pending = null;
+            if (event.summary) {
+                finished = true;
+                sessionStorage.removeItem(SESSION_KEY);
+                status.textContent = "Intake complete. See you soon!";
+                socket.close();
+            }
+            setBusy(false);
+            showOptions(event.reply);
+        } else if (event.event === "error") {
+            item.classList.remove("msg-pending");
+            item.classList.add("msg-error");
+            item.textContent = "Sorry, something went wrong. Please try again.";
+            pending = null;
+            setBusy(false);
+        }
+    }
+
+    function submit(text) {
+        text = text.trim();
+        if (!text || pending || finished) return;
+        clearOptions();
+        bubble("user", text);
+        const frame = { message: text, message_id: newId(), ...booking };
+        pending = { frame, bubble: bubble("bot", "") };
+        pending.bubble.classList.add("msg-pending");
+        setBusy(true);
+        if (socket && socket.readyState === WebSocket.OPEN) {
+            socket.send(JSON.stringify(frame));
+        }
+    }
+
+    form.addEventListener("submit", (event) => {
+        event.preventDefault();
+        submit(input.value);
+        input.value = "";
+    });
+    input.addEventListener("keydown", (event) => {
+        if (event.key === "Enter" && !event.shiftKey) {
+            event.preventDefault();
+            form.requestSubmit();
+        }
+    });
+
+    const name = booking.visitor_name ? " " + booking.visitor_name : "";
+    const greeting =
+        "Hi" + name + "! I'm here to help you prepare for your appointment " +
+        "with Dr. Francom. To get started, what brings you in?\n" +
+        GREETING_OPTIONS.map((option) => "- " + option).join("\n");
+    if (!sessionId) {
+        bubble("bot", greeting);
+        showOptions(greeting);
+    }
+    connect();
+})();
@@ -1,10 +1,46 @@
 from pathlib import Path
+from types import SimpleNamespace
 from unittest.mock import patch
 
 import pytest
 from fastapi.testclient import TestClient
 
 
+def fake_stream_generate(text: str):
+    """Return a stand-in for mlx_lm.stream_generate yielding ``text``."""
+
+    def stream(model, tokenizer, prompt, **kwargs):
+        words = text.split(" ")
+        for i, word in enumerate(words):
+            yield SimpleNamespace(
+                text=word if i == 0 else " " + word,
+                prompt_tokens=len(prompt),
+                prompt_tps=1000.0,
+                generation_tokens=i + 1,
+                generation_tps=50.0,
+                finish_reason="stop" if i == len(words) - 1 else None,
+            )
+
+    return stream
+
+
+@pytest.fixture(autouse=True)
+def empty_response_cache():
+    """Keep memoized replies from leaking between tests."""
+    from app.response_cache import get_response_cache
+
+    get_response_cache().clear()
+
+
+@pytest.fixture(autouse=True)
+def isolated_embedding_cache(tmp_path: Path):
+    """Give each test its own on-disk chunk-embedding cache."""
+    from app.config import settings
+
+    with patch.object(settings, "embed_cache_path", tmp_path / "embed.db"):
+        yield
+
+
 @pytest.fixture
 def client():
     with patch("app.chat.get_model") as mock_get_model:
@@ -14,6 +50,7 @@ def client():
             (),
             {
                 "apply_chat_template": (lambda self, msgs, **kw: "mock prompt"),
+                "encode": lambda self, text, **kw: [1, 2, 3],
             },
         )()
         mock_get_model.return_value = (mock_model, mock_tokenizer)
@@ -0,0 +1,158 @@
+import json
+from unittest.mock import patch
+
+import mlx.core as mx
+import mlx.nn as nn
+import pytest
+
+from app.adapters import BASE, AdapterRegistry, AdapterRouter
+from app.config import settings
+
+
+class Block(nn.Module):
+    def __init__(self):
+        super().__init__()
+        self.proj = nn.Linear(4, 4, bias=False)
+
+    def __call__(self, x):
+        return self.proj(x)
+
+
+class TinyModel(nn.Module):
+    def __init__(self):
+        super().__init__()
+        self.layers = [Block()]
+
+    def __call__(self, x):
+        for layer in self.layers:
+            x = layer(x)
+        return x
+
+
+def write_adapter(path, value: float, rank: int = 2):
+    path.mkdir()
+    config = {
+        "fine_tune_type": "lora",
+        "num_layers": 1,
+        "lora_parameters": {"rank": rank, "scale": 1.0, "dropout": 0.5},
+    }
+    (path / "adapter_config.json").write_text(json.dumps(config))
+    mx.save_safetensors(
+        str(path / "adapters.safetensors"),
+        {
+            "layers.0.proj.lora_a": mx.full((4, rank), value),
+            "layers.0.proj.lora_b": mx.full((rank, 4), value),
+        },
+    )
+    return path
+
+
+@pytest.fixture
+def model():
+    model = TinyModel()
+    model.eval()
+    return model
+
+
+def test_activate_switches_adapters_in_place(model, tmp_path):
+    x = mx.ones((1, 4))
+    base = model(x)
+    registry = AdapterRegistry()
+    registry.load("a", write_adapter(tmp_path / "a", 0.5))
+    registry.load("b", write_adapter(tmp_path / "b", 1.0))
+
+    registry.activate(model, "a")
+    with_a = model(x)
+    # Dropout would make these differ if the LoRA layers were training.
+    assert mx.array_equal(model(x), with_a)
+    assert not mx.allclose(with_a, base)
+
+    registry.activate(model, "b")
+    assert not mx.allclose(model(x), with_a)
+
+    registry.activate(model, BASE)
+    assert mx.allclose(model(x), base)
+    registry.activate(model, "a")
+    assert mx.allclose(model(x), with_a)
+
+
+def test_unloaded_adapter_falls_back_to_base(model, tmp_path):
+    x = mx.ones((1, 4))
+    base = model(x)
+    registry = AdapterRegistry()
+    registry.load("a", write_adapter(tmp_path / "a", 0.5))
+    registry.activate(model, "a")
+    registry.unload("a")
+
+    registry.activate(model, "a")
+    assert registry.active == BASE
+    assert mx.allclose(model(x), base)
+
+
+def test_adapter_that_does_not_fit_is_rejected(model, tmp_path):
+    x = mx.ones((1, 4))
+    base = model(x)
+    path = write_adapter(tmp_path / "bad", 0.5)
+    mx.save_safetensors(
+        str(path / "adapters.safetensors"),
+        {"layers.0.missing.lora_a": mx.zeros((4, 2))},
+    )
+    registry = AdapterRegistry()
+    registry.load("bad", path)
+    with pytest.raises(ValueError, match="does not fit"):
+        registry.activate(model, "bad")
+    assert registry.active == BASE
+    assert mx.allclose(model(x), base)
+
+
+def test_router_splits_by_weight_and_is_sticky():
+    router = AdapterRouter({"a": 3, "b": 1})
+    sessions = [f"session-{i}" for i in range(2000)]
+    routes = {s: router.route(s) for s in sessions}
+    share = sum(r == "a" for r in routes.values()) / len(sessions)
+    assert 0.7 < share < 0.8
+
+    router.set_weights({"a": 1, "b": 3})
+    assert all(router.route(s) == routes[s] for s in sessions)
+
+    # Retiring an adapter moves only its sessions.
+    router.set_weights({"a": 1})
+    assert {router.route(s) for s in sessions} == {"a"}
+
+
+def test_chat_routes_session_to_its_adapter(client):
+    router = AdapterRouter({"v2": 1})
+    with (
+        patch("app.chat.get_router", return_value=router),
+        patch("app.chat._generate", return_value="Hola!") as generate,
+    ):
+        data = client.post("/chat", json={"message": "Hi"}).json()
+    assert generate.call_args.args[4] == "v2"
+    assert router.route(data["session_id"]) == "v2"
+
+
+def test_admin_loads_and_routes_adapter(client, tmp_path, model):
+    registry = AdapterRegistry()
+    router = AdapterRouter()
+    headers = {"X-Admin-Token": "secret"}
+    with (
+        patch.object(settings, "admin_token", "secret"),
+        patch("app.admin.get_registry", return_value=registry),
+        patch("app.admin.get_router", return_value=router),
+    ):
+        path = write_adapter(tmp_path / "v2", 0.5)
+        status = client.post(
+            "/admin/adapters",
+            json={"name": "v2", "path": str(path), "weight": 1},
+            headers=headers,
+        ).json()
+        assert status["weights"] == {BASE: 1.0, "v2": 1}
+        missing = client.put(
+            "/admin/adapters/weights",
+            json={"weights": {"v3": 1}},
+            headers=headers,
+        )
+        assert missing.status_code == 400
+        status = client.delete("/admin/adapters/v2", headers=headers).json()
+    assert status["adapters"] == {}
+    assert status["weights"] == {BASE: 1.0}
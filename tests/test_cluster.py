@@ -0,0 +1,171 @@
+import json
+from unittest.mock import patch
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+import app.cluster as cluster
+from app.cluster import NoNodeAvailable, SessionRouter
+from app.config import settings
+from app.sessions import get_store
+
+NODES = ["http://a:8000", "http://b:8000", "http://c:8000"]
+
+
+def test_failover_moves_only_the_failed_nodes_sessions():
+    router = SessionRouter(NODES)
+    sessions = [f"s{i}" for i in range(300)]
+    before = {s: router.place(s)[0].url for s in sessions}
+    assert set(before.values()) == set(NODES)
+
+    down = router.nodes["http://b:8000"]
+    router.mark_down(down)
+    for s in sessions:
+        node, previous = router.place(s)
+        if before[s] == down.url:
+            assert previous is down and node is not down
+        else:
+            assert (node.url, previous) == (before[s], None)
+
+    # Sessions stay on their failover node when b comes back.
+    router.update(down, {"open_sessions": 0})
+    assert all(router.place(s)[0].url != down.url for s in sessions)
+
+
+def test_retried_first_message_gets_the_same_session_id():
+    router = SessionRouter(NODES)
+    assigned = router.assign("m-1")
+    assert router.assign("m-1") == assigned
+    assert router.assign("m-2") != assigned
+    assert router.assign(None) != router.assign(None)
+
+
+def test_draining_node_keeps_sessions_but_gets_no_new_ones():
+    router = SessionRouter(NODES[:2])
+    kept = next(
+        s for s in map(str, range(100)) if router.place(s)[0].url == NODES[0]
+    )
+    node = router.nodes[NODES[0]]
+    node.draining = True
+    assert router.place(kept)[0] is node
+    assert all(router.place(f"new{i}")[0] is not node for i in range(50))
+    assert not router.status()[NODES[0]]["drained"]
+
+    router.record(kept, "bye", "Summary sent", closed=True)
+    assert router.status()[NODES[0]]["drained"]
+
+    router.nodes[NODES[1]].draining = True
+    with pytest.raises(NoNodeAvailable):
+        router.place("another")
+
+
+def test_health_polls_set_load_and_liveness():
+    router = SessionRouter(NODES[:1], max_failures=2)
+    node = router.nodes[NODES[0]]
+    router.update(
+        node,
+        {
+            "open_sessions": 4,
+            "inference_queue": {
+                "running": "chat",
+                "queue_depth": {"interactive": 2, "background": 1},
+            },
+        },
+    )
+    assert (node.load, node.open_sessions) == (4, 4)
+    router.update(node, None)
+    assert node.healthy
+    router.update(node, None)
+    assert not node.healthy
+
+
+def test_overloaded_node_is_skipped_for_new_sessions():
+    router = SessionRouter(NODES[:2], max_load=4)
+    first = router.place("s")[0]
+    first.load = 4
+    router.record("s", "hi", "hello", closed=True)
+    assert router.place("s")[0] is not first
+
+
+def test_router_fails_over_and_seeds_the_transcript(monkeypatch):
+    down: set[str] = set()
+    calls = []
+    seeded = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        host = request.url.host
+        body = json.loads(request.content) if request.content else None
+        calls.append((host, request.method, request.url.path, body))
+        if host in down:
+            raise httpx.ConnectError("connection refused")
+        if request.method == "PUT" and (
+            request.headers.get("X-Admin-Token") != "secret"
+        ):
+            return httpx.Response(403, json={"detail": "Admin API disabled"})
+        if request.method == "PUT":
+            seeded.append(request.url.path)
+        if request.url.path == "/chat":
+            return httpx.Response(
+                200,
+                json={
+                    "reply": f"reply from {host}",
+                    "session_id": body["session_id"],
+                    "summary": None,
+                },
+                headers={"X-Trace-Id": "trace-1"},
+            )
+        return httpx.Response(200, json={"turns": 1})
+
+    monkeypatch.setattr(cluster, "_router", SessionRouter(NODES))
+    monkeypatch.setattr(settings, "admin_token", "secret")
+    monkeypatch.setattr(
+        cluster,
+        "_client",
+        httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+    )
+    client = TestClient(cluster.app)
+
+    first = client.post("/chat", json={"message": "SPA 212"})
+    session_id = first.json()["session_id"]
+    home = first.headers["X-Intake-Node"]
+    assert first.headers["X-Trace-Id"] == "trace-1"
+
+    down.add(httpx.URL(home).host)
+    second = client.post(
+        "/chat", json={"message": "Grammar", "session_id": session_id}
+    )
+    assert second.status_code == 200
+    assert second.headers["X-Intake-Node"] != home
+    seed = next(c for c in calls if c[1] == "PUT")
+    assert seed[2] == f"/admin/sessions/{session_id}"
+    assert seeded == [seed[2]]
+    assert seed[3]["messages"] == [
+        {"role": "user", "content": "SPA 212"},
+        {"role": "assistant", "content": f"reply from {httpx.URL(home).host}"},
+    ]
+    assert client.get("/health").json()["nodes"][home]["healthy"] is False
+
+
+def test_router_refuses_to_start_without_admin_token(monkeypatch):
+    """With default settings every failover seed would get a 403."""
+    monkeypatch.setattr(cluster, "_router", SessionRouter(NODES))
+    assert settings.admin_token is None
+    with pytest.raises(RuntimeError, match="INTAKE_BOT_ADMIN_TOKEN"):
+        with TestClient(cluster.app):
+            pass
+
+
+def test_node_accepts_seeded_session(client):
+    messages = [
+        {"role": "user", "content": "SPA 212-T"},
+        {"role": "assistant", "content": "What area do you need help with?"},
+    ]
+    with patch.object(settings, "admin_token", "secret"):
+        response = client.put(
+            "/admin/sessions/moved-1",
+            json={"messages": messages},
+            headers={"X-Admin-Token": "secret"},
+        )
+    assert response.json() == {"session_id": "moved-1", "turns": 1}
+    assert get_store().get_or_create("moved-1").messages == messages
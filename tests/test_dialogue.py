@@ -0,0 +1,192 @@
+from datetime import datetime, timezone
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+
+from app.dialogue import DialogueState, build_summary, parse_free_text
+from app.sessions import SessionStore
+from app.summary import CourseType
+from tests.conftest import fake_stream_generate
+
+GREETING = (
+    "Hi Alex! What brings you in today?\n\n1. SPA 212-T (course help)\n"
+    "2. Another course\n3. Something else (not course-related)"
+)
+SPA_CONVERSATION = [
+    {"role": "assistant", "content": GREETING},
+    {"role": "user", "content": "1"},
+    {"role": "assistant", "content": "What area do you need help with?"},
+    {"role": "user", "content": "I need help with grammar"},
+    {"role": "assistant", "content": "Which grammar topic is it?"},
+    {"role": "user", "content": "I keep mixing up ser and estar"},
+    {
+        "role": "assistant",
+        "content": "Is there a specific assignment or exercise connected?",
+    },
+    {"role": "user", "content": "ED 8"},
+    {
+        "role": "assistant",
+        "content": "Are you totally lost, struggling, mostly okay?",
+    },
+    {"role": "user", "content": "Struggling, I guess"},
+    {
+        "role": "assistant",
+        "content": "You're working on ser estar for ED 8, and you're "
+        "feeling struggling. Does that sound right?",
+    },
+    {"role": "user", "content": "Yes, that sounds right!"},
+]
+
+
+def test_state_tracks_menu_answers():
+    state = DialogueState.from_messages(SPA_CONVERSATION)
+    assert state.course is CourseType.spa_212
+    assert state.issue_category == "grammar"
+    assert state.issue_subcategory == "ser_estar"
+    assert state.specific_artifact == "ED 8"
+    assert state.student_self_assessment == "struggling"
+    assert state.turn_count == 6
+    assert state.ready_to_close(max_turns=10)
+
+
+def test_correction_keeps_the_intake_open():
+    messages = SPA_CONVERSATION[:-1] + [
+        {"role": "user", "content": "Not quite, it's actually ED 10"}
+    ]
+    state = DialogueState.from_messages(messages)
+    assert not state.confirmed
+    assert not state.ready_to_close(max_turns=10)
+
+
+def test_non_course_flow_has_no_course_slots():
+    state = DialogueState.from_messages(
+        [
+            {"role": "assistant", "content": GREETING},
+            {"role": "user", "content": "Something else"},
+            {
+                "role": "assistant",
+                "content": "Can you give me a brief idea of what "
+                "you'd like to discuss?",
+            },
+            {"role": "user", "content": "A research collaboration."},
+            {
+                "role": "assistant",
+                "content": "Anything you'd like Dr. Francom to have ready "
+                "or review beforehand?",
+            },
+            {"role": "user", "content": "Nothing specific, thanks."},
+        ]
+    )
+    assert state.course is CourseType.non_course
+    assert state.issue_category == "general"
+    assert state.ready_to_close(max_turns=10)
+    summary = build_summary(
+        state,
+        session_id="sess-1",
+        booking_ref="cal-1",
+        appointment_datetime=datetime(2026, 3, 5, 14, tzinfo=timezone.utc),
+        issue_description="Wants to discuss a research collaboration.",
+        professor_prep_note="No preparation needed.",
+    )
+    assert summary.student_self_assessment is None
+    assert summary.specific_artifact is None
+    assert summary.turn_count == 3
+
+
+def test_parse_free_text_reads_fields_and_falls_back():
+    state = DialogueState.from_messages(SPA_CONVERSATION)
+    description, note = parse_free_text(
+        '{"issue_description": "Mixes up ser and estar.", '
+        '"professor_prep_note": "Bring examples.",}',
+        state,
+    )
+    assert (description, note) == ("Mixes up ser and estar.", "Bring examples.")
+
+    description, note = parse_free_text('{"issue_description": ""}', state)
+    assert description == "I keep mixing up ser and estar"
+    assert note == "Prepare for a ser estar discussion."
+
+
+def test_chat_fills_summary_from_dialogue_state():
+    seen = []
+
+    def apply_chat_template(self, msgs, **kw):
+        seen.append(msgs)
+        return "mock prompt"
+
+    mock_tokenizer = type(
+        "MockTokenizer",
+        (),
+        {
+            "apply_chat_template": apply_chat_template,
+            "encode": lambda self, text, **kw: [1, 2, 3],
+        },
+    )()
+    store = SessionStore()
+    session = store.get_or_create(None)
+    for message in SPA_CONVERSATION[:-1]:
+        store.append(session, message["role"], message["content"])
+    fields = (
+        '{"issue_description": "Confuses ser and estar in ED 8.", '
+        '"professor_prep_note": "Bring ser/estar contrasts."}'
+    )
+
+    with (
+        patch(
+            "app.chat.get_model",
+            return_value=(type("MockModel", (), {})(), mock_tokenizer),
+        ),
+        patch(
+            "app.chat.stream_generate",
+            side_effect=fake_stream_generate(fields),
+        ),
+        patch("app.sessions._store", store),
+    ):
+        from app.main import app
+
+        client = TestClient(app)
+        data = client.post(
+            "/chat",
+            json={
+                "message": "Yes, that sounds right!",
+                "session_id": session.session_id,
+                "booking_ref": "cal-abc123",
+                "appointment_datetime": "2026-03-05T14:00:00Z",
+            },
+        ).json()
+
+    assert seen[-1][-1]["role"] == "system"
+    summary = data["summary"]
+    assert summary["booking_ref"] == "cal-abc123"
+    assert summary["issue_subcategory"] == "ser_estar"
+    assert summary["specific_artifact"] == "ED 8"
+    assert summary["issue_description"] == "Confuses ser and estar in ED 8."
+    assert summary["turn_count"] == 6
+    assert data["reply"].startswith("Thanks for sharing all of that!")
+    assert fields not in data["reply"]
+
+
+def test_closing_turn_closes_the_session(client):
+    """The summary ends the intake; later messages are refused."""
+    store = SessionStore()
+    session = store.get_or_create(None)
+    for message in SPA_CONVERSATION[:-1]:
+        store.append(session, message["role"], message["content"])
+    fields = (
+        '{"issue_description": "Ser vs estar.", "professor_prep_note": "."}'
+    )
+    generate = patch(
+        "app.chat.stream_generate",
+        side_effect=fake_stream_generate(fields),
+    )
+
+    with generate as mock_generate, patch("app.sessions._store", store):
+        body = {"message": "Yes!", "session_id": session.session_id}
+        assert client.post("/chat", json=body).json()["summary"] is not None
+        calls = mock_generate.call_count
+
+        assert session.session_id not in store.sessions
+        for path in ("/chat", "/chat/stream"):
+            response = client.post(path, json={**body, "message": "Hello?"})
+            assert response.status_code == 409
+        assert mock_generate.call_count == calls
@@ -0,0 +1,102 @@
+import functools
+import threading
+import time
+from unittest.mock import patch
+
+from llama_index.core.embeddings import MockEmbedding
+
+import app.rag as rag_module
+from app.embedding import EmbeddingCache, embed_texts, get_embedding_cache
+from app.rag import build_index
+from app.scheduler import BACKGROUND, INTERACTIVE, InferenceScheduler
+
+
+class CountingEmbedding(MockEmbedding):
+    """Mock vectors derived from the text, recording each batch."""
+
+    def _get_text_embeddings(self, texts):
+        self.__dict__.setdefault("batches", []).append(len(texts))
+        return [[float(len(t)), 1.0, 0.0, 0.0] for t in texts]
+
+
+def test_cache_is_keyed_by_model_and_text(tmp_path):
+    cache = EmbeddingCache(tmp_path / "cache.db")
+    cache.put_many("model-a", [("h1", [0.5, 0.25])])
+
+    assert cache.get_many("model-a", ["h1", "h2"]) == {"h1": [0.5, 0.25]}
+    assert cache.get_many("model-b", ["h1"]) == {}
+    # Entries survive reopening.
+    cache.close()
+    assert len(EmbeddingCache(tmp_path / "cache.db")) == 1
+
+
+def test_embed_texts_batches_and_reuses_cached_chunks(tmp_path):
+    cache = EmbeddingCache(tmp_path / "cache.db")
+    model = CountingEmbedding(embed_dim=4, embed_batch_size=100)
+    texts = [f"chunk {i}" for i in range(10)] + ["chunk 0"]
+
+    vectors, cold = embed_texts(texts, model, "m", cache, batch_size=4)
+
+    assert model.batches == [4, 4, 2]
+    assert vectors[0] == vectors[-1] == [7.0, 1.0, 0.0, 0.0]
+    assert (cold.chunks, cold.cached, cold.embedded) == (11, 0, 10)
+
+    again, warm = embed_texts([*texts, "new"], model, "m", cache)
+    assert model.batches == [4, 4, 2, 1]
+    assert again[:11] == vectors
+    assert (warm.cached, warm.embedded) == (11, 1)
+
+
+def test_rebuild_into_new_vector_store_embeds_nothing(
+    tmp_rag_corpus, tmp_path, monkeypatch
+):
+    model = CountingEmbedding(embed_dim=4)
+    monkeypatch.setattr(rag_module, "_index", None)
+    with (
+        patch.object(rag_module.settings, "rag_corpus_path", tmp_rag_corpus),
+        patch("app.rag.get_embed_model", return_value=model),
+    ):
+        for chroma in ("first", "second"):
+            with patch.object(
+                rag_module.settings, "chroma_db_path", tmp_path / chroma
+            ):
+                assert build_index() == 2
+            if chroma == "first":
+                embedded = sum(model.batches)
+                assert embedded == len(get_embedding_cache())
+
+        assert sum(model.batches) == embedded
+        collection = rag_module._index.vector_store._collection
+        assert collection.count() == embedded
+
+
+def test_chat_turns_run_between_embedding_batches():
+    """Each batch takes its own scheduler slot, so chat need not wait."""
+    scheduler = InferenceScheduler()
+    order = []
+    chat = []
+
+    def turn():
+        with scheduler.slot(INTERACTIVE):
+            order.append("chat")
+
+    class RecordingEmbedding(CountingEmbedding):
+        def _get_text_embeddings(self, texts):
+            order.append("batch")
+            if not chat:
+                chat.append(threading.Thread(target=turn))
+                chat[0].start()
+                while not scheduler._waiting:
+                    time.sleep(0.001)
+            return super()._get_text_embeddings(texts)
+
+    model = RecordingEmbedding(embed_dim=4, embed_batch_size=100)
+    embed_texts(
+        [f"chunk {i}" for i in range(6)],
+        model,
+        "m",
+        batch_size=2,
+        batch_slot=functools.partial(scheduler.slot, BACKGROUND),
+    )
+    chat[0].join()
+    assert order == ["batch", "chat", "batch", "batch"]
@@ -0,0 +1,123 @@
+import json
+
+from app.extraction import (
+    SummaryExtractor,
+    extract_many,
+    extract_summary,
+    repair_json,
+)
+from app.summary import IssueCategory, SelfAssessment
+
+SUMMARY = {
+    "session_id": "sess-001",
+    "booking_ref": "cal-abc123",
+    "appointment_datetime": "2026-03-05T14:00:00+00:00",
+    "course": "SPA 212-T",
+    "issue_category": "grammar",
+    "issue_subcategory": "ser_estar",
+    "specific_artifact": "ED 8",
+    "issue_description": "Student confuses ser and estar with locations.",
+    "student_self_assessment": "struggling",
+    "professor_prep_note": "Bring ser/estar contrast examples.",
+    "turn_count": 6,
+    "created_at": "2026-03-05T13:50:00+00:00",
+}
+PROSE = "Thanks! I'll send this to Dr. Francom. See you Thursday!\n\n"
+CLOSING = PROSE + json.dumps(SUMMARY, indent=2)
+
+
+def test_extractor_parses_json_as_it_streams():
+    extractor = SummaryExtractor()
+    chunks = [CLOSING[i : i + 3] for i in range(0, len(CLOSING), 3)]
+    done = [extractor.feed(chunk) for chunk in chunks]
+    # The summary is validated as soon as the closing brace arrives.
+    assert done[-1] and not any(done[:-1])
+    assert extractor.summary is not None
+    result = extractor.finish()
+    assert result.repair is None
+    assert result.prose == PROSE
+    assert result.summary.issue_subcategory == "ser_estar"
+
+
+def test_braces_inside_strings_do_not_end_the_object():
+    data = {**SUMMARY, "issue_description": 'Asked about "{" and "}" in ED 8.'}
+    result = extract_summary(PROSE + json.dumps(data))
+    assert result.summary.issue_description == data["issue_description"]
+
+
+def test_reply_without_json_has_no_summary():
+    result = extract_summary("Which grammar topic is giving you trouble?")
+    assert result.summary is None
+    assert result.raw is None
+
+
+def test_local_repair_fixes_syntax_slips():
+    raw = json.dumps(SUMMARY, indent=2)
+    raw = raw.replace('"ED 8"', "None").replace("6\n}", "6,\n}")
+    result = extract_summary(PROSE + raw)
+    assert result.repair == "local"
+    assert result.summary.specific_artifact is None
+
+
+def test_repair_json_closes_truncated_output():
+    fixed = repair_json('{"a": [1, 2,], "b": None, "c": "unfinished')
+    assert json.loads(fixed) == {"a": [1, 2], "b": None, "c": "unfinished"}
+    assert json.loads(repair_json('{"a": 1, "dangling')) == {"a": 1}
+
+
+def test_field_repair_coerces_near_miss_values():
+    data = {
+        **SUMMARY,
+        "issue_category": "Grammar",
+        "student_self_assessment": "mostly ok",
+        "turn_count": "14",
+    }
+    result = extract_summary(PROSE + json.dumps(data))
+    assert result.repair == "fields"
+    assert result.summary.issue_category is IssueCategory.grammar
+    assert result.summary.student_self_assessment is SelfAssessment.mostly_ok
+    assert result.summary.turn_count == 10
+
+
+def test_redecode_continues_from_valid_prefix():
+    # Truncated before turn_count/created_at: only a re-decode can help.
+    raw = json.dumps(SUMMARY, indent=2)
+    truncated = raw[: raw.index('"turn_count"')]
+    prefixes = []
+
+    def redecode(prefix: str) -> str:
+        prefixes.append(prefix)
+        return '"turn_count": 6, "created_at": "2026-03-05T13:50:00Z"}'
+
+    result = extract_summary(PROSE + truncated, redecode)
+    assert result.repair == "redecode"
+    assert result.summary.turn_count == 6
+    assert result.prose == PROSE
+    (prefix,) = prefixes
+    assert prefix.startswith(PROSE)
+    assert '"professor_prep_note"' in prefix
+
+
+def test_redecode_not_called_when_cheap_repair_works():
+    def redecode(prefix: str) -> str:
+        raise AssertionError("re-decode should not run")
+
+    raw = json.dumps(SUMMARY).replace('"grammar"', '"GRAMMAR"')
+    assert extract_summary(raw, redecode).repair == "fields"
+
+
+def test_extract_many_validates_in_bulk_and_isolates_failures():
+    texts = [
+        CLOSING,
+        "No summary here.",
+        PROSE + json.dumps({**SUMMARY, "course": "Grammar 101"}),
+        CLOSING.replace("sess-001", "sess-002"),
+    ]
+    results = extract_many(texts)
+    assert [r.summary is not None for r in results] == [
+        True,
+        False,
+        False,
+        True,
+    ]
+    assert results[3].summary.session_id == "sess-002"
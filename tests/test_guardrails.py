@@ -0,0 +1,138 @@
+import json
+import re
+import time
+import zlib
+from pathlib import Path
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+from app.dialogue import DialogueState
+from app.guardrails import (
+    DISTRESS_REPLY,
+    KEYWORDS,
+    OFF_TOPIC_REPLY,
+    PROTOTYPES,
+    KeywordAutomaton,
+    PrototypeClassifier,
+    normalize,
+    screen,
+)
+from app.summary import CourseType
+
+TEST_DATA = Path("training-data/test.jsonl")
+
+CRISIS = [
+    "honestly I want to die, nothing is working",
+    "I've been thinking about suicide lately",
+    "I keep wanting to hurt myself",
+]
+DISTRESS = [
+    "I had a panic attack during the last exam",
+    "My grandmother passed away last week and I can't focus",
+    "I can’t cope with everything going on right now",
+]
+
+
+def user_messages() -> list[str]:
+    with open(TEST_DATA) as f:
+        return [
+            m["content"]
+            for line in f
+            for m in json.loads(line)["messages"]
+            if m["role"] == "user"
+        ]
+
+
+def test_automaton_finds_overlapping_phrases_at_word_bounds():
+    automaton = KeywordAutomaton({"he": "a", "she": "b", "hers": "c"})
+    found = {(m.phrase, m.start) for m in automaton.search("ushers she he")}
+    # "ushers" contains all three, but not at word boundaries.
+    assert found == {("she", 7), ("he", 11)}
+
+
+def test_keywords_catch_crisis_and_distress():
+    state = DialogueState()
+    assert {screen(m, state, []).route for m in CRISIS} == {"crisis"}
+    assert {screen(m, state, []).route for m in DISTRESS} == {"distress"}
+
+
+def test_keywords_never_fire_on_intake_answers():
+    messages = user_messages() + [
+        "I'm totally lost and struggling with the subjunctive",
+        "This exam is killing me, I need help with preterite",
+        "I'm stressed about Escritura II",
+        "I'd like to skill myself up on vocab",
+    ]
+    flagged = [m for m in messages if KEYWORDS.search(normalize(m))]
+    assert flagged == []
+
+
+def test_keyword_stage_is_fast():
+    messages = user_messages() * 20
+    start = time.perf_counter()
+    for message in messages:
+        KEYWORDS.search(normalize(message))
+    per_message = (time.perf_counter() - start) / len(messages)
+    assert per_message < 1e-3
+
+
+class BagOfWordsEmbedding:
+    """Deterministic stand-in for the MiniLM model: hashed word counts."""
+
+    def _embed(self, text: str) -> list[float]:
+        vector = np.zeros(256)
+        for word in re.findall(r"[a-z']+", text.lower()):
+            vector[zlib.crc32(word.encode()) % 256] += 1
+        return vector.tolist()
+
+    def get_text_embedding_batch(self, texts):
+        return [self._embed(t) for t in texts]
+
+    def get_query_embedding(self, text):
+        return self._embed(text)
+
+
+@pytest.fixture
+def embedding_stage():
+    embed_model = BagOfWordsEmbedding()
+    classifier = PrototypeClassifier(embed_model, PROTOTYPES)
+    with (
+        patch("app.guardrails.get_classifier", return_value=classifier),
+        patch("app.rag.get_embed_model", return_value=embed_model),
+    ):
+        yield
+
+
+def test_classifier_redirects_off_topic_once(embedding_stage):
+    state = DialogueState(course=CourseType.spa_212)
+    message = "Can you recommend a good restaurant near campus?"
+    screening = screen(message, state, [])
+    assert screening.route == "off_topic"
+    assert screening.reply == OFF_TOPIC_REPLY
+    assert screening.embedding is not None
+
+    history = [{"role": "assistant", "content": OFF_TOPIC_REPLY}]
+    assert screen(message, state, history).route is None
+    # Non-course visitors can bring up anything.
+    non_course = DialogueState(course=CourseType.non_course)
+    assert screen(message, non_course, []).route is None
+
+
+def test_classifier_passes_course_questions(embedding_stage):
+    state = DialogueState(course=CourseType.spa_212)
+    for message in user_messages():
+        assert screen(message, state, []).route is None, message
+
+
+def test_chat_answers_distress_without_generation(client):
+    with patch("app.chat._generate", side_effect=AssertionError):
+        data = client.post(
+            "/chat", json={"message": "I had a panic attack last night"}
+        ).json()
+    assert data["reply"] == DISTRESS_REPLY
+    state = DialogueState.from_messages(
+        [{"role": "assistant", "content": data["reply"]}]
+    )
+    assert state.concern
@@ -0,0 +1,127 @@
+import asyncio
+from unittest.mock import patch
+
+import pytest
+
+from app.chat import _generate
+from app.inflight import CancelToken, GenerationCancelled, InflightTurns
+from app.metrics import (
+    CANCELLED_GENERATIONS,
+    DEDUPLICATED_TURNS,
+    GENERATION_SECONDS_SAVED,
+)
+from app.sessions import get_store
+from tests.conftest import fake_stream_generate
+
+
+def test_generation_stops_when_token_is_cancelled():
+    token = CancelToken()
+    seen = []
+
+    def on_text(text):
+        seen.append(text)
+        if len(seen) == 2:
+            token.cancel()
+
+    before = CANCELLED_GENERATIONS.value("decode")
+    with patch(
+        "app.chat.stream_generate",
+        side_effect=fake_stream_generate("one two three four five six"),
+    ):
+        with pytest.raises(GenerationCancelled):
+            _generate(object(), None, [1, 2, 3], on_text, cancel=token)
+    assert seen == ["one", " two"]
+    assert CANCELLED_GENERATIONS.value("decode") == before + 1
+
+
+def test_retry_attaches_to_turn_in_flight():
+    turns = InflightTurns()
+    calls = []
+
+    async def start(token):
+        calls.append(token)
+        await asyncio.sleep(0.01)
+        return "reply"
+
+    async def main():
+        return await asyncio.gather(
+            turns.run("s:1", start), turns.run("s:1", start)
+        )
+
+    before = DEDUPLICATED_TURNS.value("in_flight")
+    saved = GENERATION_SECONDS_SAVED.value("deduplicated")
+    assert asyncio.run(main()) == ["reply", "reply"]
+    assert len(calls) == 1
+    assert DEDUPLICATED_TURNS.value("in_flight") == before + 1
+    assert GENERATION_SECONDS_SAVED.value("deduplicated") > saved
+    assert len(turns) == 0
+
+
+def test_turn_is_cancelled_once_every_waiter_leaves():
+    turns = InflightTurns()
+    tokens = []
+
+    async def start(token):
+        tokens.append(token)
+        while not token.cancelled:
+            await asyncio.sleep(0.001)
+        raise GenerationCancelled
+
+    async def main():
+        first = asyncio.ensure_future(turns.run("s:1", start))
+        retry = asyncio.ensure_future(turns.run("s:1", start))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        await asyncio.sleep(0.01)
+        assert not tokens[0].cancelled
+        retry.cancel()
+        await asyncio.sleep(0.01)
+        assert tokens[0].cancelled
+        # A later retry starts a fresh turn.
+        again = asyncio.ensure_future(turns.run("s:1", start))
+        await asyncio.sleep(0.01)
+        assert len(tokens) == 2
+        again.cancel()
+        await asyncio.sleep(0.01)
+
+    asyncio.run(main())
+
+
+def test_resubmitted_message_id_returns_same_reply(client):
+    with patch(
+        "app.chat.stream_generate",
+        side_effect=fake_stream_generate("Which course?"),
+    ) as generate:
+        first = client.post(
+            "/chat", json={"message": "Hola", "message_id": "m-1"}
+        ).json()
+        retry = client.post(
+            "/chat",
+            json={
+                "message": "Hola",
+                "message_id": "m-1",
+                "session_id": first["session_id"],
+            },
+        ).json()
+    assert retry == first
+    assert generate.call_count == 1
+    session = get_store().get_or_create(first["session_id"])
+    assert session.turn_count == 1
+
+
+def test_retried_first_message_without_session_id_is_deduplicated(client):
+    """A first message resent before its session id arrived is not rerun."""
+    with patch(
+        "app.chat.stream_generate",
+        side_effect=fake_stream_generate("Which course?"),
+    ) as generate:
+        first = client.post(
+            "/chat", json={"message": "Hola", "message_id": "m-first"}
+        ).json()
+        retry = client.post(
+            "/chat", json={"message": "Hola", "message_id": "m-first"}
+        ).json()
+    assert retry == first
+    assert generate.call_count == 1
+    session = get_store().get_or_create(first["session_id"])
+    assert session.turn_count == 1
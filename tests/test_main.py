@@ -1,8 +1,11 @@
+import json
 from unittest.mock import patch
 
 from fastapi.testclient import TestClient
 
 from app.main import app
+from app.sessions import get_store
+from tests.conftest import fake_stream_generate
 
 
 def test_health_returns_ok():
@@ -22,7 +25,10 @@ def test_static_files_served():
     assert "Office Hours Intake" in response.text
 
 
-@patch("app.chat.generate", return_value="This is a test reply.")
+@patch(
+    "app.chat.stream_generate",
+    side_effect=fake_stream_generate("This is a test reply."),
+)
 @patch("app.chat.get_model")
 def test_chat_returns_reply(mock_get_model, mock_generate):
     mock_tokenizer = type(
@@ -30,6 +36,7 @@ def test_chat_returns_reply(mock_get_model, mock_generate):
         (),
         {
             "apply_chat_template": lambda self, msgs, **kw: "mock prompt",
+            "encode": lambda self, text, **kw: [1, 2, 3],
         },
     )()
     mock_model = type("MockModel", (), {})()
@@ -49,3 +56,153 @@ def test_chat_503_when_model_missing(mock_get_model):
     client = TestClient(app)
     response = client.post("/chat", json={"message": "hello"})
     assert response.status_code == 503
+
+
+@patch(
+    "app.chat.stream_generate",
+    side_effect=fake_stream_generate("Hola, welcome!"),
+)
+@patch("app.chat.get_model")
+def test_metrics_exposes_stage_histograms(mock_get_model, mock_generate):
+    mock_tokenizer = type(
+        "MockTokenizer",
+        (),
+        {
+            "apply_chat_template": lambda self, msgs, **kw: "mock prompt",
+            "encode": lambda self, text, **kw: [1, 2, 3],
+        },
+    )()
+    mock_get_model.return_value = (type("MockModel", (), {})(), mock_tokenizer)
+
+    client = TestClient(app)
+    client.post("/chat", json={"message": "hello"})
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    for stage in ("queue_wait", "prefill", "decode", "tokenization"):
+        assert f'intake_stage_seconds_count{{stage="{stage}"}}' in body
+    assert "intake_request_seconds_count" in body
+    assert 'intake_tokens_total{kind="generated"}' in body
+    assert 'intake_cache_hits_total{cache="system_prompt"}' in body
+
+
+@patch("app.chat.get_model", side_effect=RuntimeError("Model not found"))
+def test_metrics_counts_errors(mock_get_model):
+    from app.metrics import ERRORS
+
+    before = ERRORS.value("model_load")
+    client = TestClient(app)
+    client.post("/chat", json={"message": "hello"})
+    assert ERRORS.value("model_load") == before + 1
+
+
+@patch(
+    "app.chat.stream_generate",
+    side_effect=fake_stream_generate("Which grammar topic?"),
+)
+@patch("app.chat.get_model")
+def test_chat_stream_emits_tokens_then_done(mock_get_model, mock_generate):
+    mock_tokenizer = type(
+        "MockTokenizer",
+        (),
+        {
+            "apply_chat_template": lambda self, msgs, **kw: "mock prompt",
+            "encode": lambda self, text, **kw: [1, 2, 3],
+        },
+    )()
+    mock_get_model.return_value = (type("MockModel", (), {})(), mock_tokenizer)
+
+    client = TestClient(app)
+    response = client.post("/chat/stream", json={"message": "Grammar"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = [
+        (block.split("\n")[0][7:], json.loads(block.split("\n")[1][6:]))
+        for block in response.text.strip().split("\n\n")
+    ]
+    tokens = [data["text"] for name, data in events if name == "token"]
+    assert "".join(tokens) == "Which grammar topic?"
+    name, done = events[-1]
+    assert name == "done"
+    assert done["reply"] == "Which grammar topic?"
+    assert done["session_id"]
+
+
+def test_fake_backend_serves_chat():
+    import app.chat as chat_module
+    from app.config import settings
+
+    with (
+        patch.object(settings, "inference_backend", "fake"),
+        patch.object(settings, "fake_prefill_tps", 1e6),
+        patch.object(settings, "fake_decode_tps", 1e6),
+        patch.object(chat_module, "_model", None),
+        patch.object(chat_module, "_tokenizer", None),
+    ):
+        client = TestClient(app)
+        response = client.post("/chat", json={"message": "SPA 212-T"})
+    assert response.status_code == 200
+    assert len(response.json()["reply"].split()) == settings.fake_reply_tokens
+
+
+# A summary the model writes before the closing turn, cut off early.
+EARLY_SUMMARY = (
+    "Thanks! See you Thursday!\n\n"
+    '{"session_id": "sess-001", "booking_ref": "cal-abc123", '
+    '"course": "SPA 212-T", "issue_category": "grammar"'
+)
+
+
+@patch(
+    "app.chat.stream_generate",
+    side_effect=fake_stream_generate(EARLY_SUMMARY),
+)
+@patch("app.chat.get_model")
+def test_mid_intake_summary_is_not_extracted(mock_get_model, mock_generate):
+    """Only the closing turn has a summary; no repair re-decode runs."""
+    mock_tokenizer = type(
+        "MockTokenizer",
+        (),
+        {
+            "apply_chat_template": lambda self, msgs, **kw: "mock prompt",
+            "encode": lambda self, text, **kw: [1, 2, 3],
+        },
+    )()
+    mock_get_model.return_value = (type("MockModel", (), {})(), mock_tokenizer)
+
+    client = TestClient(app)
+    data = client.post("/chat", json={"message": "That's all"}).json()
+    assert data["reply"] == EARLY_SUMMARY
+    assert data["summary"] is None
+    assert mock_generate.call_count == 1
+
+    response = client.post("/chat/stream", json={"message": "That's all"})
+    done = json.loads(
+        response.text.strip().split("\n\n")[-1].split("\n")[1][6:]
+    )
+    assert done["summary"] is None
+
+
+@patch(
+    "app.chat.stream_generate",
+    side_effect=fake_stream_generate("Which grammar topic?"),
+)
+def test_websocket_streams_turns_over_one_connection(mock_generate, client):
+    with client.websocket_connect("/ws/chat") as ws:
+        opened = ws.receive_json()
+        assert opened["event"] == "session"
+        for message in ("Grammar", "Ser vs estar"):
+            ws.send_json({"message": message, "session_id": "ignored"})
+            events = [ws.receive_json()]
+            while events[-1]["event"] == "token":
+                events.append(ws.receive_json())
+            tokens = [e["text"] for e in events if e["event"] == "token"]
+            assert "".join(tokens) == "Which grammar topic?"
+            assert events[-1]["event"] == "done"
+            assert events[-1]["session_id"] == opened["session_id"]
+
+        ws.send_text("{}")
+        assert ws.receive_json()["event"] == "error"
+    session = get_store().get_or_create(opened["session_id"])
+    assert session.turn_count == 2
@@ -0,0 +1,134 @@
+import asyncio
+import time
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import torch
+from fastapi.testclient import TestClient
+
+import app.rag as rag_module
+from app.config import settings
+from app.main import app
+from app.memory import (
+    Component,
+    MemoryGovernor,
+    get_governor,
+    govern,
+    sizeof,
+)
+from app.metrics import MEMORY_EVICTED_BYTES
+
+
+class Cache:
+    def __init__(self, nbytes: int, log: list[str], name: str):
+        self.nbytes = nbytes
+        self.log = log
+        self.name = name
+
+    def evict(self, nbytes: int) -> int:
+        self.log.append(self.name)
+        freed = min(nbytes, self.nbytes)
+        self.nbytes -= freed
+        return freed
+
+
+def governor_with(budget, log, **caches):
+    governor = MemoryGovernor(budget)
+    for priority, (name, nbytes) in enumerate(caches.items()):
+        cache = Cache(nbytes, log, name)
+        governor.register(
+            Component(
+                name,
+                lambda cache=cache: cache.nbytes,
+                evict=cache.evict,
+                priority=priority,
+            )
+        )
+    return governor
+
+
+def test_sweep_evicts_caches_in_priority_order_down_to_the_budget():
+    log = []
+    governor = governor_with(1000, log, first=300, second=500, third=400)
+
+    assert governor.sweep() == 200
+    assert log == ["first"]
+    assert governor.stats()["resident_bytes"] == 1000
+
+    governor.budget = 500
+    assert governor.sweep() == 500
+    assert log == ["first", "first", "second"]
+    assert governor.stats()["components"] == {
+        "first": 0,
+        "second": 100,
+        "third": 400,
+    }
+    assert governor.stats()["evicted_bytes"] == {"first": 300, "second": 400}
+
+
+def test_sweep_never_evicts_components_without_evict():
+    governor = MemoryGovernor(budget=100)
+    governor.register(Component("weights", lambda: 1000))
+    assert governor.sweep() == 0
+    assert governor.stats()["resident_bytes"] == 1000
+    # Without a budget, a sweep only measures.
+    assert MemoryGovernor().sweep() == 0
+
+
+def test_sizeof_follows_nested_data():
+    messages = [{"role": "user", "content": "x" * 1000}]
+    assert sizeof(messages) > 1000
+    assert sizeof(SimpleNamespace()) < sizeof(messages)
+
+
+def test_idle_embedding_model_is_unloaded_and_freed(monkeypatch):
+    model = SimpleNamespace(_model=torch.nn.Linear(100, 100))
+    monkeypatch.setattr(rag_module, "_embed_model", model)
+    monkeypatch.setattr(
+        rag_module, "_embed_bytes", rag_module._tensor_bytes(model)
+    )
+    monkeypatch.setattr(rag_module, "_embed_used", time.monotonic())
+    before = MEMORY_EVICTED_BYTES.value("embedding_model")
+
+    with patch.object(settings, "embedder_idle_unload", 60.0):
+        assert rag_module.unload_idle_embed_model() == 0
+        monkeypatch.setattr(rag_module, "_embed_used", time.monotonic() - 61)
+        with patch.object(settings, "embedder_idle_unload", None):
+            assert rag_module.unload_idle_embed_model() == 0
+        get_governor().sweep()
+
+    assert rag_module._embed_model is None
+    assert MEMORY_EVICTED_BYTES.value("embedding_model") == before + 40400
+
+
+def test_govern_sweeps_until_stopped():
+    async def run():
+        stop = asyncio.Event()
+        with (
+            patch.object(settings, "memory_sweep_interval", 0.01),
+            patch("app.memory._governor.sweep") as sweep,
+        ):
+            task = asyncio.create_task(govern(stop))
+            await asyncio.sleep(0.1)
+            stop.set()
+            await task
+        return sweep.call_count
+
+    assert asyncio.run(run()) >= 2
+
+
+def test_health_reports_memory_by_component():
+    data = TestClient(app).get("/health").json()
+    memory = data["memory"]
+    assert memory["resident_bytes"] == sum(memory["components"].values())
+    for name in (
+        "model_weights",
+        "kv_caches",
+        "adapters",
+        "embedding_model",
+        "vector_index",
+        "sessions",
+        "response_cache",
+        "remembered_turns",
+    ):
+        assert name in memory["components"]
@@ -0,0 +1,139 @@
+import asyncio
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+
+import app.chat as chat_module
+from app.chat import _generate
+from app.config import settings
+from app.fake_model import FakeTokenizer
+from app.inflight import CancelToken, GenerationCancelled
+from app.ipc import (
+    ModelClient,
+    ModelServerError,
+    RemoteModel,
+    RemoteSessionStore,
+)
+from app.metrics import TOKENS
+from app.model_server import ModelServer
+from app.scheduler import INTERACTIVE, get_scheduler
+from app.sessions import SessionStore
+
+
+@pytest.fixture
+def model_server(tmp_path):
+    """Serve the fake model and a fresh session store on a Unix socket."""
+    path = tmp_path / "model.sock"
+    store = SessionStore()
+    server = ModelServer()
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    with (
+        patch.object(chat_module, "_model", None),
+        patch.object(chat_module, "_tokenizer", None),
+        patch.object(settings, "inference_backend", "fake"),
+        patch.object(settings, "fake_prefill_tps", 1e6),
+        patch.object(settings, "fake_decode_tps", 500.0),
+        patch.object(settings, "fake_reply_tokens", 20),
+        patch("app.sessions._store", store),
+    ):
+        listener = asyncio.run_coroutine_threadsafe(
+            asyncio.start_unix_server(server.handle, path=str(path)), loop
+        ).result()
+        client = ModelClient(path)
+        yield client, store
+        client.close()
+
+        async def stop():
+            server.close()
+            listener.close()
+            await listener.wait_closed()
+            # Let the connection handlers see their sockets close.
+            await asyncio.sleep(0.05)
+
+        asyncio.run_coroutine_threadsafe(stop(), loop).result()
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+
+
+def generate(client, cancel=None, on_text=None):
+    return RemoteModel(client).generate(
+        list(range(12)), on_text, "base", cancel, INTERACTIVE, None
+    )
+
+
+def test_generation_streams_tokens_from_the_model_server(model_server):
+    client, _ = model_server
+    seen = []
+
+    generation = generate(client, on_text=seen.append)
+
+    assert generation.cancelled is None
+    assert generation.text == "".join(seen)
+    assert generation.generation_tokens == len(seen) == 20
+    assert generation.prompt_tokens == 12
+    assert (
+        generation.queued
+        <= generation.granted
+        <= generation.start
+        <= generation.first_token
+        <= generation.end
+    )
+    # The connection goes back to the pool for the next generation.
+    assert generate(client).text == generation.text
+
+
+def test_worker_generate_records_metrics_for_remote_model(model_server):
+    client, _ = model_server
+    before = TOKENS.value("generated")
+
+    text = _generate(RemoteModel(client), FakeTokenizer(), list(range(12)))
+
+    assert len(text.split()) == 20
+    assert TOKENS.value("generated") == before + 20
+
+
+def test_cancelling_stops_the_generation_on_the_server(model_server):
+    client, _ = model_server
+    token = CancelToken()
+
+    def on_text(text):
+        token.cancel()
+
+    with pytest.raises(GenerationCancelled):
+        _generate(
+            RemoteModel(client),
+            FakeTokenizer(),
+            list(range(12)),
+            on_text,
+            cancel=token,
+        )
+    deadline = time.monotonic() + 2
+    while get_scheduler().stats()["running"] is not None:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_workers_share_sessions_through_the_model_server(model_server):
+    client, store = model_server
+    first = RemoteSessionStore(client)
+    second = RemoteSessionStore(ModelClient(client.path))
+
+    session = first.get_or_create(None)
+    first.append(session, "user", "Hola")
+    first.append(session, "assistant", "Hi! What brings you in?")
+
+    shared = second.get_or_create(session.session_id)
+    assert shared.messages == session.messages
+    assert store.sessions[session.session_id].turn_count == 1
+
+
+def test_unknown_op_is_an_error(model_server):
+    client, _ = model_server
+    with pytest.raises(ModelServerError, match="Unknown op"):
+        client.call("bogus")
+    # The connection stays usable after an error reply.
+    assert client.call("stats")["model_loaded"] is False
@@ -0,0 +1,37 @@
+import json
+from unittest.mock import patch
+
+from app.config import settings
+from scripts import build_model_variants
+
+
+def test_comparison_runs_on_the_fake_backend(tmp_path):
+    out = tmp_path / "variants.json"
+    with (
+        patch.object(settings, "fake_prefill_tps", 1e9),
+        patch.object(settings, "fake_decode_tps", 1e6),
+    ):
+        build_model_variants.main(
+            [
+                "--backend",
+                "fake",
+                "--variants",
+                "qwen2.5-3b-4bit",
+                "--limit",
+                "3",
+                "--latency-turns",
+                "2",
+                "--cache",
+                str(tmp_path / "eval_cache.sqlite"),
+                "--json",
+                str(out),
+            ]
+        )
+    report = json.loads(out.read_text())
+    [row] = report["variants"]
+    assert row["variant"] == "qwen2.5-3b-4bit"
+    assert row["turns"] == 2
+    # The fake model's canned replies never write the summary fields.
+    assert row["average_score"] == 0.0
+    assert row["model_free_text"] == 0.0
+    assert report["recommended"] == "qwen2.5-3b-4bit"
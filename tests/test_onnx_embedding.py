@@ -0,0 +1,102 @@
+import numpy as np
+import pytest
+
+from app.config import settings
+from app.onnx_embedding import OnnxQueryEmbedding, export
+
+QUERIES = [
+    "I keep mixing up ser and estar when I describe places",
+    "When do I use the preterite instead of the imperfect?",
+    "Can you recommend a good restaurant near campus?",
+    "I'm stressed about the midterm exam next week",
+]
+PASSAGES = [
+    "Estar is used for locations and temporary states.",
+    "The preterite describes completed actions in the past.",
+    "Office hours are on Thursdays in the language center.",
+    "Composition drafts are due before the final exam.",
+]
+
+
+def cosine_matrix(embed, queries, passages):
+    q = np.asarray([embed(text) for text in queries])
+    p = np.asarray([embed(text) for text in passages])
+    q /= np.linalg.norm(q, axis=1)[:, None]
+    p /= np.linalg.norm(p, axis=1)[:, None]
+    return q @ p.T
+
+
+@pytest.fixture(scope="module")
+def tiny_export(tmp_path_factory):
+    """A small random BERT, its tokenizer, and their int8 ONNX export."""
+    pytest.importorskip("onnx")
+    torch = pytest.importorskip("torch")
+    from transformers import BertConfig, BertModel, BertTokenizerFast
+
+    words = sorted(
+        {w.strip("?.,'").lower() for t in QUERIES + PASSAGES for w in t.split()}
+    )
+    tokens = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]", *words]
+    tokenizer = BertTokenizerFast(vocab={t: i for i, t in enumerate(tokens)})
+    torch.manual_seed(0)
+    model = BertModel(
+        BertConfig(
+            vocab_size=len(tokens),
+            hidden_size=64,
+            num_hidden_layers=2,
+            num_attention_heads=4,
+            intermediate_size=128,
+            max_position_embeddings=64,
+        )
+    ).eval()
+    source = tmp_path_factory.mktemp("source")
+    model.save_pretrained(source)
+    tokenizer.save_pretrained(source)
+    out = tmp_path_factory.mktemp("onnx")
+    export(str(source), out, max_length=32)
+
+    def reference(text):
+        encoded = tokenizer([text], return_tensors="pt")
+        with torch.no_grad():
+            hidden = model(**encoded).last_hidden_state[0]
+        return hidden.mean(dim=0).numpy()
+
+    return OnnxQueryEmbedding(out), reference
+
+
+def test_int8_export_tracks_the_source_model(tiny_export):
+    embedder, reference = tiny_export
+    for text in QUERIES + PASSAGES:
+        vector = np.asarray(embedder.get_query_embedding(text))
+        expected = reference(text)
+        assert np.linalg.norm(vector) == pytest.approx(1.0)
+        assert vector @ expected / np.linalg.norm(expected) > 0.95, text
+
+
+def test_reused_buffers_do_not_leak_between_queries(tiny_export):
+    embedder, _ = tiny_export
+    short = embedder.get_query_embedding("ser estar")
+    embedder.get_query_embedding(" ".join(QUERIES))
+    assert embedder.get_query_embedding("ser estar") == short
+    # Longer queries are truncated to the export's max_length.
+    assert len(embedder.get_query_embedding("exam " * 100)) == len(short)
+
+
+def test_onnx_similarities_match_pytorch():
+    """Parity with the sentence-transformers model the index uses."""
+    path = settings.onnx_embed_path
+    if not (path / "model.onnx").exists():
+        pytest.skip(f"no ONNX export in {path}")
+    from app.rag import get_embed_model
+
+    try:
+        torch_model = get_embed_model()
+    except OSError as e:
+        pytest.skip(f"embedding model unavailable: {e}")
+    onnx_model = OnnxQueryEmbedding(path)
+
+    expected = cosine_matrix(torch_model.get_query_embedding, QUERIES, PASSAGES)
+    actual = cosine_matrix(onnx_model.get_query_embedding, QUERIES, PASSAGES)
+    assert np.abs(actual - expected).max() < 0.03
+    # Retrieval ranks passages the same way.
+    assert (actual.argmax(axis=1) == expected.argmax(axis=1)).all()
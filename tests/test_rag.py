@@ -1,5 +1,7 @@
 from unittest.mock import patch
 
+from llama_index.core.embeddings import MockEmbedding
+
 from app.rag import build_index, retrieve_context
 
 
@@ -86,3 +88,47 @@ def test_retrieve_context_empty_when_no_index():
         assert result == ""
     finally:
         rag_module._index = original
+
+
+def test_build_index_reembeds_only_changed_files(
+    tmp_rag_corpus, tmp_chroma_path, monkeypatch
+):
+    """A rebuild embeds new and edited files and drops deleted ones."""
+    embed_model = MockEmbedding(embed_dim=8)
+    with (
+        patch("app.rag.settings") as mock_settings,
+        patch("app.rag.get_embed_model", return_value=embed_model),
+        patch.object(
+            MockEmbedding,
+            "_get_text_embeddings",
+            autospec=True,
+            side_effect=MockEmbedding._get_text_embeddings,
+        ) as embed_texts,
+    ):
+        mock_settings.rag_corpus_path = tmp_rag_corpus
+        mock_settings.chroma_db_path = tmp_chroma_path
+
+        import app.rag as rag_module
+
+        monkeypatch.setattr(rag_module, "_index", None)
+        assert build_index() == 2
+        first = rag_module._index
+
+        # Unchanged corpus: nothing is embedded again.
+        embedded = embed_texts.call_count
+        assert embedded > 0
+        assert build_index() == 2
+        assert embed_texts.call_count == embedded
+
+        spa_dir = tmp_rag_corpus / "spa212"
+        (spa_dir / "grammar_topics.md").write_text("# Gustar\n\nMe gusta.\n")
+        (spa_dir / "common_errors.md").unlink()
+        (spa_dir / "office_hours.md").write_text("# Hours\n\nThursdays.\n")
+        assert build_index() == 2
+        assert rag_module._index is not first
+
+        collection = rag_module._index.vector_store._collection
+        stored = collection.get(include=["metadatas", "documents"])
+        names = {m["file_name"] for m in stored["metadatas"]}
+        assert names == {"grammar_topics.md", "office_hours.md"}
+        assert not any("Ser vs Estar" in doc for doc in stored["documents"])
@@ -0,0 +1,67 @@
+from unittest.mock import patch
+
+import pytest
+
+import app.chat as chat_module
+import app.reload as reload_module
+from app.reload import changed_sources, on_reload, reload, watch_path
+
+
+@pytest.fixture
+def registry():
+    """Give each test an empty source and hook registry."""
+    with (
+        patch.object(reload_module, "_sources", {}),
+        patch.object(reload_module, "_hooks", []),
+    ):
+        yield
+
+
+def test_changed_paths_map_to_their_sources(registry, tmp_path):
+    corpus = tmp_path / "corpus"
+    prompt = tmp_path / "docs" / "system-prompt.md"
+    watch_path("corpus", corpus, lambda: None)
+    watch_path("prompt", prompt, lambda: None)
+
+    assert changed_sources([corpus / "spa212" / "a.md"]) == {"corpus"}
+    assert changed_sources([prompt]) == {"prompt"}
+    assert changed_sources([tmp_path / "docs" / "other.md"]) == set()
+
+
+def test_reload_runs_loaders_then_hooks(registry, tmp_path):
+    calls = []
+    watch_path("a", tmp_path / "a", lambda: calls.append("load a"))
+    watch_path("b", tmp_path / "b", lambda: calls.append("load b"))
+    on_reload(lambda names: calls.append(("hook", names)))
+
+    assert reload(["b"]) == {"b"}
+    assert calls == ["load b", ("hook", frozenset({"b"}))]
+
+
+def test_failed_load_skips_hooks(registry, tmp_path):
+    hooks = []
+
+    def broken():
+        raise ValueError("bad corpus")
+
+    watch_path("corpus", tmp_path, broken)
+    on_reload(hooks.append)
+
+    assert reload() == set()
+    assert hooks == []
+
+
+def test_system_prompt_reload_swaps_template(tmp_path):
+    prompt = tmp_path / "system-prompt.md"
+    prompt.write_text("## Prompt\n\n```\nFirst {{retrieved_context}}\n```\n")
+    with (
+        patch.object(chat_module, "SYSTEM_PROMPT_PATH", prompt),
+        patch.object(chat_module, "_system_prompt_template", None),
+    ):
+        snapshot = chat_module._load_system_prompt()
+        prompt.write_text("## Prompt\n\n```\nSecond\n```\n")
+        # Cached until the reload; a turn holding the old one keeps it.
+        assert chat_module._load_system_prompt() == snapshot
+        assert reload(["system_prompt"]) == {"system_prompt"}
+        assert chat_module._load_system_prompt() == "Second"
+        assert snapshot == "First {{retrieved_context}}"
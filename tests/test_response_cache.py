@@ -0,0 +1,139 @@
+from unittest.mock import patch
+
+from app.reload import notify
+from app.response_cache import (
+    ResponseCache,
+    cache_key,
+    get_response_cache,
+    normalize_input,
+)
+from tests.conftest import fake_stream_generate
+
+GREETING = (
+    "Hi Ana! What brings you in today?\n\n1. SPA 212-T (course help)\n"
+    "2. Another course\n3. Something else (not course-related)"
+)
+
+
+def test_menu_answers_share_a_key():
+    key = cache_key("tmpl", "category", " Vocabulary! ", "ctx", "base", "t0")
+    assert key == cache_key(
+        "tmpl", "category", "vocabulary", "ctx", "base", "t0"
+    )
+    assert normalize_input("1.") == normalize_input("1")
+    # Every input to the reply is part of the key.
+    for other in (
+        cache_key("tmpl2", "category", "vocabulary", "ctx", "base", "t0"),
+        cache_key("tmpl", "course", "vocabulary", "ctx", "base", "t0"),
+        cache_key("tmpl", "category", "vocabulary", "ctx2", "base", "t0"),
+        cache_key("tmpl", "category", "vocabulary", "ctx", "v2", "t0"),
+        cache_key("tmpl", "category", "vocabulary", "ctx", "base", "t1"),
+    ):
+        assert other != key
+
+
+def test_free_text_turns_bypass_the_cache():
+    assert cache_key("t", "confidence", "struggling", "c", "base", "t0") is None
+    assert cache_key("t", None, "ED 8", "c", "base", "t0") is None
+    long_answer = "I keep mixing up ser and estar whenever I describe places"
+    assert cache_key("t", "category", long_answer, "c", "base", "t0") is None
+
+
+def test_lru_and_ttl_eviction():
+    cache = ResponseCache(max_entries=2, ttl=60)
+    cache.put("a", "A")
+    cache.put("b", "B")
+    cache.get("a")
+    cache.put("c", "C")
+    assert cache.get("b") is None
+    assert cache.get("a") == "A"
+
+    with patch("app.response_cache.time.monotonic", return_value=1e12):
+        assert cache.get("a") is None
+    assert cache.stats()["hit_rate"] == 0.5
+
+
+def test_evict_frees_least_recently_used_bytes():
+    cache = ResponseCache()
+    for key in "abc":
+        cache.put(key, key.upper() * 100)
+    cache.get("a")
+    per_entry = cache.nbytes // 3
+
+    assert cache.evict(1) == per_entry
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.evict(10**9) == 2 * per_entry
+    assert len(cache) == 0 and cache.nbytes == 0
+
+
+def test_visitor_name_is_templated():
+    cache = ResponseCache()
+    cache.put("k", "Hi Ana! What brings you in?", visitor_name="Ana")
+    assert cache.get("k", "Luis") == "Hi Luis! What brings you in?"
+
+
+def test_booking_ref_is_templated():
+    cache = ResponseCache()
+    cache.put("k", "Hi Ana, booking cal-1.", "Ana", booking_ref="cal-1")
+    assert cache.get("k", "Luis", "cal-2") == "Hi Luis, booking cal-2."
+
+
+def test_reload_and_adapter_changes_clear_the_cache():
+    cache = get_response_cache()
+    cache.put("k", "reply")
+    notify({"adapter:v2"})
+    assert len(cache) == 0
+
+
+def test_chat_serves_repeated_menu_turn_from_cache(client):
+    with patch(
+        "app.chat.stream_generate",
+        side_effect=fake_stream_generate(GREETING),
+    ) as generate:
+        first = client.post(
+            "/chat", json={"message": "Hi", "visitor_name": "Ana"}
+        ).json()
+        second = client.post(
+            "/chat", json={"message": "hi!", "visitor_name": "Luis"}
+        ).json()
+        # A different answer to the same menu is generated.
+        client.post("/chat", json={"message": "2"})
+    assert first["reply"] == GREETING
+    assert second["reply"] == GREETING.replace("Ana", "Luis")
+    assert generate.call_count == 2
+    assert get_response_cache().stats()["hits"] >= 1
+
+
+def test_appointment_time_is_not_shared_between_visitors(client):
+    """A greeting naming one visitor's appointment is not served to another."""
+    replies = iter(
+        [
+            "Hi Ana! See you on Tuesday, March 03 at 01:00 PM. " + GREETING,
+            "Hi Luis! See you on Friday, March 06 at 10:00 AM. " + GREETING,
+        ]
+    )
+
+    def generate(*args, **kwargs):
+        return fake_stream_generate(next(replies))(*args, **kwargs)
+
+    with patch("app.chat.stream_generate", side_effect=generate) as mock:
+        first = client.post(
+            "/chat",
+            json={
+                "message": "Hi",
+                "visitor_name": "Ana",
+                "appointment_datetime": "2026-03-03T13:00:00Z",
+            },
+        ).json()
+        second = client.post(
+            "/chat",
+            json={
+                "message": "Hi",
+                "visitor_name": "Luis",
+                "appointment_datetime": "2026-03-06T10:00:00Z",
+            },
+        ).json()
+    assert mock.call_count == 2
+    assert "March 03" in first["reply"]
+    assert "March 06" in second["reply"] and "March 03" not in second["reply"]
@@ -0,0 +1,83 @@
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from app.metrics import DEADLINE_MISSES, INFERENCE_PROMOTIONS, render
+from app.scheduler import BACKGROUND, INTERACTIVE, InferenceScheduler
+
+NOW = datetime.now(tz=timezone.utc)
+
+
+def _queue(scheduler, order, name, job_class, deadline=None):
+    """Start a job in a thread and wait until it is queued."""
+    waiting = len(scheduler._waiting)
+
+    def run():
+        with scheduler.slot(job_class, kind=name, deadline=deadline):
+            order.append(name)
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    while len(scheduler._waiting) == waiting:
+        time.sleep(0.001)
+    return thread
+
+
+def _run_queued(scheduler, jobs):
+    order = []
+    with scheduler.slot(INTERACTIVE, kind="holder"):
+        threads = [_queue(scheduler, order, *job) for job in jobs]
+        assert scheduler.stats()["queue_depth"][BACKGROUND] == sum(
+            job[1] == BACKGROUND for job in jobs
+        )
+    for thread in threads:
+        thread.join()
+    return order
+
+
+def test_interactive_first_then_earliest_deadline():
+    scheduler = InferenceScheduler(max_wait=60)
+    order = _run_queued(
+        scheduler,
+        [
+            ("no_deadline", BACKGROUND),
+            ("late", BACKGROUND, NOW + timedelta(days=2)),
+            ("chat", INTERACTIVE),
+            ("early", BACKGROUND, NOW + timedelta(hours=1)),
+        ],
+    )
+    assert order == ["chat", "early", "late", "no_deadline"]
+    assert scheduler.stats() == {
+        "running": None,
+        "queue_depth": {INTERACTIVE: 0, BACKGROUND: 0},
+    }
+
+
+def test_starved_background_job_is_promoted():
+    scheduler = InferenceScheduler(max_wait=0.02)
+    before = INFERENCE_PROMOTIONS.value("prewarm")
+    order = []
+    with scheduler.slot(INTERACTIVE):
+        threads = [_queue(scheduler, order, "prewarm", BACKGROUND)]
+        time.sleep(0.05)
+        threads.append(_queue(scheduler, order, "chat", INTERACTIVE))
+    for thread in threads:
+        thread.join()
+    assert order == ["prewarm", "chat"]
+    assert INFERENCE_PROMOTIONS.value("prewarm") == before + 1
+
+
+def test_missed_deadline_is_reported():
+    scheduler = InferenceScheduler()
+    before = DEADLINE_MISSES.value("summary")
+    with scheduler.slot(BACKGROUND, kind="summary", deadline=NOW):
+        pass
+    with scheduler.slot(
+        BACKGROUND, kind="summary", deadline=NOW + timedelta(hours=1)
+    ):
+        pass
+    assert DEADLINE_MISSES.value("summary") == before + 1
+
+
+def test_queue_depth_is_exported_as_gauge():
+    assert "# TYPE intake_inference_queue_depth gauge" in render()
@@ -0,0 +1,118 @@
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.recordlog import RecordLog
+from app.sessions import SessionClosed, SessionStore
+from tests.conftest import fake_stream_generate
+
+
+def _open(path):
+    log = RecordLog(path, flush_interval=0.01)
+    store = SessionStore(log)
+    store.rehydrate()
+    log.start()
+    return store
+
+
+def test_turns_survive_restart(tmp_path):
+    """Sessions written before a restart are rehydrated afterwards."""
+    path = tmp_path / "sessions.log"
+    store = _open(path)
+    session = store.get_or_create("sess-1")
+    store.append(session, "user", "SPA 212-T")
+    store.append(session, "assistant", "What area do you need help with?")
+    store.log.stop()
+
+    restored = _open(path)
+    restored.log.stop()
+    assert list(restored.sessions) == ["sess-1"]
+    assert restored.sessions["sess-1"].messages == [
+        {"role": "user", "content": "SPA 212-T"},
+        {"role": "assistant", "content": "What area do you need help with?"},
+    ]
+    assert restored.sessions["sess-1"].turn_count == 1
+
+
+def test_closed_sessions_are_compacted(tmp_path):
+    """Closed sessions are not restored and are dropped from the log."""
+    path = tmp_path / "sessions.log"
+    store = _open(path)
+    for sid in ("open", "done"):
+        store.append(store.get_or_create(sid), "user", "hola")
+    store.close("done")
+    store.log.stop()
+
+    restored = _open(path)
+    restored.log.stop()
+    assert list(restored.sessions) == ["open"]
+    assert b"done" not in path.read_bytes()
+
+
+def test_closed_session_is_not_reopened():
+    store = SessionStore(max_closed=1)
+    store.get_or_create("first")
+    store.close("first")
+    with pytest.raises(SessionClosed):
+        store.get_or_create("first")
+    # Only the most recent closed ids are remembered.
+    store.get_or_create("second")
+    store.close("second")
+    assert store.get_or_create("first").messages == []
+
+
+def test_torn_final_record_is_skipped(tmp_path):
+    """A partially written last line does not break rehydration."""
+    path = tmp_path / "sessions.log"
+    store = _open(path)
+    store.append(store.get_or_create("sess-1"), "user", "hola")
+    store.log.stop()
+    with open(path, "ab") as f:
+        f.write(b'{"sid":"sess-1","op":"tu')
+
+    restored = _open(path)
+    restored.log.stop()
+    assert len(restored.sessions["sess-1"].messages) == 1
+
+
+def test_chat_threads_session_history():
+    """A follow-up /chat call with the same session id sees prior turns."""
+    seen = []
+
+    def apply_chat_template(self, msgs, **kw):
+        seen.append(msgs)
+        return "mock prompt"
+
+    mock_tokenizer = type(
+        "MockTokenizer",
+        (),
+        {
+            "apply_chat_template": apply_chat_template,
+            "encode": lambda self, text, **kw: [1, 2, 3],
+        },
+    )()
+    mock_model = type("MockModel", (), {})()
+
+    with (
+        patch("app.chat.get_model", return_value=(mock_model, mock_tokenizer)),
+        patch(
+            "app.chat.stream_generate",
+            side_effect=fake_stream_generate("Got it."),
+        ),
+        patch("app.sessions._store", SessionStore()),
+    ):
+        from app.main import app
+
+        client = TestClient(app)
+        first = client.post("/chat", json={"message": "SPA 212-T"}).json()
+        client.post(
+            "/chat",
+            json={"message": "Grammar", "session_id": first["session_id"]},
+        )
+
+    assert [m["content"] for m in seen[1][1:]] == [
+        "SPA 212-T",
+        "Got it.",
+        "Grammar",
+    ]
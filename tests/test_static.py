@@ -0,0 +1,59 @@
+import gzip
+
+import pytest
+
+from app.static import IMMUTABLE, REVALIDATE, choose_encoding
+
+
+@pytest.mark.parametrize(
+    "accept, expected",
+    [
+        ("gzip, deflate, br", "br"),
+        ("gzip", "gzip"),
+        ("br;q=0, gzip;q=0.5", "gzip"),
+        ("", "identity"),
+        ("*", "br"),
+    ],
+)
+def test_choose_encoding(accept, expected):
+    assert choose_encoding(accept, {"identity", "br", "gzip"}) == expected
+
+
+def test_index_pins_assets_to_content_hashes(client):
+    response = client.get("/")
+    assert response.status_code == 200
+    assert response.headers["cache-control"] == REVALIDATE
+    html = response.text
+    start = html.index('src="/static/widget.js?v=') + len('src="')
+    url = html[start : html.index('"', start)]
+
+    asset = client.get(url, headers={"Accept-Encoding": "gzip"})
+    assert asset.headers["cache-control"] == IMMUTABLE
+    assert asset.headers["content-encoding"] == "gzip"
+    assert asset.headers["vary"] == "Accept-Encoding"
+    # httpx decodes the body; the wire size is the compressed variant.
+    assert len(gzip.compress(asset.content)) >= int(
+        asset.headers["content-length"]
+    )
+    assert "WebSocket" in asset.text
+
+
+def test_static_revalidates_with_strong_etag(client):
+    response = client.get(
+        "/static/widget.css", headers={"Accept-Encoding": "identity"}
+    )
+    etag = response.headers["etag"]
+    assert etag.startswith('"') and not etag.startswith("W/")
+    assert response.headers["cache-control"] == REVALIDATE
+    assert "content-encoding" not in response.headers
+
+    cached = client.get(
+        "/static/widget.css",
+        headers={"Accept-Encoding": "identity", "If-None-Match": etag},
+    )
+    assert cached.status_code == 304
+    assert cached.content == b""
+
+    # A stale version query is not immutable.
+    stale = client.get("/static/widget.css?v=old")
+    assert stale.headers["cache-control"] == REVALIDATE
@@ -0,0 +1,136 @@
+import json
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app.tracing as tracing_module
+from app.config import settings
+from app.main import app
+from app.tracing import span, trace_turn
+from tests.conftest import fake_stream_generate
+
+
+@pytest.fixture
+def mock_chat():
+    mock_tokenizer = type(
+        "MockTokenizer",
+        (),
+        {
+            "apply_chat_template": lambda self, msgs, **kw: "mock prompt",
+            "encode": lambda self, text, **kw: [1, 2, 3],
+        },
+    )()
+    mock_model = type("MockModel", (), {})()
+    with (
+        patch("app.chat.get_model", return_value=(mock_model, mock_tokenizer)),
+        patch(
+            "app.chat.stream_generate",
+            side_effect=fake_stream_generate("Hola!"),
+        ),
+    ):
+        yield TestClient(app)
+
+
+def _read_traces(path):
+    tracing_module.close_trace_log()
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+def test_span_outside_trace_is_noop():
+    with span("orphan"):
+        pass
+    assert tracing_module.current_trace() is None
+
+
+def test_nested_spans_record_parents():
+    with trace_turn("sess-1", 1) as trace:
+        with span("outer"):
+            with span("inner"):
+                pass
+    names = {s["name"]: s for s in trace.spans}
+    assert names["outer"]["parent"] == names["chat"]["id"]
+    assert names["inner"]["parent"] == names["outer"]["id"]
+    assert names["chat"]["duration_ms"] >= names["outer"]["duration_ms"]
+
+
+def test_chat_turn_writes_trace(tmp_path, mock_chat):
+    """Each /chat turn appends a JSONL trace with per-stage spans."""
+    path = tmp_path / "traces.jsonl"
+    tracing_module.open_trace_log(path)
+    response = mock_chat.post("/chat", json={"message": "hello"})
+    traces = _read_traces(path)
+
+    assert len(traces) == 1
+    trace = traces[0]
+    assert trace["trace_id"] == response.headers["X-Trace-Id"]
+    assert trace["session_id"] == response.json()["session_id"]
+    assert trace["turn"] == 1
+    names = {s["name"] for s in trace["spans"]}
+    assert {
+        "chat",
+        "load_system_prompt",
+        "prompt_assembly",
+        "tokenization",
+        "generation",
+        "queue_wait",
+        "prefill",
+        "decode",
+    } <= names
+
+
+def test_admin_profile_requires_token(mock_chat):
+    with patch.object(settings, "admin_token", None):
+        assert mock_chat.post("/admin/profile", json={}).status_code == 403
+    with patch.object(settings, "admin_token", "s3cret"):
+        response = mock_chat.post(
+            "/admin/profile", json={}, headers={"X-Admin-Token": "wrong"}
+        )
+        assert response.status_code == 403
+
+
+def test_admin_profile_captures_next_requests(tmp_path, mock_chat):
+    """Arming the profiler writes a folded-stack file after N turns."""
+    headers = {"X-Admin-Token": "s3cret"}
+    with (
+        patch.object(settings, "admin_token", "s3cret"),
+        patch.object(settings, "profile_dir", tmp_path),
+    ):
+        armed = mock_chat.post(
+            "/admin/profile",
+            json={"requests": 2, "interval_ms": 1},
+            headers=headers,
+        ).json()
+        for _ in range(2):
+            mock_chat.post("/chat", json={"message": "hello"})
+        profiler = tracing_module._armed
+        profiler._sampler.join(timeout=5)
+        status = mock_chat.get("/admin/profile", headers=headers).json()
+
+    assert status["armed"] is False
+    assert len(profiler.trace_ids) == 2
+    profile = tmp_path / armed["path"].rsplit("/", 1)[-1]
+    assert profile.exists()
+
+
+def test_profiler_writes_on_timeout(tmp_path, mock_chat):
+    """A profiler armed for more turns than arrive still writes a profile."""
+    path = tracing_module.arm_profiler(5, tmp_path, interval=0.001, timeout=0.5)
+    mock_chat.post("/chat", json={"message": "hello"})
+    profiler = tracing_module._armed
+    profiler._sampler.join(timeout=5)
+
+    assert path.exists()
+    assert profiler.trace_ids and profiler.remaining == 4
+    assert tracing_module.profiler_status()["armed"] is False
+    tracing_module.disarm_profiler()
+
+
+def test_rearming_writes_previous_profile(tmp_path):
+    first = tracing_module.arm_profiler(3, tmp_path)
+    second = tracing_module.arm_profiler(3, tmp_path)
+    assert first.exists()
+    assert not second.exists()
+    tracing_module.disarm_profiler()
+    assert second.exists()
+    assert tracing_module.profiler_status() == {"armed": False}